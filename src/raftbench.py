@@ -0,0 +1,111 @@
+"""
+Micro-benchmarks of the heartbeat path, in nanoseconds per message.
+
+- Encoding and decoding of an AppendEntries heartbeat and its response.
+- Dispatch and handling of the heartbeat on a follower, and of the response on
+  the leader, through RaftState.handle_message.
+- The whole round trip, from the leader heartbeat timeout to the leader
+  handling the response, with messages encoded and decoded in between.
+
+States are driven directly, with no network or threads, so that numbers only
+reflect per-message overhead in the codec and state handling.
+"""
+
+from typing import Callable, Dict
+import argparse
+import collections
+import time
+
+import raftmessage
+import raftrole
+import raftstate
+
+ITERATIONS = 100000
+
+
+def measure(function: Callable[[], object], iterations: int) -> float:
+    """
+    Nanoseconds per call, the best of three runs.
+    """
+    timings = []
+
+    for _ in range(3):
+        start = time.perf_counter_ns()
+
+        for _ in range(iterations):
+            function()
+
+        timings.append((time.perf_counter_ns() - start) / iterations)
+
+    return min(timings)
+
+
+def elect_leader() -> Dict[int, raftstate.RaftState]:
+    """
+    Three states, with state 1 elected leader.
+    """
+    states = {i: raftstate.RaftState(i) for i in (1, 2, 3)}
+    message = raftstate.change_state_on_timeout(states[1])
+    pending = collections.deque([message])
+
+    while pending:
+        message = pending.popleft()
+
+        if message is not None:
+            pending.extend(states[message.target].handle_message(message))
+
+    assert states[1].role == raftrole.Role.LEADER
+    return states
+
+
+def run_benchmarks(iterations: int) -> Dict[str, float]:
+    states = elect_leader()
+    leader, follower = states[1], states[2]
+
+    (request, *_) = leader.handle_message(
+        raftmessage.UpdateFollowers(1, 1, leader.create_replication_list())
+    )
+    assert isinstance(request, raftmessage.AppendEntryRequest)
+
+    (response,) = follower.handle_message(request)
+    request_payload = raftmessage.encode_message(request)
+    response_payload = raftmessage.encode_message(response)
+
+    def round_trip() -> None:
+        heartbeat = raftstate.change_state_on_timeout(leader)
+        assert heartbeat is not None
+
+        for message in leader.handle_message(heartbeat):
+            payload = raftmessage.encode_message(message)
+            target = states[message.target]
+
+            for reply in target.handle_message(raftmessage.decode_message(payload)):
+                payload = raftmessage.encode_message(reply)
+                leader.handle_message(raftmessage.decode_message(payload))
+
+    return {
+        "encode request": measure(
+            lambda: raftmessage.encode_message(request), iterations
+        ),
+        "decode request": measure(
+            lambda: raftmessage.decode_message(request_payload), iterations
+        ),
+        "encode response": measure(
+            lambda: raftmessage.encode_message(response), iterations
+        ),
+        "decode response": measure(
+            lambda: raftmessage.decode_message(response_payload), iterations
+        ),
+        "handle request": measure(lambda: follower.handle_message(request), iterations),
+        "handle response": measure(lambda: leader.handle_message(response), iterations),
+        "round trip": measure(round_trip, iterations // 10),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the heartbeat path.")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    args = parser.parse_args()
+
+    for name, nanoseconds in run_benchmarks(args.iterations).items():
+        print(f"{name:<16} {nanoseconds:>10.0f} ns")
@@ -3,26 +3,48 @@ Client to enable sending of append entries and expose state instructions to the
 Raft server.
 """
 
-from typing import List
+from typing import Dict, List, Tuple
 import dataclasses
-import sys
+import threading
 
 import raftconfig
+import raftlogging
 import raftmessage
 import raftnode
+import rafttransport
 
 
 @dataclasses.dataclass
 class RaftClient:
     identifier: int
+    transport: rafttransport.Transport = dataclasses.field(
+        default_factory=rafttransport.TcpTransport
+    )
+    members: Dict[int, Tuple[str, int]] = dataclasses.field(
+        default_factory=lambda: dict(raftconfig.ADDRESS_BY_IDENTIFIER)
+    )
 
     def __post_init__(self) -> None:
-        self.node: raftnode.RaftNode = raftnode.RaftNode(self.identifier)
+        self.node: raftnode.RaftNode = raftnode.RaftNode(
+            self.identifier, self.transport, members=self.members
+        )
 
     def send(self, messages: List[raftmessage.Message]) -> None:
         for message in messages:
             self.node.send(message.target, raftmessage.encode_message(message))
 
+    def receive(self) -> None:
+        """
+        Run in background thread to print acknowledgements and other replies,
+        so they do not pile up on the incoming queue.
+        """
+        while True:
+            message = raftmessage.decode_message(self.node.receive())
+            print(
+                f"\n{self.identifier}: receive: {message!r}\n{self.identifier} > ",
+                end="",
+            )
+
     def instruct(self) -> None:
         while True:
             prompt = input(f"{self.identifier} > ")
@@ -34,20 +56,48 @@ class RaftClient:
                 self.send(
                     [
                         raftmessage.Text(self.identifier, target, prompt)
-                        for target in raftconfig.ADDRESS_BY_IDENTIFIER
+                        for target in self.members
                     ]
                 )
                 continue
 
-            target, command = int(prompt[0]), prompt[2:]
+            prefix, _, command = prompt.partition(" ")
+            target = int(prefix)
             messages: List[raftmessage.Message] = []
 
             if command.startswith("append"):
                 for item in command.replace("append ", "").split():
                     messages.append(
-                        raftmessage.ClientLogAppend(self.identifier, target, item)
+                        raftmessage.ClientLogAppend(
+                            self.identifier, target, item.encode("utf-8")
+                        )
                     )
 
+            elif command.startswith("transfer"):
+                transferee = int(command.replace("transfer ", ""))
+                messages.append(
+                    raftmessage.TransferLeadership(self.identifier, target, transferee)
+                )
+
+            elif command.startswith("add"):
+                member, host, port, *flags = command.replace("add ", "").split()
+                messages.append(
+                    raftmessage.AddMember(
+                        self.identifier,
+                        target,
+                        int(member),
+                        host,
+                        int(port),
+                        "replica" in flags,
+                    )
+                )
+
+            elif command.startswith("remove"):
+                member = command.replace("remove ", "")
+                messages.append(
+                    raftmessage.RemoveMember(self.identifier, target, int(member))
+                )
+
             else:
                 messages.append(raftmessage.Text(self.identifier, target, command))
 
@@ -55,11 +105,22 @@ class RaftClient:
 
     def run(self):
         self.node.start()
+        threading.Thread(target=self.receive, daemon=True).start()
         self.instruct()
 
-        print(self.color() + "end.")
+        print("end.")
+        raftlogging.shutdown()
 
 
 if __name__ == "__main__":
-    client = RaftClient(int(sys.argv[1]))
+    args = raftconfig.create_parser("Run a Raft client.").parse_args()
+    cluster = raftconfig.parse_cluster_config(args)
+    raftlogging.configure(args.log_level, args.log_sample, args.log_json)
+    transport_type = rafttransport.TransportType(cluster.transport)
+
+    client = RaftClient(
+        args.identifier,
+        rafttransport.create_transport(transport_type, cluster),
+        cluster.addresses,
+    )
     client.run()
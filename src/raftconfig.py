@@ -1,4 +1,31 @@
-from typing import Dict, Tuple
+"""
+Cluster configuration, with the static three-server cluster below as default.
+
+Clusters of any size can instead be loaded from a JSON file, or generated on
+consecutive ports from command line arguments. A config file lists servers by
+identifier, with all other settings optional:
+
+{
+    "nodes": {"1": ["localhost", 7000], "2": ["localhost", 7001]},
+    "client": ["localhost", 10000],
+    "transport": "tcp",
+    "directory": "/tmp/cluster-a",
+    "timing": "low-latency",
+    "pre_vote": true,
+    "codecs": ["lzma", "zlib"],
+    "compression_threshold": 1024
+}
+
+Timing is either the name of a profile or the fields of a TimingProfile. Codecs
+are listed in order of preference, and a null threshold turns off compression.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import dataclasses
+import json
+import random
+
+import raftframe
 
 
 ADDRESS_BY_IDENTIFIER: Dict[int, Tuple[str, int]] = {
@@ -6,3 +33,223 @@ ADDRESS_BY_IDENTIFIER: Dict[int, Tuple[str, int]] = {
     2: ("localhost", 8000),
     3: ("localhost", 9000),
 }
+
+CLIENT_ADDRESS: Tuple[str, int] = ("localhost", 10000)
+
+# Learners are promoted to voting members once their log is within this many
+# entries of the leader's.
+PROMOTION_THRESHOLD = 10
+
+
+@dataclasses.dataclass
+class TimingProfile:
+    """
+    Timing of heartbeats and elections, in seconds. The election timeout is
+    drawn uniformly from its range each time it is armed, and has to allow for
+    at least a couple of missed heartbeats before a follower stands for
+    election.
+
+    With minimum_heartbeat_interval set, timing adapts to measured round-trip
+    times, with the heartbeat interval moving between the minimum and the
+    configured interval and election timeouts scaled in proportion.
+    """
+
+    heartbeat_interval: float
+    election_timeout_min: float
+    election_timeout_max: float
+    minimum_heartbeat_interval: Optional[float] = None
+
+    def __post_init__(self) -> None:
+        if self.heartbeat_interval <= 0:
+            raise Exception("Heartbeat interval must be positive.")
+
+        if self.election_timeout_min < 2 * self.heartbeat_interval:
+            raise Exception(
+                "Election timeout must be at least twice the heartbeat interval."
+            )
+
+        if self.election_timeout_max < self.election_timeout_min:
+            raise Exception("Election timeout range is empty.")
+
+        if self.minimum_heartbeat_interval is not None and not (
+            0 < self.minimum_heartbeat_interval <= self.heartbeat_interval
+        ):
+            raise Exception("Minimum heartbeat interval out of range.")
+
+    def election_timeout(self) -> float:
+        return random.uniform(self.election_timeout_min, self.election_timeout_max)
+
+
+TIMING_PROFILES: Dict[str, TimingProfile] = {
+    "default": TimingProfile(3, 6, 9),
+    "low-latency": TimingProfile(0.05, 0.15, 0.3),
+    "adaptive": TimingProfile(1, 3, 6, minimum_heartbeat_interval=0.05),
+}
+
+TIMING_PROFILE = "default"
+
+
+def load_timing_profile(name: Optional[str] = None) -> TimingProfile:
+    name = name or TIMING_PROFILE
+
+    if name not in TIMING_PROFILES:
+        raise Exception(f"Unknown timing profile {name}.")
+
+    return TIMING_PROFILES[name]
+
+
+@dataclasses.dataclass
+class ClusterConfig:
+    addresses: Dict[int, Tuple[str, int]] = dataclasses.field(
+        default_factory=lambda: dict(ADDRESS_BY_IDENTIFIER)
+    )
+    client_address: Tuple[str, int] = CLIENT_ADDRESS
+    transport: str = "tcp"
+    directory: Optional[str] = None
+    timing: TimingProfile = dataclasses.field(default_factory=load_timing_profile)
+    pre_vote: bool = False
+    codecs: Tuple[raftframe.Codec, ...] = (raftframe.Codec.ZLIB,)
+    compression_threshold: Optional[int] = raftframe.COMPRESSION_THRESHOLD
+
+    def __post_init__(self) -> None:
+        if len(self.addresses) == 0:
+            raise Exception("Cluster requires at least one server.")
+
+        for host, port in list(self.addresses.values()) + [self.client_address]:
+            if not 0 < port < 65536:
+                raise Exception(f"Port {port} on {host} out of range.")
+
+        if self.compression_threshold is not None and self.compression_threshold < 0:
+            raise Exception("Compression threshold must not be negative.")
+
+
+def load_codecs(names: List[str]) -> Tuple[raftframe.Codec, ...]:
+    codecs = []
+
+    for name in names:
+        if name.upper() not in raftframe.Codec.__members__:
+            raise Exception(f"Unknown codec {name}.")
+
+        codecs.append(raftframe.Codec[name.upper()])
+
+    return tuple(codecs)
+
+
+def create_cluster_config(
+    size: int, host: str = "localhost", port: int = 7000, **kwargs: Any
+) -> ClusterConfig:
+    """
+    Servers numbered from 1 on consecutive ports.
+    """
+    addresses = {i: (host, port + i - 1) for i in range(1, size + 1)}
+    return ClusterConfig(addresses, **kwargs)
+
+
+def load_cluster_config(path: str) -> ClusterConfig:
+    with open(path) as f:
+        attributes = json.load(f)
+
+    kwargs: Dict[str, Any] = {
+        "addresses": {
+            int(identifier): (host, port)
+            for identifier, (host, port) in attributes.pop("nodes").items()
+        }
+    }
+
+    if "client" in attributes:
+        host, port = attributes.pop("client")
+        kwargs["client_address"] = (host, port)
+
+    timing = attributes.pop("timing", None)
+
+    if isinstance(timing, dict):
+        kwargs["timing"] = TimingProfile(**timing)
+
+    else:
+        kwargs["timing"] = load_timing_profile(timing)
+
+    if "codecs" in attributes:
+        kwargs["codecs"] = load_codecs(attributes.pop("codecs"))
+
+    return ClusterConfig(**kwargs, **attributes)
+
+
+def create_parser(description: str) -> argparse.ArgumentParser:
+    """
+    Arguments shared by servers, clients and nodes. Transport and timing
+    profile may also be given positionally after the identifier.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("identifier", type=int)
+    parser.add_argument("transport", nargs="?")
+    parser.add_argument("profile", nargs="?")
+    parser.add_argument("--config", help="path to JSON cluster config")
+    parser.add_argument("--nodes", type=int, help="number of servers")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=7000, help="port of server 1")
+    parser.add_argument("--client-port", type=int)
+    parser.add_argument("--directory", help="directory for unix sockets")
+    parser.add_argument("--pre-vote", action="store_true")
+    parser.add_argument(
+        "--codecs", help="comma-separated compression codecs, in order of preference"
+    )
+    parser.add_argument(
+        "--compression-threshold",
+        type=int,
+        help="payload size above which to compress, or -1 for never",
+    )
+    parser.add_argument(
+        "--join", action="store_true", help="wait to be added to the cluster"
+    )
+    parser.add_argument(
+        "--log-level", default="info", choices=["debug", "info", "warning", "error"]
+    )
+    parser.add_argument(
+        "--log-sample", type=int, default=1, help="log one in N message events"
+    )
+    parser.add_argument("--log-json", action="store_true")
+    parser.add_argument("--metrics-port", type=int, help="serve metrics over HTTP")
+    parser.add_argument("--trace", help="path to dump message traces to")
+    parser.add_argument("--profile-directory", help="directory to write profiles to")
+
+    return parser
+
+
+def parse_cluster_config(args: argparse.Namespace) -> ClusterConfig:
+    """
+    Config file, else cluster of given size, else the static cluster, with any
+    other arguments taking precedence over the config file.
+    """
+    if args.config is not None:
+        cluster = load_cluster_config(args.config)
+
+    elif args.nodes is not None:
+        cluster = create_cluster_config(args.nodes, args.host, args.port)
+
+    else:
+        cluster = ClusterConfig()
+
+    if args.transport is not None:
+        cluster.transport = args.transport
+
+    if args.profile is not None:
+        cluster.timing = load_timing_profile(args.profile)
+
+    if args.client_port is not None:
+        cluster.client_address = (args.host, args.client_port)
+
+    if args.directory is not None:
+        cluster.directory = args.directory
+
+    if args.pre_vote:
+        cluster.pre_vote = True
+
+    if args.codecs is not None:
+        cluster.codecs = load_codecs(args.codecs.split(",") if args.codecs else [])
+
+    if args.compression_threshold is not None:
+        cluster.compression_threshold = (
+            None if args.compression_threshold < 0 else args.compression_threshold
+        )
+
+    return cluster
@@ -0,0 +1,143 @@
+"""
+Headless entry point for running a server under a supervisor, e.g. systemd or
+a container runtime, with no terminal or stdin.
+
+- Startup is driven by the cluster config and command line alone. State is
+  persisted to the data directory before votes and acknowledgements are sent,
+  so that it survives a crash, and is restored from there on startup.
+- Readiness is signalled once the server is listening and its timers are
+  running, by writing the ready file if given, and by notifying systemd when
+  started with Type=notify.
+- SIGTERM or SIGINT shut the server down gracefully: messages already taken
+  off the queue are handled, timers are stopped, messages queued for peers are
+  written out within the shutdown timeout, and state is persisted.
+"""
+
+from typing import Optional
+import logging
+import os
+import signal
+import socket
+import sys
+
+import raftconfig
+import raftlogging
+import raftserver
+import raftstate
+import rafttransport
+
+LOGGER = raftlogging.get_logger("daemon")
+
+
+def notify(message: str) -> None:
+    """
+    Send a systemd notification, if the service manager asked for them.
+    """
+    address = os.environ.get("NOTIFY_SOCKET")
+
+    if not address:
+        return None
+
+    # Leading @ denotes an abstract socket.
+    if address.startswith("@"):
+        address = "\0" + address[1:]
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.connect(address)
+        sock.sendall(message.encode("utf-8"))
+
+
+def create_state_path(directory: str, identifier: int) -> str:
+    return os.path.join(directory, f"raft-{identifier}.state")
+
+
+def run(
+    server: raftserver.RaftServer,
+    state_path: Optional[str] = None,
+    ready_file: Optional[str] = None,
+    timeout: float = raftserver.SHUTDOWN_TIMEOUT,
+) -> bool:
+    """
+    Run server until stopped, returning whether all messages queued were
+    written out on shutdown.
+    """
+    if state_path is not None and raftstate.load_state(server.state, state_path):
+        raftlogging.log(
+            LOGGER,
+            logging.INFO,
+            "state restored",
+            term=server.state.current_term,
+            entries=len(server.state.log),
+        )
+
+    server.state_path = state_path
+    server.start()
+
+    if ready_file is not None:
+        with open(ready_file, "w") as file:
+            file.write(f"{os.getpid()}\n")
+
+    notify("READY=1")
+    raftlogging.log(LOGGER, logging.INFO, "ready", identifier=server.identifier)
+
+    server.respond()
+
+    notify("STOPPING=1")
+    raftlogging.log(LOGGER, logging.INFO, "stopping", identifier=server.identifier)
+
+    if ready_file is not None and os.path.exists(ready_file):
+        os.unlink(ready_file)
+
+    flushed = server.close(timeout)
+
+    if not flushed:
+        raftlogging.log(LOGGER, logging.WARNING, "messages not flushed")
+
+    server.persist()
+
+    raftlogging.log(LOGGER, logging.INFO, "stopped", identifier=server.identifier)
+    return flushed
+
+
+if __name__ == "__main__":
+    parser = raftconfig.create_parser("Run a Raft server as a daemon.")
+    parser.add_argument("--data-directory", help="directory to persist state to")
+    parser.add_argument("--ready-file", help="path written once ready")
+    parser.add_argument(
+        "--shutdown-timeout",
+        type=float,
+        default=raftserver.SHUTDOWN_TIMEOUT,
+        help="seconds to wait for messages to be written out on shutdown",
+    )
+    args = parser.parse_args()
+
+    cluster = raftconfig.parse_cluster_config(args)
+    raftlogging.configure(args.log_level, args.log_sample, args.log_json)
+    transport_type = rafttransport.TransportType(cluster.transport)
+
+    server = raftserver.RaftServer(
+        args.identifier,
+        rafttransport.create_transport(transport_type, cluster),
+        cluster.timing,
+        cluster.pre_vote,
+        raftserver.create_members(args.identifier, cluster, args.join),
+        cluster.codecs,
+        cluster.compression_threshold,
+    )
+    raftserver.configure(server, args)
+
+    # Handlers run on the main thread, possibly blocked in taking messages off
+    # the incoming queue, which stop puts a message on. The queue is a simple
+    # queue, whose put is reentrant.
+    signal.signal(signal.SIGTERM, lambda *_: server.stop())
+    signal.signal(signal.SIGINT, lambda *_: server.stop())
+
+    state_path = None
+
+    if args.data_directory is not None:
+        os.makedirs(args.data_directory, exist_ok=True)
+        state_path = create_state_path(args.data_directory, args.identifier)
+
+    flushed = run(server, state_path, args.ready_file, args.shutdown_timeout)
+    raftlogging.shutdown()
+    sys.exit(0 if flushed else 1)
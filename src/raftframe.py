@@ -0,0 +1,121 @@
+"""
+Framing of messages on stream connections, with optional compression of large
+payloads.
+
+Each frame is a 4-byte big-endian payload length, a 1-byte codec flag and the
+payload itself. Payloads above a size threshold are compressed with the codec
+agreed with the peer when the connection is set up, while small messages such as
+heartbeats are always sent as is.
+
+In the handshake, each side advertises the codecs it supports as a bitmask, and
+only compresses with a codec the other side advertised.
+"""
+from typing import Iterable, Optional, Sequence, Tuple
+import enum
+import lzma
+import zlib
+
+
+HEADER_LENGTH = 5
+COMPRESSION_THRESHOLD = 1024
+
+
+class Codec(enum.Enum):
+    NONE = 0
+    ZLIB = 1
+    LZMA = 2
+
+
+def encode_codecs(codecs: Iterable[Codec]) -> int:
+    mask = 0
+
+    for codec in codecs:
+        if codec != Codec.NONE:
+            mask |= 1 << (codec.value - 1)
+
+    return mask
+
+
+def decode_codecs(mask: int) -> Sequence[Codec]:
+    return [
+        codec
+        for codec in Codec
+        if codec == Codec.NONE or mask & (1 << (codec.value - 1))
+    ]
+
+
+def negotiate_codec(preference: Sequence[Codec], mask: int) -> Codec:
+    """
+    Pick the first codec in order of local preference that the peer supports.
+    """
+    supported = decode_codecs(mask)
+
+    for codec in preference:
+        if codec in supported:
+            return codec
+
+    return Codec.NONE
+
+
+def compress(codec: Codec, payload: bytes) -> bytes:
+    match codec:
+        case Codec.NONE:
+            return payload
+
+        case Codec.ZLIB:
+            return zlib.compress(payload)
+
+        case Codec.LZMA:
+            return lzma.compress(payload)
+
+        case _:
+            raise Exception(f"Exhaustive switch error on codec {codec}.")
+
+
+def decompress(codec: Codec, payload: bytes) -> bytes:
+    match codec:
+        case Codec.NONE:
+            return payload
+
+        case Codec.ZLIB:
+            return zlib.decompress(payload)
+
+        case Codec.LZMA:
+            return lzma.decompress(payload)
+
+        case _:
+            raise Exception(f"Exhaustive switch error on codec {codec}.")
+
+
+def encode_frame(
+    payload: bytes,
+    codec: Codec = Codec.NONE,
+    threshold: Optional[int] = COMPRESSION_THRESHOLD,
+) -> bytes:
+    if codec != Codec.NONE and threshold is not None and len(payload) > threshold:
+        compressed = compress(codec, payload)
+
+        # Keep the original if compression does not pay off.
+        if len(compressed) < len(payload):
+            payload = compressed
+
+        else:
+            codec = Codec.NONE
+
+    else:
+        codec = Codec.NONE
+
+    return (
+        len(payload).to_bytes(4, byteorder="big")
+        + codec.value.to_bytes(1, byteorder="big")
+        + payload
+    )
+
+
+def decode_header(header: bytes) -> Tuple[int, Codec]:
+    return int.from_bytes(header[:4], byteorder="big"), Codec(header[4])
+
+
+def decode_frame(frame: bytes) -> bytes:
+    length, codec = decode_header(frame[:HEADER_LENGTH])
+    return decompress(codec, frame[HEADER_LENGTH : HEADER_LENGTH + length])
@@ -1,68 +1,117 @@
 """
 Encoding and decoding with Bencode.
+
+Operates on bytes throughout, so payloads are binary-safe. Strings are encoded
+as UTF-8 and byte strings as is; on decoding, all strings come back as bytes
+except dictionary keys, which are decoded to str since they name attributes.
 """
 import builtins
-import re
-
 
-def encode_item(element):
-    if element is None:
-        return ""
 
+def _encode_item(element, chunks):
     match type(element):
         case builtins.int:
-            return f"i{str(element)}e"
+            chunks.append(b"i%de" % element)
+
+        case builtins.bytes:
+            chunks.append(b"%d:" % len(element))
+            chunks.append(element)
 
         case builtins.str:
-            return f"{len(element)}:{element}"
+            _encode_item(element.encode("utf-8"), chunks)
 
         case builtins.list:
-            return "l" + "".join([encode_item(item) for item in element]) + "e"
+            chunks.append(b"l")
+
+            for item in element:
+                _encode_item(item, chunks)
+
+            chunks.append(b"e")
 
         case builtins.dict:
-            collection = []
+            chunks.append(b"d")
 
-            for pair in sorted(element.items()):
-                for item in pair:
-                    collection.append(item)
+            for key, value in sorted(element.items()):
+                _encode_item(key, chunks)
+                _encode_item(value, chunks)
 
-            return "d" + "".join([encode_item(item) for item in collection]) + "e"
+            chunks.append(b"e")
 
         case _:
             raise Exception(f"Exhaustive switch error in encoding item {element}.")
 
 
+def encode_item(element):
+    if element is None:
+        return b""
+
+    # Accumulate chunks and join once, rather than concatenating at each level.
+    chunks = []
+    _encode_item(element, chunks)
+
+    return b"".join(chunks)
+
+
+def dict_encoder(keys):
+    """
+    Encoder for dictionaries with a fixed set of keys, taking the values in the
+    order of keys. Keys are sorted and encoded once, rather than on every call.
+    """
+    order = sorted(range(len(keys)), key=lambda i: keys[i])
+    prefixes = [encode_item(keys[i]) for i in order]
+
+    def encode(values):
+        chunks = [b"d"]
+
+        for prefix, i in zip(prefixes, order):
+            chunks.append(prefix)
+            _encode_item(values[i], chunks)
+
+        chunks.append(b"e")
+
+        return b"".join(chunks)
+
+    return encode
+
+
 def decode_item(string):
-    def closure(string):
-        if string == "":
-            return None, ""
+    def closure(index):
+        if index == len(string):
+            return None, index
 
-        elif string.startswith("i"):
-            match = re.match("i(-?\\d+)e", string)
-            return int(match.group(1)), string[match.span()[1] :]
+        head = string[index : index + 1]
 
-        elif string[0] in "0123456789":
-            match = re.match("(\\d+):", string)
-            start = match.span()[1]
-            end = start + int(match.group(1))
-            return string[start:end], string[end:]
+        if head == b"i":
+            end = string.index(b"e", index)
+            return int(string[index + 1 : end]), end + 1
 
-        elif string[0] in {"l", "d"}:
+        elif head.isdigit():
+            colon = string.index(b":", index)
+            start = colon + 1
+            end = start + int(string[index:colon])
+            return string[start:end], end
+
+        elif head in {b"l", b"d"}:
             elements = []
-            rest = string[1:]
+            index += 1
+
+            while string[index : index + 1] != b"e":
+                if index >= len(string):
+                    raise Exception(f"Malformed string {string!r}.")
 
-            while not rest.startswith("e"):
-                element, rest = closure(rest)
+                element, index = closure(index)
                 elements.append(element)
 
-            rest = rest[1:]
+            index += 1
 
-            if string.startswith("l"):
-                return elements, rest
+            if head == b"l":
+                return elements, index
 
-            return {k: v for k, v in zip(elements[::2], elements[1::2])}, rest
+            return {
+                k.decode("utf-8"): v for k, v in zip(elements[::2], elements[1::2])
+            }, index
 
         else:
-            raise Exception(f"Malformed string {string}.")
+            raise Exception(f"Malformed string {string!r}.")
 
-    return closure(string)[0]
+    return closure(0)[0]
@@ -0,0 +1,481 @@
+"""
+End-to-end load generator, which spawns a local cluster of daemons over TCP and
+drives it with concurrent writers, to measure throughput and commit latency as
+clients see them, and resources used by each server.
+
+- Writers append entries of a fixed size to the leader. Closed-loop writers
+  wait for each entry to be acknowledged as committed before appending the
+  next, while open-loop writers append at a fixed rate regardless.
+- Commit latency is timed by the client, from the append to the
+  ClientLogCommit acknowledging it. Open-loop appends are timed from when they
+  were due rather than sent, so that stalls in the writer are not hidden.
+- The leader is found by appending a probe entry to every server, and found
+  again whenever an append goes unacknowledged for the request timeout.
+- CPU time and memory of each server are read from /proc, so are only
+  available on Linux.
+
+Results are printed, and may be saved as JSON, to compare against results of
+an earlier release.
+"""
+
+from typing import Any, Dict, List, Optional
+import argparse
+import dataclasses
+import json
+import os
+import platform
+import signal
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import raftconfig
+import raftmessage
+import raftmetrics
+import raftnode
+import rafttransport
+
+# Identifier the load generator appends entries from.
+CLIENT = 0
+
+DAEMON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "raftdaemon.py")
+
+# Writer and sequence number at the start of each item, to match
+# acknowledgements to appends.
+KEY = struct.Struct(">IQ")
+
+# Writer number of leader probes.
+PROBE = 2**32 - 1
+
+
+def read_usage(pid: int) -> Dict[str, float]:
+    """
+    CPU seconds used by a process, and its current and peak resident memory
+    in bytes.
+    """
+    with open(f"/proc/{pid}/stat") as file:
+        # Fields after the command name, which may contain spaces.
+        fields = file.read().rpartition(")")[2].split()
+
+    ticks = os.sysconf("SC_CLK_TCK")
+    usage = {"cpu_seconds": (int(fields[11]) + int(fields[12])) / ticks}
+
+    with open(f"/proc/{pid}/status") as file:
+        for line in file:
+            name, _, value = line.partition(":")
+
+            if name == "VmRSS":
+                usage["rss_bytes"] = int(value.split()[0]) * 1024
+
+            elif name == "VmHWM":
+                usage["peak_rss_bytes"] = int(value.split()[0]) * 1024
+
+    return usage
+
+
+def read_revision() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(DAEMON),
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return output.stdout.strip()
+
+
+@dataclasses.dataclass
+class LocalCluster:
+    """
+    Servers run as daemons on consecutive ports, with logs to stderr at error
+    level only.
+    """
+
+    size: int = 3
+    port: int = 7100
+    client_port: int = 7099
+    timing: str = "low-latency"
+
+    def __post_init__(self) -> None:
+        self.directory: str = tempfile.mkdtemp(prefix="raftload-")
+        self.processes: Dict[int, subprocess.Popen] = {}
+        self.config: raftconfig.ClusterConfig = raftconfig.create_cluster_config(
+            self.size, port=self.port, client_address=("localhost", self.client_port)
+        )
+
+    def ready_file(self, identifier: int) -> str:
+        return os.path.join(self.directory, f"raft-{identifier}.ready")
+
+    def start(self, timeout: float) -> None:
+        for identifier in self.config.addresses:
+            command = [
+                sys.executable,
+                DAEMON,
+                str(identifier),
+                "tcp",
+                self.timing,
+                "--nodes",
+                str(self.size),
+                "--port",
+                str(self.port),
+                "--client-port",
+                str(self.client_port),
+                "--ready-file",
+                self.ready_file(identifier),
+                "--log-level",
+                "error",
+            ]
+            self.processes[identifier] = subprocess.Popen(command)
+
+        deadline = time.monotonic() + timeout
+
+        while not all(map(os.path.exists, map(self.ready_file, self.processes))):
+            if time.monotonic() > deadline:
+                raise Exception("Cluster not ready within timeout.")
+
+            time.sleep(0.05)
+
+    def usage(self) -> Dict[int, Dict[str, float]]:
+        return {
+            identifier: read_usage(process.pid)
+            for identifier, process in self.processes.items()
+        }
+
+    def stop(self, timeout: float = 5.0) -> None:
+        for process in self.processes.values():
+            process.send_signal(signal.SIGTERM)
+
+        for process in self.processes.values():
+            try:
+                process.wait(timeout)
+
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+        for identifier in self.processes:
+            if os.path.exists(self.ready_file(identifier)):
+                os.unlink(self.ready_file(identifier))
+
+        os.rmdir(self.directory)
+
+
+@dataclasses.dataclass
+class LoadGenerator:
+    cluster: raftconfig.ClusterConfig
+    writers: int = 4
+    size: int = 64
+    rate: Optional[float] = None
+    request_timeout: float = 1.0
+
+    def __post_init__(self) -> None:
+        if self.size < KEY.size:
+            raise Exception(f"Items must be at least {KEY.size} bytes.")
+
+        self.node: raftnode.RaftNode = raftnode.RaftNode(
+            CLIENT,
+            rafttransport.TcpTransport(
+                dict(self.cluster.addresses), self.cluster.client_address
+            ),
+            members=self.cluster.addresses,
+        )
+        self.lock: threading.Lock = threading.Lock()
+        self.leader: Optional[int] = None
+        self.found: threading.Event = threading.Event()
+
+        # Time each append was due, by key, until acknowledged, and an event
+        # set on acknowledgement for each writer.
+        self.pending: Dict[bytes, float] = {}
+        self.acknowledged: List[threading.Event] = [
+            threading.Event() for _ in range(self.writers)
+        ]
+        self.latencies: List[float] = []
+        self.lost: int = 0
+
+    def create_item(self, key: bytes) -> bytes:
+        return key + bytes(self.size - len(key))
+
+    def append(self, target: int, item: bytes) -> None:
+        message = raftmessage.ClientLogAppend(CLIENT, target, item)
+        self.node.send(target, raftmessage.encode_message(message))
+
+    def receive(self) -> None:
+        """
+        Run in background thread to time acknowledgements, and take their
+        source as the leader.
+        """
+        while True:
+            message = raftmessage.decode_message(self.node.receive())
+
+            if not isinstance(message, raftmessage.ClientLogCommit):
+                continue
+
+            now = time.monotonic()
+            key = message.item[: KEY.size]
+            writer, _ = KEY.unpack(key)
+
+            with self.lock:
+                self.leader = message.source
+                self.found.set()
+                due = self.pending.pop(key, None)
+
+            if due is not None:
+                self.latencies.append(now - due)
+                self.acknowledged[writer].set()
+
+    def find_leader(self, timeout: float) -> Optional[int]:
+        """
+        Probe all servers, returning the one acknowledging the probe, if any
+        within timeout.
+        """
+        deadline = time.monotonic() + timeout
+        sequence = 0
+
+        while time.monotonic() < deadline:
+            with self.lock:
+                if self.leader is not None:
+                    return self.leader
+
+                self.found.clear()
+
+            item = self.create_item(KEY.pack(PROBE, sequence))
+            sequence += 1
+
+            for identifier in self.cluster.addresses:
+                self.append(identifier, item)
+
+            self.found.wait(self.request_timeout)
+
+        return None
+
+    def lose_leader(self, leader: int, key: Optional[bytes] = None) -> None:
+        """
+        Find the leader again on the next append, counting the append with the
+        given key as lost unless acknowledged meanwhile.
+        """
+        with self.lock:
+            if key is not None and self.pending.pop(key, None) is not None:
+                self.lost += 1
+
+            if self.leader == leader:
+                self.leader = None
+
+    def write_closed(self, writer: int, end: float) -> None:
+        acknowledged = self.acknowledged[writer]
+        sequence = 0
+
+        while time.monotonic() < end:
+            leader = self.find_leader(end - time.monotonic())
+
+            if leader is None:
+                return None
+
+            key = KEY.pack(writer, sequence)
+            sequence += 1
+            acknowledged.clear()
+
+            with self.lock:
+                self.pending[key] = time.monotonic()
+
+            self.append(leader, self.create_item(key))
+
+            if not acknowledged.wait(self.request_timeout):
+                self.lose_leader(leader, key)
+
+    def write_open(self, writer: int, end: float, rate: float) -> None:
+        acknowledged = self.acknowledged[writer]
+        sequence = 0
+        due = heard = time.monotonic()
+
+        while due < end:
+            leader = self.find_leader(end - time.monotonic())
+
+            if leader is None:
+                return None
+
+            key = KEY.pack(writer, sequence)
+            sequence += 1
+
+            with self.lock:
+                self.pending[key] = due
+
+            self.append(leader, self.create_item(key))
+            now = time.monotonic()
+
+            # Find the leader again once none of the appends was acknowledged
+            # for the request timeout.
+            if acknowledged.is_set():
+                acknowledged.clear()
+                heard = now
+
+            elif now - heard > self.request_timeout:
+                self.lose_leader(leader)
+                heard = now
+
+            due += 1 / rate
+            time.sleep(max(due - time.monotonic(), 0))
+
+    def write(self, writer: int, end: float) -> None:
+        if self.rate is None:
+            self.write_closed(writer, end)
+
+        else:
+            self.write_open(writer, end, self.rate)
+
+    def start(self) -> None:
+        self.node.start()
+        threading.Thread(target=self.receive, daemon=True).start()
+
+    def run(self, duration: float) -> float:
+        """
+        Append entries for duration seconds, returning the time taken,
+        including waiting for the last acknowledgements.
+        """
+        start = time.monotonic()
+        end = start + duration
+        threads = [
+            threading.Thread(target=self.write, args=(writer, end), daemon=True)
+            for writer in range(self.writers)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        # Appends still pending after the request timeout count as lost.
+        deadline = time.monotonic() + self.request_timeout
+
+        while time.monotonic() < deadline:
+            with self.lock:
+                if not self.pending:
+                    break
+
+            time.sleep(0.01)
+
+        with self.lock:
+            self.lost += len(self.pending)
+            self.pending.clear()
+
+        return time.monotonic() - start
+
+
+def summarize(
+    latencies: List[float],
+    lost: int,
+    elapsed: float,
+    before: Dict[int, Dict[str, float]],
+    after: Dict[int, Dict[str, float]],
+) -> Dict[str, Any]:
+    return {
+        "commits": len(latencies),
+        "lost": lost,
+        "seconds": elapsed,
+        "commits_per_second": len(latencies) / elapsed,
+        "latency_seconds": {
+            "p50": raftmetrics.percentile(latencies, 0.5),
+            "p99": raftmetrics.percentile(latencies, 0.99),
+            "p999": raftmetrics.percentile(latencies, 0.999),
+            "max": max(latencies, default=0.0),
+        },
+        "nodes": {
+            str(identifier): {
+                "cpu_seconds": usage["cpu_seconds"] - before[identifier]["cpu_seconds"],
+                "cpu_percent": 100
+                * (usage["cpu_seconds"] - before[identifier]["cpu_seconds"])
+                / elapsed,
+                "rss_bytes": usage["rss_bytes"],
+                "peak_rss_bytes": usage["peak_rss_bytes"],
+            }
+            for identifier, usage in after.items()
+        },
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Ratio of results to baseline, above 1 when throughput or latency went up.
+    """
+    ratios = {
+        "commits_per_second": results["commits_per_second"]
+        / baseline["commits_per_second"]
+    }
+
+    for name, value in results["latency_seconds"].items():
+        if baseline["latency_seconds"].get(name):
+            ratios[f"{name} latency"] = value / baseline["latency_seconds"][name]
+
+    return ratios
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test a local cluster.")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--size", type=int, default=64, help="bytes per append")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="appends per second by each writer, open loop; closed loop if not given",
+    )
+    parser.add_argument(
+        "--timing", default="low-latency", choices=raftconfig.TIMING_PROFILES
+    )
+    parser.add_argument("--port", type=int, default=7100, help="port of server 1")
+    parser.add_argument("--client-port", type=int, default=7099)
+    parser.add_argument("--request-timeout", type=float, default=1.0)
+    parser.add_argument("--output", help="path to save results to as JSON")
+    parser.add_argument("--baseline", help="path of earlier results to compare to")
+    args = parser.parse_args()
+
+    cluster = LocalCluster(args.nodes, args.port, args.client_port, args.timing)
+    cluster.start(timeout=30)
+
+    try:
+        generator = LoadGenerator(
+            cluster.config, args.writers, args.size, args.rate, args.request_timeout
+        )
+        generator.start()
+
+        # Election of the first leader takes at least an election timeout.
+        timing = raftconfig.load_timing_profile(args.timing)
+
+        if generator.find_leader(10 * timing.election_timeout_max) is None:
+            raise Exception("No leader found within timeout.")
+
+        before = cluster.usage()
+        elapsed = generator.run(args.duration)
+        results = summarize(
+            generator.latencies, generator.lost, elapsed, before, cluster.usage()
+        )
+
+    finally:
+        cluster.stop()
+
+    results["config"] = vars(args)
+    results["revision"] = read_revision()
+    results["python"] = platform.python_version()
+    results["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+    print(json.dumps(results, indent=2))
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+        for name, ratio in compare(results, baseline).items():
+            print(f"{name:<20} {ratio:>8.3f}x")
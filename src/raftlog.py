@@ -9,6 +9,15 @@ append_entries operation is subject to a number of constraints.
 - If entries have a term number less than the term of the entry to be replaced,
   the entries with the smaller term and successive ones are deleted.
 
+Entries may also carry a cluster membership in place of a client item. Each
+server uses the latest membership in its log, whether committed or not (§4.1 of
+Raft dissertation), so a membership takes effect as soon as it is appended and
+is reverted if the entry is later deleted.
+
+Memberships list voting members and learners. Learners receive entries but
+neither vote nor count towards commits, and are marked for promotion to voting
+member once caught up, or else serve as read replicas.
+
 
 AppendEntries RPCs section in Figure 2 of Raft paper:
 
@@ -20,20 +29,44 @@ Receiver implementation:
  4. Append any new entries not already in the log
 """
 
-from typing import List
+from typing import Dict, List, Optional, Tuple
 import dataclasses
 
+Members = Dict[int, Tuple[str, int]]
+Learners = Dict[int, Tuple[str, int, bool]]
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(slots=True)
 class LogEntry:
     term: int
-    item: str
+    item: bytes
+    members: Optional[Members] = None
+    learners: Optional[Learners] = None
 
     def __equals__(self, other) -> bool:
-        return self.term == other.term and self.item == other.item
+        return (
+            self.term == other.term
+            and self.item == other.item
+            and self.members == other.members
+            and self.learners == other.learners
+        )
 
     def __repr__(self) -> str:
-        return f"LogEntry({str(self.term)}, '{self.item}')"
+        if self.members is not None:
+            return (
+                f"LogEntry({str(self.term)}, members={self.members}, "
+                + f"learners={self.learners})"
+            )
+
+        return f"LogEntry({str(self.term)}, {self.item!r})"
+
+
+def latest_members_index(log: List[LogEntry]) -> int:
+    for index in range(len(log) - 1, -1, -1):
+        if log[index].members is not None:
+            return index
+
+    return -1
 
 
 def is_equal_entry(log: List[LogEntry], previous_index: int, entry: LogEntry) -> bool:
@@ -0,0 +1,203 @@
+"""
+Structured logging, with records handed off to a background thread so that
+logging never blocks on console or file I/O.
+
+Each component logs to its own logger under "raft", e.g. "raft.server" and
+"raft.node". Records carry structured fields, rendered as key=value pairs or as
+JSON lines.
+
+- Per-message events are logged at debug level to "raft.message", and sampled
+  so that only one in every so many is kept. Call sites check the level first,
+  so with the default info level the hot path logs nothing.
+- Role changes, connection changes and errors are logged at info level and
+  above.
+- Level and sampling can be changed at runtime, with the "log" text command.
+"""
+
+from typing import Any, Dict, Optional
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+
+import raftrole
+
+ROOT = "raft"
+MESSAGE = "raft.message"
+
+LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+}
+
+listener: Optional[logging.handlers.QueueListener] = None
+
+
+def get_logger(component: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT}.{component}")
+
+
+def log(logger: logging.Logger, level: int, event: str, **fields: Any) -> None:
+    """
+    Log event with structured fields, skipping formatting when level disabled.
+    Fields are still built by the caller, so guard calls on hot paths with
+    isEnabledFor.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+
+class SampleFilter(logging.Filter):
+    """
+    Keep one in every rate records.
+    """
+
+    def __init__(self, rate: int = 1) -> None:
+        super().__init__()
+        self.rate = rate
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        with self.lock:
+            self.count += 1
+            return self.count % self.rate == 0
+
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    Records with a role field are coloured by role on terminals.
+    """
+
+    def __init__(self, color: bool = False) -> None:
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+        self.color = color
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields: Dict[str, Any] = getattr(record, "fields", {})
+        text = super().format(record)
+
+        if fields:
+            text += " " + " ".join(
+                f"{key}={value.value if isinstance(value, raftrole.Role) else value}"
+                for key, value in fields.items()
+            )
+
+        role = fields.get("role")
+
+        if self.color and isinstance(role, raftrole.Role):
+            text = raftrole.color(role) + text + "\033[0m"
+
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        attributes: Dict[str, Any] = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+
+        for key, value in getattr(record, "fields", {}).items():
+            attributes[key] = value.value if isinstance(value, raftrole.Role) else value
+
+        if record.exc_info:
+            attributes["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(attributes, default=repr)
+
+
+def sample_filter() -> SampleFilter:
+    logger = logging.getLogger(MESSAGE)
+
+    for existing in logger.filters:
+        if isinstance(existing, SampleFilter):
+            return existing
+
+    sample = SampleFilter()
+    logger.addFilter(sample)
+    return sample
+
+
+def set_level(level: str) -> None:
+    logging.getLogger(ROOT).setLevel(LEVELS[level])
+
+
+def set_sample_rate(rate: int) -> None:
+    if rate < 1:
+        raise Exception("Sample rate must be at least 1.")
+
+    sample_filter().rate = rate
+
+
+def configure(
+    level: str = "info",
+    sample_rate: int = 1,
+    json_format: bool = False,
+    stream: Any = None,
+) -> None:
+    """
+    Route all records through a queue to a single background writer. Safe to
+    call again to reconfigure.
+    """
+    global listener
+    shutdown()
+
+    stream = stream or sys.stderr
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(
+        JsonFormatter() if json_format else KeyValueFormatter(stream.isatty())
+    )
+
+    records: queue.Queue = queue.Queue()
+    listener = logging.handlers.QueueListener(records, handler)
+
+    logger = logging.getLogger(ROOT)
+    logger.handlers = [logging.handlers.QueueHandler(records)]
+    logger.propagate = False
+
+    set_level(level)
+    set_sample_rate(sample_rate)
+    listener.start()
+
+
+def shutdown() -> None:
+    """
+    Flush records still queued, e.g. ahead of os._exit.
+    """
+    global listener
+
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+        logger = logging.getLogger(ROOT)
+        logger.handlers = []
+        logger.propagate = True
+
+
+def handle_command(text: str) -> bool:
+    """
+    Runtime toggles, "log <level>" or "log sample <rate>". Returns whether the
+    text was a log command.
+    """
+    words = text.split()
+
+    match words:
+        case ["log", "sample", rate]:
+            set_sample_rate(int(rate))
+
+        case ["log", level] if level in LEVELS:
+            set_level(level)
+
+        case _:
+            return False
+
+    log(get_logger("logging"), logging.WARNING, "log settings changed", text=text)
+    return True
@@ -35,11 +35,32 @@ lastLogTerm     term of candidate’s last log entry (§5.4)
 Results:
 term            currentTerm, for candidate to update itself
 voteGranted     true means candidate received vote
+
+
+TransferLeadership asks the leader to hand over to the transferee. Once the
+transferee's log is up to date, the leader sends it TimeoutNow, on which it
+starts an election straight away (§3.10 of Raft dissertation).
+
+PreVote requests mirror RequestVote, with term set to the term the
+pre-candidate would stand in, i.e. one more than its currentTerm. Receivers do
+not update their own term or vote on the back of a pre-vote.
+
+AddMember and RemoveMember ask the leader to change cluster membership one
+server at a time, by appending the new membership to the log (§4.1 of Raft
+dissertation). Servers are added as learners, to be promoted once caught up
+unless added as read replicas. Log entries carrying a membership are encoded
+with member identifiers as string keys, as required of Bencode dictionaries.
+
+ClientLogCommit tells a client that an entry it appended has been committed,
+with the index and item of the entry, so that clients can match it to their
+append. It is sent by the leader that appended the entry, and never handled by
+servers.
 """
 
-from typing import List
+from typing import Any, Callable, Dict, List, Tuple, Type
 import dataclasses
 import enum
+import operator
 
 import rafthelpers
 import raftlog
@@ -48,38 +69,52 @@ import raftrole
 
 class MessageType(enum.Enum):
     CLIENT_LOG_APPEND = "CLIENT_LOG_APPEND"
+    CLIENT_LOG_COMMIT = "CLIENT_LOG_COMMIT"
     UPDATE_FOLLOWERS = "UPDATE_FOLLOWERS"
     APPEND_REQUEST = "APPEND_REQUEST"
     APPEND_RESPONSE = "APPEND_RESPONSE"
     RUN_ELECTION = "RUN_ELECTION"
     VOTE_REQUEST = "VOTE_REQUEST"
     VOTE_RESPONSE = "VOTE_RESPONSE"
+    RUN_PRE_VOTE = "RUN_PRE_VOTE"
+    PRE_VOTE_REQUEST = "PRE_VOTE_REQUEST"
+    PRE_VOTE_RESPONSE = "PRE_VOTE_RESPONSE"
+    TRANSFER_LEADERSHIP = "TRANSFER_LEADERSHIP"
+    TIMEOUT_NOW = "TIMEOUT_NOW"
+    ADD_MEMBER = "ADD_MEMBER"
+    REMOVE_MEMBER = "REMOVE_MEMBER"
     ROLE_CHANGE = "ROLE_CHANGE"
     TEXT = "TEXT"
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Message:
     source: int
     target: int
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Text(Message):
     text: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class ClientLogAppend(Message):
-    item: str
+    item: bytes
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
+class ClientLogCommit(Message):
+    index: int
+    item: bytes
+
+
+@dataclasses.dataclass(slots=True)
 class UpdateFollowers(Message):
     followers: List[int]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class AppendEntryRequest(Message):
     current_term: int
     previous_index: int
@@ -88,131 +123,250 @@ class AppendEntryRequest(Message):
     commit_index: int
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class AppendEntryResponse(Message):
     current_term: int
     success: bool
-    entries_length: int
+    match_index: int
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class RunElection(Message):
     followers: List[int]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class RequestVoteRequest(Message):
     current_term: int
     last_log_index: int
     last_log_term: int
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class RequestVoteResponse(Message):
     success: bool
     current_term: int
 
 
-@dataclasses.dataclass
-class RoleChange(Message):
-    from_role: raftrole.Role
-    to_role: raftrole.Role
+@dataclasses.dataclass(slots=True)
+class RunPreVote(Message):
+    followers: List[int]
 
 
-def encode_message(message: Message) -> str:
-    attributes = vars(message).copy()
+@dataclasses.dataclass(slots=True)
+class PreVoteRequest(Message):
+    current_term: int
+    last_log_index: int
+    last_log_term: int
 
-    match message:
-        case ClientLogAppend():
-            attributes["message_type"] = MessageType.CLIENT_LOG_APPEND.value
 
-        case UpdateFollowers():
-            attributes["message_type"] = MessageType.UPDATE_FOLLOWERS.value
+@dataclasses.dataclass(slots=True)
+class PreVoteResponse(Message):
+    success: bool
+    current_term: int
 
-        case AppendEntryRequest():
-            entries = []
 
-            for entry in message.entries:
-                entries.append(vars(entry))
+@dataclasses.dataclass(slots=True)
+class TransferLeadership(Message):
+    transferee: int
 
-            attributes["message_type"] = MessageType.APPEND_REQUEST.value
-            attributes["entries"] = entries
 
-        case AppendEntryResponse():
-            attributes["message_type"] = MessageType.APPEND_RESPONSE.value
-            attributes["success"] = int(attributes["success"])
+@dataclasses.dataclass(slots=True)
+class TimeoutNow(Message):
+    current_term: int
 
-        case RunElection():
-            attributes["message_type"] = MessageType.RUN_ELECTION.value
 
-        case RequestVoteRequest():
-            attributes["message_type"] = MessageType.VOTE_REQUEST.value
+@dataclasses.dataclass(slots=True)
+class AddMember(Message):
+    member: int
+    host: str
+    port: int
+    replica: bool = False
 
-        case RequestVoteResponse():
-            attributes["message_type"] = MessageType.VOTE_RESPONSE.value
-            attributes["success"] = int(attributes["success"])
 
-        case RoleChange():
-            attributes["message_type"] = MessageType.ROLE_CHANGE.value
-            attributes["from_role"] = attributes["from_role"].value
-            attributes["to_role"] = attributes["to_role"].value
+@dataclasses.dataclass(slots=True)
+class RemoveMember(Message):
+    member: int
 
-        case Text():
-            attributes["message_type"] = MessageType.TEXT.value
 
-        case _:
-            raise Exception(
-                f"Exhaustive switch error in encoding message with attributes {attributes}."
-            )
+@dataclasses.dataclass(slots=True)
+class RoleChange(Message):
+    from_role: raftrole.Role
+    to_role: raftrole.Role
 
-    return rafthelpers.encode_item(attributes)
 
+MESSAGE_TYPES: Dict[Type[Message], MessageType] = {
+    Text: MessageType.TEXT,
+    ClientLogAppend: MessageType.CLIENT_LOG_APPEND,
+    ClientLogCommit: MessageType.CLIENT_LOG_COMMIT,
+    UpdateFollowers: MessageType.UPDATE_FOLLOWERS,
+    AppendEntryRequest: MessageType.APPEND_REQUEST,
+    AppendEntryResponse: MessageType.APPEND_RESPONSE,
+    RunElection: MessageType.RUN_ELECTION,
+    RequestVoteRequest: MessageType.VOTE_REQUEST,
+    RequestVoteResponse: MessageType.VOTE_RESPONSE,
+    RunPreVote: MessageType.RUN_PRE_VOTE,
+    PreVoteRequest: MessageType.PRE_VOTE_REQUEST,
+    PreVoteResponse: MessageType.PRE_VOTE_RESPONSE,
+    TransferLeadership: MessageType.TRANSFER_LEADERSHIP,
+    TimeoutNow: MessageType.TIMEOUT_NOW,
+    AddMember: MessageType.ADD_MEMBER,
+    RemoveMember: MessageType.REMOVE_MEMBER,
+    RoleChange: MessageType.ROLE_CHANGE,
+}
+
+MESSAGE_CLASSES: Dict[MessageType, Type[Message]] = {
+    message_type: message_class for message_class, message_type in MESSAGE_TYPES.items()
+}
+
+# Field names of each message class in order, and a getter returning the
+# field values as a tuple, for positional calls without building a dict.
+FIELD_NAMES: Dict[Type[Message], Tuple[str, ...]] = {
+    message_class: tuple(field.name for field in dataclasses.fields(message_class))
+    for message_class in MESSAGE_TYPES
+}
+
+FIELD_VALUES: Dict[Type[Message], Callable[[Message], Tuple[Any, ...]]] = {
+    message_class: operator.attrgetter(*names)
+    for message_class, names in FIELD_NAMES.items()
+}
+
+
+def encode_entry(entry: raftlog.LogEntry) -> Dict[str, Any]:
+    attributes: Dict[str, Any] = {"term": entry.term, "item": entry.item}
+
+    if entry.members is not None:
+        attributes["members"] = {
+            str(identifier): list(address)
+            for identifier, address in entry.members.items()
+        }
+
+    if entry.learners is not None:
+        attributes["learners"] = {
+            str(identifier): [host, port, int(promote)]
+            for identifier, (host, port, promote) in entry.learners.items()
+        }
+
+    return attributes
+
+
+def decode_entry(attributes: Dict[str, Any]) -> raftlog.LogEntry:
+    members = attributes.get("members")
+    learners = attributes.get("learners")
+
+    if members is not None:
+        members = {
+            int(identifier): (host.decode("utf-8"), port)
+            for identifier, (host, port) in members.items()
+        }
+
+    if learners is not None:
+        learners = {
+            int(identifier): (host.decode("utf-8"), port, bool(promote))
+            for identifier, (host, port, promote) in learners.items()
+        }
+
+    return raftlog.LogEntry(attributes["term"], attributes["item"], members, learners)
+
+
+# Conversion of fields not native to Bencode, by field name as names mean the
+# same across message classes.
+FIELD_CONVERSIONS: Dict[str, Callable[[Any], Any]] = {
+    "entries": lambda entries: [encode_entry(entry) for entry in entries],
+    "success": int,
+    "replica": int,
+    "from_role": operator.attrgetter("value"),
+    "to_role": operator.attrgetter("value"),
+}
+
+
+def create_encoder(message_class: Type[Message]) -> Callable[[Message], bytes]:
+    """
+    Encoder writing the fields of a message class straight to Bencode, with no
+    intermediate dict of attributes to build and sort per message.
+    """
+    names = FIELD_NAMES[message_class]
+    values = FIELD_VALUES[message_class]
+    message_type = MESSAGE_TYPES[message_class].value
+    encode = rafthelpers.dict_encoder(names + ("message_type",))
+    conversions = [
+        (i, FIELD_CONVERSIONS[name])
+        for i, name in enumerate(names)
+        if name in FIELD_CONVERSIONS
+    ]
+
+    def encoder(message: Message) -> bytes:
+        fields = [*values(message), message_type]
+
+        for i, convert in conversions:
+            fields[i] = convert(fields[i])
+
+        return encode(fields)
 
-def decode_message(string: str) -> Message:
-    attributes = rafthelpers.decode_item(string)
+    return encoder
 
-    message_type = MessageType(attributes["message_type"])
-    del attributes["message_type"]
 
-    match message_type:
-        case MessageType.CLIENT_LOG_APPEND:
-            return ClientLogAppend(**attributes)
+ENCODERS: Dict[Type[Message], Callable[[Message], bytes]] = {
+    message_class: create_encoder(message_class) for message_class in MESSAGE_TYPES
+}
 
-        case MessageType.UPDATE_FOLLOWERS:
-            return UpdateFollowers(**attributes)
 
-        case MessageType.APPEND_REQUEST:
-            entries = []
+def encode_message(message: Message) -> bytes:
+    encoder = ENCODERS.get(type(message))
 
-            for entry in attributes["entries"]:
-                entries.append(raftlog.LogEntry(**entry))
+    if encoder is None:
+        raise Exception(f"Exhaustive switch error in encoding message {message}.")
 
-            attributes["entries"] = entries
-            return AppendEntryRequest(**attributes)
+    return encoder(message)
 
-        case MessageType.APPEND_RESPONSE:
-            attributes["success"] = bool(attributes["success"])
-            return AppendEntryResponse(**attributes)
 
-        case MessageType.RUN_ELECTION:
-            return RunElection(**attributes)
+def decode_message(string: bytes) -> Message:
+    attributes = rafthelpers.decode_item(string)
+    message_type = MessageType(attributes.pop("message_type").decode("ascii"))
 
-        case MessageType.VOTE_REQUEST:
-            return RequestVoteRequest(**attributes)
+    match message_type:
+        case MessageType.APPEND_REQUEST:
+            attributes["entries"] = [
+                decode_entry(entry) for entry in attributes["entries"]
+            ]
 
-        case MessageType.VOTE_RESPONSE:
+        case MessageType.APPEND_RESPONSE | MessageType.VOTE_RESPONSE | MessageType.PRE_VOTE_RESPONSE:
             attributes["success"] = bool(attributes["success"])
-            return RequestVoteResponse(**attributes)
+
+        case MessageType.ADD_MEMBER:
+            attributes["host"] = attributes["host"].decode("utf-8")
+            attributes["replica"] = bool(attributes["replica"])
 
         case MessageType.ROLE_CHANGE:
-            attributes["from_role"] = raftrole.Role(attributes["from_role"])
-            attributes["to_role"] = raftrole.Role(attributes["to_role"])
-            return RoleChange(**attributes)
+            attributes["from_role"] = raftrole.Role(
+                attributes["from_role"].decode("ascii")
+            )
+            attributes["to_role"] = raftrole.Role(attributes["to_role"].decode("ascii"))
 
         case MessageType.TEXT:
-            return Text(**attributes)
+            attributes["text"] = attributes["text"].decode("utf-8")
 
-        case _:
-            raise Exception(
-                f"Exhaustive switch error in decoding message with attributes {attributes}."
-            )
+    return MESSAGE_CLASSES[message_type](**attributes)
+
+
+def merge_messages(messages: List[Message]) -> List[Message]:
+    """
+    Keep only the latest AppendEntries request to each target, which carries
+    all entries of earlier ones not yet acknowledged, from the latest nextIndex.
+    All other messages are kept in order, in particular AppendEntries responses
+    which count entries relative to their request.
+    """
+    merged: List[Message] = []
+    targets = set()
+
+    for message in reversed(messages):
+        if isinstance(message, AppendEntryRequest):
+            if message.target in targets:
+                continue
+
+            targets.add(message.target)
+
+        merged.append(message)
+
+    merged.reverse()
+    return merged
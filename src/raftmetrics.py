@@ -0,0 +1,267 @@
+"""
+Metrics for finding bottlenecks under load, exposed over a local HTTP endpoint
+in the Prometheus text format.
+
+- Counters and histograms are updated on the hot path, each behind its own lock
+  and with no formatting until scraped.
+- Gauges may instead be collected when scraped, e.g. queue depths and
+  replication lag, so that they cost nothing between scrapes.
+
+Metric types follow the Prometheus exposition format, with histograms rendered
+as cumulative buckets together with the sum and count of observations.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import dataclasses
+import http.server
+import math
+import threading
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Bucket upper bounds in seconds, from 50 microseconds to 5 seconds.
+BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def create_labels(**labels: object) -> Labels:
+    return tuple((key, str(value)) for key, value in labels.items())
+
+
+def format_sample(name: str, labels: Labels, value: float) -> str:
+    if not labels:
+        return f"{name} {value!r}"
+
+    pairs = ",".join(f'{key}="{value}"' for key, value in labels)
+    return f"{name}{{{pairs}}} {value!r}"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of values, e.g. the median for a fraction of 0.5.
+    """
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+@dataclasses.dataclass
+class Counter:
+    """
+    Values are either incremented directly, or returned by collect when
+    scraped, for counts kept elsewhere.
+    """
+
+    name: str
+    description: str
+    collect: Optional[Callable[[], Dict[Labels, float]]] = None
+
+    def __post_init__(self) -> None:
+        self.values: Dict[Labels, float] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = create_labels(**labels)
+
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def value(self, **labels: object) -> float:
+        return self.values.get(create_labels(**labels), 0.0)
+
+    def render(self) -> List[str]:
+        if self.collect is not None:
+            values = self.collect()
+
+        else:
+            with self.lock:
+                values = dict(self.values)
+
+        return [format_sample(self.name, key, value) for key, value in values.items()]
+
+
+@dataclasses.dataclass
+class Gauge:
+    """
+    Values are either set directly, or returned by collect when scraped.
+    """
+
+    name: str
+    description: str
+    collect: Optional[Callable[[], Dict[Labels, float]]] = None
+
+    def __post_init__(self) -> None:
+        self.values: Dict[Labels, float] = {}
+
+    def set(self, value: float, **labels: object) -> None:
+        self.values[create_labels(**labels)] = value
+
+    def render(self) -> List[str]:
+        values = self.collect() if self.collect is not None else dict(self.values)
+        return [format_sample(self.name, key, value) for key, value in values.items()]
+
+
+@dataclasses.dataclass
+class Histogram:
+    name: str
+    description: str
+    buckets: Tuple[float, ...] = BUCKETS
+
+    def __post_init__(self) -> None:
+        # Per label set, count of observations in each bucket, with a final
+        # bucket for observations above the largest bound, and the sum.
+        self.counts: Dict[Labels, List[int]] = {}
+        self.sums: Dict[Labels, float] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = create_labels(**labels)
+        index = len(self.buckets)
+
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+
+        with self.lock:
+            counts = self.counts.get(key)
+
+            if counts is None:
+                counts = self.counts[key] = [0] * (len(self.buckets) + 1)
+                self.sums[key] = 0.0
+
+            counts[index] += 1
+            self.sums[key] += value
+
+    def count(self, **labels: object) -> int:
+        return sum(self.counts.get(create_labels(**labels), []))
+
+    def render(self) -> List[str]:
+        with self.lock:
+            snapshot = [
+                (key, list(counts), self.sums[key])
+                for key, counts in self.counts.items()
+            ]
+
+        lines = []
+
+        for key, counts, total in snapshot:
+            cumulative = 0
+
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    format_sample(
+                        f"{self.name}_bucket", key + (("le", le),), cumulative
+                    )
+                )
+
+            lines.append(format_sample(f"{self.name}_sum", key, total))
+            lines.append(format_sample(f"{self.name}_count", key, cumulative))
+
+        return lines
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+METRIC_TYPES = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}
+
+
+@dataclasses.dataclass
+class Registry:
+    def __post_init__(self) -> None:
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise Exception(f"Metric {metric.name} already registered.")
+
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self,
+        name: str,
+        description: str,
+        collect: Optional[Callable[[], Dict[Labels, float]]] = None,
+    ) -> Counter:
+        counter = Counter(name, description, collect)
+        self.register(counter)
+        return counter
+
+    def gauge(
+        self,
+        name: str,
+        description: str,
+        collect: Optional[Callable[[], Dict[Labels, float]]] = None,
+    ) -> Gauge:
+        gauge = Gauge(name, description, collect)
+        self.register(gauge)
+        return gauge
+
+    def histogram(
+        self, name: str, description: str, buckets: Tuple[float, ...] = BUCKETS
+    ) -> Histogram:
+        histogram = Histogram(name, description, buckets)
+        self.register(histogram)
+        return histogram
+
+    def render(self) -> str:
+        lines = []
+
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {METRIC_TYPES[type(metric)]}")
+            lines += metric.render()
+
+        return "\n".join(lines) + "\n"
+
+
+def serve(
+    registry: Registry, address: Tuple[str, int]
+) -> http.server.ThreadingHTTPServer:
+    """
+    Serve metrics at /metrics from a background thread.
+    """
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path != "/metrics":
+                self.send_error(404)
+                return None
+
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    server = http.server.ThreadingHTTPServer(address, Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
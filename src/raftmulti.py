@@ -0,0 +1,259 @@
+"""
+Multi-Raft host, running many consensus groups over one network runtime.
+
+Each group is a RaftState keyed by group identifier, with no threads or timers
+of its own, so per-group overhead is the state itself. Groups may span any
+subset of the hosts in the cluster.
+
+- Messages travel in envelopes, a list of (group, message) pairs, so that
+  messages for many groups between the same pair of hosts share a frame.
+- A single tick per heartbeat interval drives all groups. Leaders send
+  heartbeats on every tick while other groups time out once their election
+  deadline passes, so heartbeats for all groups led by a host are coalesced into
+  one envelope per peer host.
+- Ticks are handled on the same thread as incoming messages, so group state is
+  only ever touched from one thread.
+
+Envelopes are not understood by RaftServer, so hosts only talk to other hosts.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+import collections
+import dataclasses
+import logging
+import os
+import threading
+
+import raftconfig
+import raftframe
+import rafthelpers
+import raftlog
+import raftlogging
+import raftmessage
+import raftnode
+import raftrole
+import raftscheduler
+import raftstate
+import rafttransport
+
+LOGGER = raftlogging.get_logger("multi")
+
+Envelope = List[Tuple[int, raftmessage.Message]]
+
+# Placed on the incoming queue to run a tick. Frames from the network are never
+# empty, so cannot be mistaken for a tick.
+TICK = b""
+
+
+def encode_envelope(messages: Envelope) -> bytes:
+    return rafthelpers.encode_item(
+        [[group, raftmessage.encode_message(message)] for group, message in messages]
+    )
+
+
+def decode_envelope(payload: bytes) -> Envelope:
+    return [
+        (group, raftmessage.decode_message(message))
+        for group, message in rafthelpers.decode_item(payload)
+    ]
+
+
+@dataclasses.dataclass
+class Group:
+    state: raftstate.RaftState
+    election_at: float
+
+
+@dataclasses.dataclass
+class MultiRaftHost:
+    identifier: int
+    transport: rafttransport.Transport = dataclasses.field(
+        default_factory=rafttransport.TcpTransport
+    )
+    timing: raftconfig.TimingProfile = dataclasses.field(
+        default_factory=raftconfig.load_timing_profile
+    )
+    pre_vote: bool = False
+    members: raftlog.Members = dataclasses.field(
+        default_factory=lambda: dict(raftconfig.ADDRESS_BY_IDENTIFIER)
+    )
+    codecs: Tuple[raftframe.Codec, ...] = (raftframe.Codec.ZLIB,)
+    compression_threshold: Optional[int] = raftframe.COMPRESSION_THRESHOLD
+    scheduler: raftscheduler.Scheduler = dataclasses.field(
+        default_factory=raftscheduler.Scheduler
+    )
+
+    def __post_init__(self) -> None:
+        self.node: raftnode.RaftNode = raftnode.RaftNode(
+            self.identifier,
+            self.transport,
+            self.codecs,
+            self.compression_threshold,
+            self.members,
+        )
+        self.groups: Dict[int, Group] = {}
+        self.ticker: raftscheduler.Deadline = self.scheduler.schedule(
+            self.timing.heartbeat_interval, self.tick
+        )
+
+    def add_group(
+        self, group: int, members: Optional[Iterable[int]] = None
+    ) -> raftstate.RaftState:
+        """
+        Start a group across the given hosts, by default all of them. The same
+        group has to be added on each of its hosts.
+        """
+        config = {i: self.members[i] for i in (members or self.members)}
+
+        state = raftstate.RaftState(self.identifier)
+        state.pre_vote = self.pre_vote
+        state.config = config
+        state.initial_config = config
+        state.clock = self.scheduler.clock
+
+        self.groups[group] = Group(state, self.election_deadline())
+        return state
+
+    def remove_group(self, group: int) -> None:
+        self.groups.pop(group, None)
+
+    def election_deadline(self) -> float:
+        return self.scheduler.clock() + self.timing.election_timeout()
+
+    def tick(self) -> None:
+        self.node.incoming.put(TICK)
+        self.ticker.reset(self.timing.heartbeat_interval)
+
+    def expire(self) -> Envelope:
+        """
+        Time out groups led by this host, or past their election deadline.
+        """
+        now = self.scheduler.clock()
+        messages: Envelope = []
+
+        for group, entry in self.groups.items():
+            state = entry.state
+
+            if state.role != raftrole.Role.LEADER:
+                if now < entry.election_at:
+                    continue
+
+                entry.election_at = self.election_deadline()
+
+            message = raftstate.change_state_on_timeout(
+                state, self.timing.election_timeout_min
+            )
+
+            if message is not None:
+                messages.append((group, message))
+
+        return messages
+
+    def handle(self, messages: Envelope) -> Dict[int, Envelope]:
+        """
+        Handle messages, including any sent by groups to this host, and return
+        responses for other hosts batched by host.
+        """
+        pending = collections.deque(messages)
+        outgoing: Dict[int, Envelope] = {}
+
+        while pending:
+            group, message = pending.popleft()
+            entry = self.groups.get(group)
+
+            if entry is None:
+                continue
+
+            state = entry.state
+            role = state.role
+
+            if (role, type(message)) in raftstate.TIMEOUT_RESETS:
+                entry.election_at = self.election_deadline()
+
+            try:
+                responses = state.handle_message(message)
+
+            except Exception as e:
+                raftlogging.log(
+                    LOGGER, logging.WARNING, "message failed", group=group, error=e
+                )
+                continue
+
+            # Start election timeout afresh on role change.
+            if state.role != role:
+                entry.election_at = self.election_deadline()
+
+            for response in responses:
+                if response.target == self.identifier:
+                    pending.append((group, response))
+
+                else:
+                    outgoing.setdefault(response.target, []).append((group, response))
+
+        return outgoing
+
+    def send(self, outgoing: Dict[int, Envelope]) -> None:
+        for target, messages in outgoing.items():
+            self.node.send(target, encode_envelope(messages))
+
+    def respond(self) -> None:
+        while True:
+            payload = self.node.receive()
+
+            try:
+                messages = (
+                    self.expire() if payload == TICK else decode_envelope(payload)
+                )
+
+            except Exception as e:
+                raftlogging.log(LOGGER, logging.WARNING, "payload failed", error=e)
+                continue
+
+            self.send(self.handle(messages))
+
+    def leaders(self) -> List[int]:
+        return [
+            group
+            for group, entry in self.groups.items()
+            if entry.state.role == raftrole.Role.LEADER
+        ]
+
+    def start(self) -> None:
+        self.node.start()
+
+        if not self.scheduler.running:
+            self.scheduler.start()
+
+        threading.Thread(target=self.respond, daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = raftconfig.create_parser("Run a multi-Raft host.")
+    parser.add_argument("--groups", type=int, default=1, help="number of groups")
+    args = parser.parse_args()
+
+    cluster = raftconfig.parse_cluster_config(args)
+    raftlogging.configure(args.log_level, args.log_sample, args.log_json)
+    transport_type = rafttransport.TransportType(cluster.transport)
+
+    host = MultiRaftHost(
+        args.identifier,
+        rafttransport.create_transport(transport_type, cluster),
+        cluster.timing,
+        cluster.pre_vote,
+        cluster.addresses,
+        codecs=cluster.codecs,
+        compression_threshold=cluster.compression_threshold,
+    )
+
+    for group in range(args.groups):
+        host.add_group(group)
+
+    host.start()
+
+    while input(f"{args.identifier} > "):
+        print(f"leading {len(host.leaders())} of {len(host.groups)} groups.")
+
+    print("end.")
+    raftlogging.shutdown()
+    os._exit(0)
@@ -1,28 +1,229 @@
 """
 Network runtime that operates in the background, allowing servers to send and
 receive messages from each other. Minor changes to Dave's code. Wraps up a
-combination of threads, queues and sockets.
+combination of threads, queues and sockets, with the sockets provided by a
+pluggable transport.
 """
-from typing import Dict, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 import dataclasses
+import enum
+import logging
+import lzma
 import os
 import queue
+import random
 import socket
-import sys
 import threading
+import time
+import zlib
 
 import raftconfig
+import raftframe
+import raftlogging
+import rafttrace
+import rafttransport
 
 
-def initialize_socket(identifier: int) -> socket.socket:
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, True)
+CONNECT_TIMEOUT = 1.0
+BACKOFF_INITIAL = 0.1
+BACKOFF_MAXIMUM = 5.0
 
-    address = raftconfig.ADDRESS_BY_IDENTIFIER.get(identifier, ("localhost", 10000))
-    sock.bind(address)
-    sock.listen()
+LOGGER = raftlogging.get_logger("node")
 
-    return sock
+
+class ConnectionState(enum.Enum):
+    UP = "UP"
+    DOWN = "DOWN"
+    BACKING_OFF = "BACKING_OFF"
+
+
+def receive_exactly(sock: socket.socket, length: int) -> bytes:
+    chunks = []
+
+    while length > 0:
+        chunk = sock.recv(length)
+
+        if not chunk:
+            raise IOError("Connection closed by peer.")
+
+        chunks.append(chunk)
+        length -= len(chunk)
+
+    return b"".join(chunks)
+
+
+def close_socket(sock: socket.socket) -> None:
+    # Shutdown first, as close alone neither wakes a reader blocked on the
+    # socket nor tells the peer while that read is in progress.
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+
+    except OSError:
+        pass
+
+    sock.close()
+
+
+@dataclasses.dataclass
+class PeerConnection:
+    """
+    The single bidirectional connection to a peer, carrying traffic in both
+    directions. Either side may dial; the dialer announces its identifier in a
+    handshake, and if both sides dial at the same time the connection dialed by
+    the lower identifier is kept by both ends. Both sides also exchange the
+    compression codecs they support, and large payloads are compressed with
+    the preferred codec both ends understand.
+
+    Failed connects and sends move the connection into BACKING_OFF, with the
+    next attempt delayed by an exponential backoff with full jitter. While
+    backing off, messages to the peer are dropped immediately rather than each
+    paying for a connect.
+    """
+
+    identifier: int
+    address: Optional[rafttransport.Address]
+    local: int
+    transport: rafttransport.StreamTransport
+    codecs: Sequence[raftframe.Codec] = (raftframe.Codec.ZLIB,)
+    threshold: Optional[int] = raftframe.COMPRESSION_THRESHOLD
+
+    def __post_init__(self) -> None:
+        self.sock: Optional[socket.socket] = None
+        self.dialer: Optional[int] = None
+        self.codec: raftframe.Codec = raftframe.Codec.NONE
+        self.lock: threading.Lock = threading.Lock()
+        self.state: ConnectionState = ConnectionState.DOWN
+        self.failures: int = 0
+        self.retry_at: float = 0.0
+        self.attempts: int = 0
+        self.dropped: int = 0
+        self.on_change: Optional[Callable[[int, ConnectionState], None]] = None
+        self.on_connect: Optional[Callable[[socket.socket], None]] = None
+
+    def is_available(self) -> bool:
+        if self.state != ConnectionState.BACKING_OFF:
+            return True
+
+        return time.monotonic() >= self.retry_at
+
+    def change_state(self, state: ConnectionState) -> None:
+        if state == self.state:
+            return None
+
+        self.state = state
+
+        if self.on_change is not None:
+            self.on_change(self.identifier, state)
+
+    def attach(self, sock: socket.socket, dialer: int, mask: int) -> bool:
+        """
+        Adopt a newly established connection, unless the current connection is
+        the one both ends agree to keep. The mask holds the codecs supported by
+        the peer.
+        """
+        preferred = min(self.local, self.identifier)
+
+        with self.lock:
+            if (
+                self.sock is not None
+                and self.dialer == preferred
+                and dialer != preferred
+            ):
+                close_socket(sock)
+                return False
+
+            previous, self.sock, self.dialer = self.sock, sock, dialer
+            self.codec = raftframe.negotiate_codec(self.codecs, mask)
+
+        if previous is not None:
+            close_socket(previous)
+
+        self.failures = 0
+        self.change_state(ConnectionState.UP)
+        return True
+
+    def detach(self, sock: socket.socket) -> None:
+        with self.lock:
+            detached = self.sock is sock
+
+            if detached:
+                self.sock = None
+                self.dialer = None
+
+        close_socket(sock)
+
+        if detached and self.state == ConnectionState.UP:
+            self.change_state(ConnectionState.DOWN)
+
+    def connect(self) -> None:
+        if self.address is None:
+            raise OSError(f"No address to dial {self.identifier}.")
+
+        self.attempts += 1
+
+        # Bounded connect so an unreachable host cannot stall delivery.
+        sock = self.transport.connect(self.address, CONNECT_TIMEOUT)
+
+        try:
+            sock.sendall(
+                self.local.to_bytes(4, byteorder="big")
+                + raftframe.encode_codecs(self.codecs).to_bytes(1, byteorder="big")
+            )
+            mask = receive_exactly(sock, 1)[0]
+
+        except OSError:
+            sock.close()
+            raise
+
+        sock.settimeout(None)
+
+        if self.attach(sock, self.local, mask) and self.on_connect is not None:
+            self.on_connect(sock)
+
+    def fail(self, sock: Optional[socket.socket]) -> None:
+        if sock is not None:
+            self.detach(sock)
+
+            # Socket was replaced by another connection, still usable.
+            if self.sock is not None:
+                return None
+
+        delay = min(BACKOFF_MAXIMUM, BACKOFF_INITIAL * 2**self.failures)
+        self.retry_at = time.monotonic() + random.uniform(0, delay)
+        self.failures += 1
+
+        self.change_state(ConnectionState.BACKING_OFF)
+
+    def deliver(self, messages: List[bytes]) -> bool:
+        """
+        Write messages in a single call, so that messages queued together go
+        out together.
+        """
+        if not self.is_available():
+            self.dropped += len(messages)
+            return False
+
+        sock = self.sock
+
+        try:
+            if sock is None:
+                self.connect()
+                sock = self.sock
+
+            assert sock is not None
+            sock.sendall(
+                b"".join(
+                    raftframe.encode_frame(message, self.codec, self.threshold)
+                    for message in messages
+                )
+            )
+
+        except OSError:
+            self.dropped += len(messages)
+            self.fail(sock)
+            return False
+
+        return True
 
 
 @dataclasses.dataclass
@@ -42,62 +243,246 @@ class RaftNode:
     that waits for a message to arrive from anywhere.
 
     > message = node.receive()
+
+    Each pair of nodes shares one connection, with a single reader thread per
+    connection. Connection health of each peer is available with
+    `connection_states`, and `on_connection_change` is called whenever a peer
+    goes up or down.
+
+    With an in-process transport, there are no sockets or background threads:
+    sending puts the message directly on the incoming queue of the target.
     """
 
     identifier: int
+    transport: rafttransport.Transport = dataclasses.field(
+        default_factory=rafttransport.TcpTransport
+    )
+    codecs: Tuple[raftframe.Codec, ...] = (raftframe.Codec.ZLIB,)
+    compression_threshold: Optional[int] = raftframe.COMPRESSION_THRESHOLD
+    members: Dict[int, Tuple[str, int]] = dataclasses.field(
+        default_factory=lambda: dict(raftconfig.ADDRESS_BY_IDENTIFIER)
+    )
 
     def __post_init__(self) -> None:
-        self.socket: socket.socket = initialize_socket(self.identifier)
-        self.incoming: queue.Queue = queue.Queue()
-        self.outgoing: Dict[int, queue.Queue] = {
-            i: queue.Queue() for i in raftconfig.ADDRESS_BY_IDENTIFIER
+        # Simple queue, as its put is reentrant and so safe to call from
+        # signal handlers running on a thread blocked in get.
+        self.incoming: queue.SimpleQueue = queue.SimpleQueue()
+        self.outgoing: Dict[int, queue.Queue] = {}
+        self.connections: Dict[int, PeerConnection] = {}
+
+        # Handshakes run on a thread per accepted connection, any of which may
+        # register a peer not yet known.
+        self.lock: threading.Lock = threading.Lock()
+        self.on_connection_change: Optional[
+            Callable[[int, ConnectionState], None]
+        ] = None
+        self.started: bool = False
+        self.tracer: Optional[rafttrace.Tracer] = None
+
+        if isinstance(self.transport, rafttransport.InProcessTransport):
+            self.transport.attach(self.identifier, self.incoming)
+            return None
+
+        self.socket: socket.socket = self.transport.listen(self.identifier)
+
+        for i in self.members:
+            if i != self.identifier:
+                self.register(i, self.transport.address(i))
+
+    def register(
+        self, identifier: int, address: Optional[rafttransport.Address] = None
+    ) -> PeerConnection:
+        """
+        Track a peer, which may only be reachable through a connection it dials
+        itself when no address is given (e.g. clients).
+        """
+        assert isinstance(self.transport, rafttransport.StreamTransport)
+        connection = PeerConnection(
+            identifier,
+            address,
+            self.identifier,
+            self.transport,
+            self.codecs,
+            self.compression_threshold,
+        )
+        connection.on_change = self._connection_change
+        connection.on_connect = lambda sock: threading.Thread(
+            target=self._listen, args=(sock, connection), daemon=True
+        ).start()
+
+        self.outgoing[identifier] = queue.Queue()
+        self.connections[identifier] = connection
+
+        if self.started:
+            threading.Thread(
+                target=self.deliver, args=(identifier,), daemon=True
+            ).start()
+
+        return connection
+
+    def update_members(self, members: Dict[int, Tuple[str, int]]) -> None:
+        """
+        Track members added to the cluster. Connections to removed members are
+        left to go idle, since the same identifier may still dial in.
+        """
+        if isinstance(self.transport, rafttransport.InProcessTransport):
+            return None
+
+        if isinstance(self.transport, rafttransport.TcpTransport):
+            self.transport.addresses.update(members)
+
+        for identifier in members:
+            if identifier == self.identifier:
+                continue
+
+            with self.lock:
+                connection = self.connections.get(identifier)
+
+                if connection is None:
+                    self.register(identifier, self.transport.address(identifier))
+
+                # Peer may have dialed in before it was known to be a member.
+                elif connection.address is None:
+                    connection.address = self.transport.address(identifier)
+
+    def _connection_change(self, identifier: int, state: ConnectionState) -> None:
+        raftlogging.log(
+            LOGGER,
+            logging.INFO,
+            "connection change",
+            peer=identifier,
+            state=state.value,
+        )
+
+        if self.on_connection_change is not None:
+            self.on_connection_change(identifier, state)
+
+    def connection_states(self) -> Dict[int, ConnectionState]:
+        return {i: connection.state for i, connection in list(self.connections.items())}
+
+    def connection_metrics(self) -> Dict[int, Dict[str, int]]:
+        return {
+            i: {
+                "attempts": connection.attempts,
+                "failures": connection.failures,
+                "dropped": connection.dropped,
+            }
+            for i, connection in list(self.connections.items())
         }
 
-    def send(self, identifier: int, message: str) -> None:
-        self.outgoing[identifier].put(message.encode("ascii"))
+    def send(self, identifier: int, message: bytes) -> None:
+        rafttrace.enqueue(message)
+
+        # Messages to self skip the network altogether.
+        if identifier == self.identifier:
+            self.incoming.put(message)
+            return None
+
+        if isinstance(self.transport, rafttransport.InProcessTransport):
+            self.transport.deliver(identifier, message)
+            return None
+
+        connection = self.connections.get(identifier)
 
-    def receive(self) -> str:
+        # Drop messages to peers never known, e.g. clients not connected.
+        if connection is None:
+            return None
+
+        # Fast-fail messages to peers known to be down.
+        if not connection.is_available():
+            connection.dropped += 1
+            return None
+
+        self.outgoing[identifier].put(message)
+
+    def receive(self) -> bytes:
         return self.incoming.get()
 
-    def _listen(self, client: socket.socket) -> None:
+    def receive_batch(self, limit: int) -> List[bytes]:
+        """
+        Block for the next message, then take any others already queued, up to
+        limit in total.
+        """
+        messages = [self.incoming.get()]
+
+        while len(messages) < limit:
+            try:
+                messages.append(self.incoming.get_nowait())
+
+            except queue.Empty:
+                break
+
+        return messages
+
+    def _listen(
+        self, sock: socket.socket, connection: Optional[PeerConnection] = None
+    ) -> None:
+        """
+        Run in background thread for each connection, to put incoming messages
+        on the queue. Accepted connections first complete the handshake, which
+        names the peer.
+        """
+        if connection is None:
+            connection = self.accept(sock)
+
+            if connection is None:
+                return None
+
         try:
             while True:
-                length = int.from_bytes(client.recv(4), byteorder="big")
+                header = receive_exactly(sock, raftframe.HEADER_LENGTH)
+                length, codec = raftframe.decode_header(header)
 
                 if length == 0:
                     raise IOError
 
-                message = client.recv(length).decode("ascii")
-                self.incoming.put(message)
+                payload = raftframe.decompress(codec, receive_exactly(sock, length))
+                rafttrace.enqueue(payload)
+                self.incoming.put(payload)
+
+        # Corrupt frames, with an unknown codec or a payload that fails to
+        # decompress, leave the stream out of sync, so drop the connection.
+        except (IOError, ValueError, zlib.error, lzma.LZMAError):
+            connection.detach(sock)
 
-        except IOError:
+    def accept(self, client: socket.socket) -> Optional[PeerConnection]:
+        try:
+            client.settimeout(CONNECT_TIMEOUT)
+            handshake = receive_exactly(client, 5)
+            client.sendall(
+                raftframe.encode_codecs(self.codecs).to_bytes(1, byteorder="big")
+            )
+            client.settimeout(None)
+
+        except (IOError, ValueError):
             client.close()
+            return None
+
+        identifier = int.from_bytes(handshake[:4], byteorder="big")
+
+        with self.lock:
+            connection = self.connections.get(identifier) or self.register(identifier)
+
+        if not connection.attach(client, identifier, handshake[4]):
+            return None
+
+        return connection
 
     def listen(self) -> None:
         """
-        Run in background thread to listen for incoming connections and places
-        messages in incoming queue.
+        Run in background thread to listen for incoming connections, each with
+        its own thread for the handshake, so a peer slow to send it cannot hold
+        up others.
         """
         while True:
-            client, address = self.socket.accept()
-            threading.Thread(target=self._listen, args=(client,)).start()
-
-    def _deliver(
-        self, sock: Optional[socket.socket], address: Tuple[str, int], message: bytes
-    ) -> Optional[socket.socket]:
-        try:
-            if sock is None:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.connect(address)
-
-            sock.sendall(len(message).to_bytes(4, byteorder="big"))
-            sock.sendall(message)
+            try:
+                client, address = self.socket.accept()
 
-        except Exception as e:
-            print(e)
-            sock = None
+            # Listening socket shut down on stop.
+            except OSError:
+                return None
 
-        return sock
+            threading.Thread(target=self._listen, args=(client,), daemon=True).start()
 
     def deliver(self, identifier: int) -> None:
         """
@@ -105,36 +490,80 @@ class RaftNode:
         The delivery is best-efforts, in which the message is discarded if the
         remote server is not operational.
         """
-        sock = None
-        address = raftconfig.ADDRESS_BY_IDENTIFIER[identifier]
+        connection = self.connections[identifier]
+        outgoing = self.outgoing[identifier]
 
         try:
             while True:
-                message = self.outgoing[identifier].get()
-                sock = self._deliver(sock, address, message)
+                messages = [outgoing.get()]
+
+                while not outgoing.empty():
+                    messages.append(outgoing.get_nowait())
+
+                start = time.monotonic()
+                connection.deliver(messages)
+
+                if self.tracer is not None:
+                    self.tracer.delivered(messages, start, time.monotonic())
+
+                for _ in messages:
+                    outgoing.task_done()
 
         finally:
             # Defensive coding to avoid partial system failure.
-            print("panic!")
+            LOGGER.critical("panic", exc_info=True)
+            raftlogging.shutdown()
             os._exit(1)
 
     def start(self) -> None:
-        threading.Thread(target=self.listen, args=()).start()
+        self.started = True
+
+        if isinstance(self.transport, rafttransport.InProcessTransport):
+            return None
+
+        threading.Thread(target=self.listen, args=(), daemon=True).start()
+
+        for i in list(self.connections):
+            threading.Thread(target=self.deliver, args=(i,), daemon=True).start()
+
+        raftlogging.log(LOGGER, logging.INFO, "start", identifier=self.identifier)
+
+    def stop(self, timeout: float) -> bool:
+        """
+        Stop accepting connections, and wait up to timeout for messages already
+        queued to be written out, returning whether all were. Messages to peers
+        that are down are dropped rather than waited on.
+        """
+        if isinstance(self.transport, rafttransport.InProcessTransport):
+            self.transport.detach(self.identifier)
+            return True
+
+        # Shutdown wakes the listener thread blocked on accept.
+        close_socket(self.socket)
+        deadline = time.monotonic() + timeout
+
+        while any(outgoing.unfinished_tasks for outgoing in self.outgoing.values()):
+            if time.monotonic() >= deadline:
+                return False
 
-        for i in raftconfig.ADDRESS_BY_IDENTIFIER:
-            threading.Thread(target=self.deliver, args=(i,)).start()
+            time.sleep(0.01)
 
-        print("start.")
+        return True
 
 
-def run(identifier: int) -> None:
-    node = RaftNode(identifier)
+def run(identifier: int, cluster: raftconfig.ClusterConfig) -> None:
+    transport_type = rafttransport.TransportType(cluster.transport)
+    node = RaftNode(
+        identifier,
+        rafttransport.create_transport(transport_type, cluster),
+        members=cluster.addresses,
+    )
     node.start()
 
     def receive():
         while True:
             message = node.receive()
-            print(f"\n{identifier}: receive: {message}\n{identifier} > ", end="")
+            print(f"\n{identifier}: receive: {message!r}\n{identifier} > ", end="")
 
     threading.Thread(target=receive, args=()).start()
 
@@ -145,12 +574,15 @@ def run(identifier: int) -> None:
             break
 
         target, message = prompt.split(maxsplit=1)
-        node.send(int(target), message)
+        node.send(int(target), message.encode("utf-8"))
 
     # Ensures all threads are handled.
     print("end.")
+    raftlogging.shutdown()
     os._exit(0)
 
 
 if __name__ == "__main__":
-    run(int(sys.argv[1]))
+    args = raftconfig.create_parser("Run a bare node.").parse_args()
+    raftlogging.configure(args.log_level, args.log_sample, args.log_json)
+    run(args.identifier, raftconfig.parse_cluster_config(args))
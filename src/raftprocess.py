@@ -0,0 +1,223 @@
+"""
+Raft server split across two processes, so that network I/O and encoding and
+decoding of messages no longer compete with consensus for one interpreter lock.
+
+- The network process owns the RaftNode, with its sockets and delivery
+  threads. Messages received are decoded, and handed to the consensus process
+  in batches over a pipe.
+- The consensus process runs RaftServer with its state and timers. Responses
+  are handed back to the network process in batches, to be encoded and sent.
+
+Messages cross the pipe pickled, which is done in C rather than with the pure
+Python codec used on the wire. Messages the consensus process sends itself,
+e.g. on timeouts, never leave the process.
+
+Decode and encode times are not measured in split mode, and trace ids are
+carried across the pipe but spans are only recorded by the consensus process.
+"""
+
+from typing import List, Optional, Tuple
+import dataclasses
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import threading
+
+import raftconfig
+import raftlogging
+import raftmessage
+import raftnode
+import raftserver
+import rafttrace
+import rafttransport
+
+LOGGER = raftlogging.get_logger("process")
+
+# Outgoing messages to a target, with trace id.
+Outgoing = Tuple[int, Optional[int], raftmessage.Message]
+
+
+def receive(
+    node: raftnode.RaftNode,
+    connection: multiprocessing.connection.Connection,
+    lock: threading.Lock,
+) -> None:
+    """
+    Run in background thread of network process to hand received messages to
+    the consensus process.
+    """
+    while True:
+        messages: List[raftserver.Decoded] = []
+
+        for payload in node.receive_batch(raftserver.BATCH_LIMIT):
+            trace, payload = rafttrace.unwrap(payload)
+
+            try:
+                messages.append((trace, raftmessage.decode_message(payload)))
+
+            except Exception as e:
+                raftlogging.log(
+                    LOGGER, logging.WARNING, "message failed", payload=payload, error=e
+                )
+
+        with lock:
+            connection.send(("receive", messages))
+
+
+def serve_network(
+    identifier: int,
+    cluster: raftconfig.ClusterConfig,
+    connection: multiprocessing.connection.Connection,
+    log_settings: Tuple[str, int, bool],
+) -> None:
+    """
+    Run network process, until the consensus process closes the pipe.
+    """
+    raftlogging.configure(*log_settings)
+    transport_type = rafttransport.TransportType(cluster.transport)
+
+    node = raftnode.RaftNode(
+        identifier,
+        rafttransport.create_transport(transport_type, cluster),
+        cluster.codecs,
+        cluster.compression_threshold,
+        cluster.addresses,
+    )
+    lock = threading.Lock()
+
+    def connection_change(peer: int, state: raftnode.ConnectionState) -> None:
+        with lock:
+            connection.send(("connection", peer, state.value))
+
+    node.on_connection_change = connection_change
+    node.start()
+
+    threading.Thread(target=receive, args=(node, connection, lock), daemon=True).start()
+
+    try:
+        while True:
+            match connection.recv():
+                case ("send", outgoing):
+                    for target, trace, message in outgoing:
+                        payload = raftmessage.encode_message(message)
+
+                        if trace is not None:
+                            payload = rafttrace.wrap(trace, payload)
+
+                        node.send(target, payload)
+
+                case ("members", members):
+                    node.update_members(members)
+
+    except EOFError:
+        pass
+
+    raftlogging.shutdown()
+    os._exit(0)
+
+
+@dataclasses.dataclass
+class ProcessRaftServer(raftserver.RaftServer):
+    """
+    Consensus side of the split. Holds an in-process node, for messages the
+    server sends itself, while all other messages go through the pipe.
+    """
+
+    def __post_init__(self) -> None:
+        super().__post_init__()
+        self.connection: Optional[multiprocessing.connection.Connection] = None
+        self.outgoing: List[Outgoing] = []
+
+    def deliver(self, message: raftmessage.Message, trace: Optional[int]) -> None:
+        if message.target == self.identifier:
+            super().deliver(message, trace)
+            return None
+
+        self.outgoing.append((message.target, trace, message))
+
+    def send(self, messages: List[raftmessage.Message]) -> None:
+        super().send(messages)
+
+        if self.outgoing:
+            assert self.connection is not None
+            self.connection.send(("send", self.outgoing))
+            self.outgoing = []
+
+    def update_members(self) -> None:
+        addresses = self.state.create_addresses_dict()
+
+        if addresses != self.addresses:
+            assert self.connection is not None
+            self.addresses = addresses
+            self.connection.send(("members", addresses))
+
+    def forward(self) -> None:
+        """
+        Run in background thread to put messages from the network process on
+        the incoming queue.
+        """
+        assert self.connection is not None
+
+        try:
+            while True:
+                match self.connection.recv():
+                    case ("receive", messages):
+                        for message in messages:
+                            self.node.incoming.put(message)
+
+                    case ("connection", peer, state):
+                        self.connection_change(peer, raftnode.ConnectionState(state))
+
+        except EOFError:
+            LOGGER.error("network process exited")
+
+    def start_network(
+        self, cluster: raftconfig.ClusterConfig, log_settings: Tuple[str, int, bool]
+    ) -> multiprocessing.process.BaseProcess:
+        """
+        Spawn the network process, rather than fork, as threads may already be
+        running.
+        """
+        context = multiprocessing.get_context("spawn")
+        self.connection, remote = context.Pipe()
+
+        process = context.Process(
+            target=serve_network,
+            args=(self.identifier, cluster, remote, log_settings),
+            daemon=True,
+        )
+        process.start()
+        remote.close()
+
+        def forward() -> None:
+            self.forward()
+
+            # Server is of no use without its network process.
+            raftlogging.shutdown()
+            os._exit(1)
+
+        threading.Thread(target=forward, daemon=True).start()
+        return process
+
+
+if __name__ == "__main__":
+    args = raftconfig.create_parser(
+        "Run a Raft server, with network I/O in a separate process."
+    ).parse_args()
+    cluster = raftconfig.parse_cluster_config(args)
+    log_settings = (args.log_level, args.log_sample, args.log_json)
+    raftlogging.configure(*log_settings)
+
+    server = ProcessRaftServer(
+        args.identifier,
+        rafttransport.InProcessTransport(),
+        cluster.timing,
+        cluster.pre_vote,
+        raftserver.create_members(args.identifier, cluster, args.join),
+        cluster.codecs,
+        cluster.compression_threshold,
+    )
+    server.start_network(cluster, log_settings)
+    raftserver.configure(server, args)
+    server.run()
@@ -0,0 +1,138 @@
+"""
+Profiling of a running server for a bounded window, with the result written to
+disk, so that hot paths can be found under real traffic without a restart.
+
+- The cpu mode runs cProfile on the thread it is started from, i.e. the respond
+  loop, and writes pstats output readable with `python -m pstats`.
+- The sample mode records the stacks of all threads, including delivery and
+  listener threads, at a fixed interval from a background thread. Stacks are
+  written in the collapsed format, one stack per line with the number of
+  samples, as read by flamegraph tools such as speedscope.
+
+Only one profile runs at a time.
+"""
+
+from typing import Counter, Optional
+import cProfile
+import collections
+import dataclasses
+import os
+import sys
+import threading
+import time
+import types
+
+MODES = ("cpu", "sample")
+
+# Default window in seconds, and sampling interval.
+WINDOW = 10.0
+INTERVAL = 0.005
+
+
+@dataclasses.dataclass
+class SamplingProfiler:
+    interval: float = INTERVAL
+
+    def __post_init__(self) -> None:
+        self.stacks: Counter[str] = collections.Counter()
+        self.stopped: threading.Event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def sample(self) -> None:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+
+            functions = []
+            current: Optional[types.FrameType] = frame
+
+            while current is not None:
+                code = current.f_code
+                filename = os.path.basename(code.co_filename)
+                functions.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+                current = current.f_back
+
+            functions.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(functions))] += 1
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+        if self.thread is not None:
+            self.thread.join()
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+@dataclasses.dataclass
+class Profiler:
+    identifier: int
+    directory: str = "."
+
+    def __post_init__(self) -> None:
+        self.profile: Optional[cProfile.Profile] = None
+        self.sampler: Optional[SamplingProfiler] = None
+        self.path: Optional[str] = None
+
+    def running(self) -> bool:
+        return self.path is not None
+
+    def start(self, mode: str) -> str:
+        """
+        Start profiling, returning the path the profile is written to on stop.
+        """
+        if self.running():
+            raise Exception("Profiler already running.")
+
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        name = f"raft-{self.identifier}-{timestamp}"
+
+        match mode:
+            case "cpu":
+                self.profile = cProfile.Profile()
+                self.profile.enable()
+                self.path = os.path.join(self.directory, f"{name}.prof")
+
+            case "sample":
+                self.sampler = SamplingProfiler()
+                self.sampler.start()
+                self.path = os.path.join(self.directory, f"{name}.folded")
+
+            case _:
+                raise Exception(f"Unknown profile mode {mode}.")
+
+        return self.path
+
+    def stop(self) -> Optional[str]:
+        """
+        Stop profiling and write the profile, returning its path if running.
+        """
+        path, self.path = self.path, None
+
+        if self.profile is not None:
+            self.profile.disable()
+            assert path is not None
+            self.profile.dump_stats(path)
+            self.profile = None
+
+        if self.sampler is not None:
+            self.sampler.stop()
+            assert path is not None
+            self.sampler.dump(path)
+            self.sampler = None
+
+        return path
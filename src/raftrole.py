@@ -22,6 +22,12 @@ Candidates (§5.2):
   - Send RequestVote RPCs to all other servers
 - If votes received from majority of servers: become leader
 - If AppendEntries RPC received from new leader: convert to follower
+
+Pre-vote (§9.6 of Raft dissertation), when enabled:
+- On election timeout, followers become pre-candidates without incrementing
+  currentTerm, and ask other servers whether they would grant a vote
+- Only if a majority would, the pre-candidate becomes a candidate, so a
+  partitioned server does not inflate its term and disrupt the cluster on rejoin
 """
 from typing import Optional, Tuple, TypedDict
 import enum
@@ -30,8 +36,10 @@ import enum
 class Role(enum.Enum):
     LEADER = "LEADER"
     CANDIDATE = "CANDIDATE"
+    PRE_CANDIDATE = "PRE_CANDIDATE"
     FOLLOWER = "FOLLOWER"
     TIMER = "TIMER"
+    STRAW_POLL = "STRAW_POLL"
     ELECTION_COMMISSION = "ELECTION_COMMISSION"
     CONSTITUTION = "CONSTITUTION"
 
@@ -48,7 +56,7 @@ class StateChange(TypedDict):
     next_index: Operation
     match_index: Operation
     commit_index: Operation
-    has_followers: Operation
+    last_contact: Operation
     voted_for: Operation
     current_votes: Operation
 
@@ -67,8 +75,11 @@ def evaluate_role_change(
       voted_for since already voted.
     - If timer is source, then change target from follower to candidate,
       increase term by one and set voted_for to self.
+    - If straw poll is source, then change target from follower to
+      pre-candidate, with no change to current_term or voted_for.
     - If election commission is source, then change target from candidate to
       leader, but other changes handled in evaluate_operations_from_role_change.
+      For pre-candidate target, change to candidate as with timer.
     """
     current_term = target_term
     voted_for = Operation.PASS
@@ -101,6 +112,18 @@ def evaluate_role_change(
                 voted_for = Operation.RESET_TO_NONE
                 role_change = (Role.LEADER, Role.FOLLOWER)
 
+        # append entry request
+        case (Role.LEADER, Role.PRE_CANDIDATE):
+            if source_term > target_term:
+                current_term = source_term
+                voted_for = Operation.RESET_TO_NONE
+                role_change = (Role.PRE_CANDIDATE, Role.FOLLOWER)
+
+            elif source_term == target_term:
+                current_term = source_term
+                voted_for = Operation.PASS
+                role_change = (Role.PRE_CANDIDATE, Role.FOLLOWER)
+
         # vote request
         case (Role.CANDIDATE, Role.FOLLOWER):
             if source_term > target_term:
@@ -122,6 +145,13 @@ def evaluate_role_change(
                 voted_for = Operation.RESET_TO_NONE
                 role_change = (Role.LEADER, Role.FOLLOWER)
 
+        # vote request
+        case (Role.CANDIDATE, Role.PRE_CANDIDATE):
+            if source_term > target_term:
+                current_term = source_term
+                voted_for = Operation.RESET_TO_NONE
+                role_change = (Role.PRE_CANDIDATE, Role.FOLLOWER)
+
         # response to target when target send pre-change
         case (Role.FOLLOWER, Role.FOLLOWER):
             if source_term > target_term:
@@ -143,12 +173,31 @@ def evaluate_role_change(
                 voted_for = Operation.RESET_TO_NONE
                 role_change = (Role.LEADER, Role.FOLLOWER)
 
+        # pre-vote response
+        case (Role.FOLLOWER, Role.PRE_CANDIDATE):
+            if source_term > target_term:
+                current_term = source_term
+                voted_for = Operation.RESET_TO_NONE
+                role_change = (Role.PRE_CANDIDATE, Role.FOLLOWER)
+
         # timeout
         case (Role.TIMER, Role.FOLLOWER):
             current_term = target_term + 1
             voted_for = Operation.INITIALIZE
             role_change = (Role.FOLLOWER, Role.CANDIDATE)
 
+        # timeout with pre-vote
+        case (Role.STRAW_POLL, Role.FOLLOWER):
+            current_term = target_term
+            voted_for = Operation.PASS
+            role_change = (Role.FOLLOWER, Role.PRE_CANDIDATE)
+
+        # wins pre-vote
+        case (Role.ELECTION_COMMISSION, Role.PRE_CANDIDATE):
+            current_term = target_term + 1
+            voted_for = Operation.INITIALIZE
+            role_change = (Role.PRE_CANDIDATE, Role.CANDIDATE)
+
         # wins election
         case (Role.ELECTION_COMMISSION, Role.CANDIDATE):
             current_term = target_term
@@ -179,51 +228,76 @@ def evaluate_operations(
     - For commit_index, this may move as leader but not yet broadcasted to
       followers. To be safe, set this to None when change from leader to
       follower.
+    - For last_contact, only need to be dictionaries when promoted to be
+      leader, for the leader to track when each follower last responded. When
+      change from leader to follower, reset back to None.
     - For current_votes, only need to be dictionaries when change to candidate.
       Currently retain when promoted to leader. For candidate there is
       redundancy in having voted_for and current_votes show self voting. When
-      change from candidate to follower, set to None.
+      change from candidate to follower, set to None. Pre-candidates tally
+      pre-votes in current_votes, started afresh on becoming candidate.
     """
     match role_change:
         case (Role.FOLLOWER, Role.CANDIDATE):
             next_index = Operation.PASS
             match_index = Operation.PASS
             commit_index = Operation.PASS
-            has_followers = Operation.PASS
+            last_contact = Operation.PASS
+            current_votes = Operation.INITIALIZE
+
+        case (Role.FOLLOWER, Role.PRE_CANDIDATE):
+            next_index = Operation.PASS
+            match_index = Operation.PASS
+            commit_index = Operation.PASS
+            last_contact = Operation.PASS
+            current_votes = Operation.INITIALIZE
+
+        case (Role.PRE_CANDIDATE, Role.CANDIDATE):
+            next_index = Operation.PASS
+            match_index = Operation.PASS
+            commit_index = Operation.PASS
+            last_contact = Operation.PASS
             current_votes = Operation.INITIALIZE
 
         case (Role.CANDIDATE, Role.LEADER):
             next_index = Operation.INITIALIZE
             match_index = Operation.INITIALIZE
             commit_index = Operation.PASS
-            has_followers = Operation.INITIALIZE
+            last_contact = Operation.INITIALIZE
             current_votes = Operation.PASS
 
         case (Role.LEADER, Role.FOLLOWER):
             next_index = Operation.RESET_TO_NONE
             match_index = Operation.RESET_TO_NONE
             commit_index = Operation.RESET_TO_NONE
-            has_followers = Operation.RESET_TO_NONE
+            last_contact = Operation.RESET_TO_NONE
             current_votes = Operation.RESET_TO_NONE
 
         case (Role.CANDIDATE, Role.FOLLOWER):
             next_index = Operation.PASS
             match_index = Operation.PASS
             commit_index = Operation.PASS
-            has_followers = Operation.PASS
+            last_contact = Operation.PASS
+            current_votes = Operation.RESET_TO_NONE
+
+        case (Role.PRE_CANDIDATE, Role.FOLLOWER):
+            next_index = Operation.PASS
+            match_index = Operation.PASS
+            commit_index = Operation.PASS
+            last_contact = Operation.PASS
             current_votes = Operation.RESET_TO_NONE
 
         case None:
             next_index = Operation.PASS
             match_index = Operation.PASS
             commit_index = Operation.PASS
-            has_followers = Operation.PASS
+            last_contact = Operation.PASS
             current_votes = Operation.PASS
 
         case _:
             raise Exception("Invalid state change error.")
 
-    return next_index, match_index, commit_index, has_followers, current_votes
+    return next_index, match_index, commit_index, last_contact, current_votes
 
 
 def enumerate_state_change(
@@ -240,7 +314,7 @@ def enumerate_state_change(
         next_index,
         match_index,
         commit_index,
-        has_followers,
+        last_contact,
         current_votes,
     ) = evaluate_operations(role_change)
 
@@ -250,7 +324,7 @@ def enumerate_state_change(
         next_index=next_index,
         match_index=match_index,
         commit_index=commit_index,
-        has_followers=has_followers,
+        last_contact=last_contact,
         voted_for=voted_for,
         current_votes=current_votes,
     )
@@ -264,6 +338,9 @@ def color(role: Role) -> str:
         case Role.CANDIDATE:
             return "\033[93m"
 
+        case Role.PRE_CANDIDATE:
+            return "\033[33m"
+
         case Role.FOLLOWER:
             return "\033[31m"
 
@@ -0,0 +1,151 @@
+"""
+Round-trip time estimation and the timing derived from it, so that failover
+tightens on fast networks and stays stable on slow ones.
+
+Estimates follow the smoothed RTT and RTT variance of TCP retransmission timers
+(RFC 6298). The leader samples each peer from AppendEntries request/response
+pairs, only timing a request when no other is outstanding to that peer, so
+responses are never matched to the wrong request. Followers never send
+AppendEntries, and instead estimate the gap between heartbeats from the leader,
+which the leader has already paced on its round-trip times.
+
+The derived heartbeat interval allows for twice the slowest round-trip timeout,
+bounded by the configured timing profile, with election timeouts scaled in
+proportion to the heartbeat. Followers arm their election timeouts from the gaps
+seen so far, so the leader widens its interval by at most half again on each
+heartbeat, for a spike in round-trip times to never outrun the followers.
+"""
+from typing import Dict, Optional
+import dataclasses
+
+import raftconfig
+
+
+ALPHA = 0.125
+BETA = 0.25
+VARIANCE_FACTOR = 4
+HEARTBEAT_FACTOR = 2
+MAXIMUM_GROWTH = 1.5
+
+
+@dataclasses.dataclass
+class RttEstimator:
+    def __post_init__(self) -> None:
+        self.srtt: Optional[float] = None
+        self.rttvar: float = 0.0
+
+    def update(self, sample: float) -> None:
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2
+            return None
+
+        self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - sample)
+        self.srtt = (1 - ALPHA) * self.srtt + ALPHA * sample
+
+    def timeout(self) -> Optional[float]:
+        if self.srtt is None:
+            return None
+
+        return self.srtt + VARIANCE_FACTOR * self.rttvar
+
+
+@dataclasses.dataclass
+class AdaptiveTiming:
+    profile: raftconfig.TimingProfile
+
+    def __post_init__(self) -> None:
+        self.estimators: Dict[int, RttEstimator] = {}
+        self.pending: Dict[int, float] = {}
+        self.heartbeats: RttEstimator = RttEstimator()
+        self.last_heartbeat: Optional[float] = None
+        self.interval: Optional[float] = None
+
+    def on_request(self, identifier: int, now: float) -> None:
+        """
+        AppendEntries request sent to a peer. Requests outstanding for longer
+        than an election timeout are assumed lost.
+        """
+        sent = self.pending.get(identifier)
+
+        if sent is None or now - sent > self.profile.election_timeout_max:
+            self.pending[identifier] = now
+
+    def on_response(self, identifier: int, now: float) -> None:
+        sent = self.pending.pop(identifier, None)
+
+        if sent is not None:
+            self.estimators.setdefault(identifier, RttEstimator()).update(now - sent)
+
+    def on_heartbeat(self, now: float) -> None:
+        """
+        AppendEntries request received from the leader. Gaps longer than an
+        election timeout span a leader change and are not sampled, while gaps
+        well under the minimum heartbeat interval are retries of rejected
+        requests rather than heartbeats, and are skipped altogether.
+        """
+        minimum = self.profile.minimum_heartbeat_interval or 0
+
+        if self.last_heartbeat is not None:
+            gap = now - self.last_heartbeat
+
+            if gap < minimum / 2:
+                return None
+
+            if gap <= self.profile.election_timeout_max:
+                self.heartbeats.update(gap)
+
+        self.last_heartbeat = now
+
+    def reset(self) -> None:
+        self.pending.clear()
+        self.last_heartbeat = None
+        self.interval = None
+
+    def heartbeat_interval(self, leader: bool) -> float:
+        if leader:
+            timeouts = [estimator.timeout() for estimator in self.estimators.values()]
+            measured = [timeout for timeout in timeouts if timeout is not None]
+            interval = HEARTBEAT_FACTOR * max(measured) if measured else None
+
+            # Grow from the last interval, or for a new leader from the gaps
+            # it saw as a follower.
+            previous = self.interval or self.heartbeats.timeout()
+
+            if previous is not None:
+                interval = min(
+                    interval or self.profile.heartbeat_interval,
+                    MAXIMUM_GROWTH * previous,
+                )
+
+        else:
+            interval = self.heartbeats.timeout()
+
+        if interval is None:
+            return self.profile.heartbeat_interval
+
+        assert self.profile.minimum_heartbeat_interval is not None
+        return min(
+            self.profile.heartbeat_interval,
+            max(self.profile.minimum_heartbeat_interval, interval),
+        )
+
+    def next_heartbeat(self) -> float:
+        """
+        Interval until the leader's next heartbeat, kept as the base for the
+        growth of the one after.
+        """
+        self.interval = self.current_profile(True).heartbeat_interval
+        return self.interval
+
+    def current_profile(self, leader: bool) -> raftconfig.TimingProfile:
+        if self.profile.minimum_heartbeat_interval is None:
+            return self.profile
+
+        scale = self.heartbeat_interval(leader) / self.profile.heartbeat_interval
+
+        return raftconfig.TimingProfile(
+            self.profile.heartbeat_interval * scale,
+            self.profile.election_timeout_min * scale,
+            self.profile.election_timeout_max * scale,
+        )
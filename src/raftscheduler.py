@@ -0,0 +1,136 @@
+"""
+Single-threaded scheduler for timeouts, replacing a thread per timer. Deadlines
+are kept in a heap ordered by monotonic time and fired from one background
+thread.
+
+Resetting a deadline to a later time, as happens on every heartbeat, only
+updates the deadline in place. The stale heap entry is pushed back to the new
+time when it comes up, so resets cost no heap operations in the common case.
+"""
+from typing import Callable, List, Optional, Tuple
+import dataclasses
+import heapq
+import itertools
+import threading
+import time
+
+import raftlogging
+
+LOGGER = raftlogging.get_logger("scheduler")
+
+
+@dataclasses.dataclass
+class Deadline:
+    scheduler: "Scheduler"
+    callback: Callable[[], None]
+    when: float
+
+    def __post_init__(self) -> None:
+        # Time of the live heap entry for this deadline, if any.
+        self.scheduled: Optional[float] = None
+        self.cancelled: bool = False
+
+    def reset(self, delay: float) -> None:
+        self.scheduler.reset(self, delay)
+
+    def cancel(self) -> None:
+        self.scheduler.cancel(self)
+
+
+@dataclasses.dataclass
+class Scheduler:
+    clock: Callable[[], float] = time.monotonic
+
+    def __post_init__(self) -> None:
+        self.heap: List[Tuple[float, int, Deadline]] = []
+        self.counter: itertools.count = itertools.count()
+        self.condition: threading.Condition = threading.Condition()
+        self.running: bool = False
+        self.thread: Optional[threading.Thread] = None
+
+    def _push(self, deadline: Deadline) -> None:
+        deadline.scheduled = deadline.when
+        heapq.heappush(self.heap, (deadline.when, next(self.counter), deadline))
+        self.condition.notify()
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> Deadline:
+        """
+        Run callback once after delay seconds. The returned deadline can be
+        reset to run again, or cancelled.
+        """
+        with self.condition:
+            deadline = Deadline(self, callback, self.clock() + delay)
+            self._push(deadline)
+
+        return deadline
+
+    def reset(self, deadline: Deadline, delay: float) -> None:
+        with self.condition:
+            deadline.when = self.clock() + delay
+            deadline.cancelled = False
+
+            # A later time is picked up lazily by the existing heap entry.
+            if deadline.scheduled is None or deadline.when < deadline.scheduled:
+                self._push(deadline)
+
+    def cancel(self, deadline: Deadline) -> None:
+        with self.condition:
+            deadline.cancelled = True
+            deadline.scheduled = None
+
+    def _next(self) -> Optional[Deadline]:
+        """
+        Wait for and return the next due deadline, or None when stopped.
+        """
+        with self.condition:
+            while self.running:
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+
+                when, _, deadline = self.heap[0]
+                now = self.clock()
+
+                if when > now:
+                    self.condition.wait(when - now)
+                    continue
+
+                heapq.heappop(self.heap)
+
+                # Skip entries superseded by an earlier reset or a cancel.
+                if deadline.cancelled or deadline.scheduled != when:
+                    continue
+
+                if deadline.when > when:
+                    self._push(deadline)
+                    continue
+
+                deadline.scheduled = None
+                return deadline
+
+        return None
+
+    def run(self) -> None:
+        while True:
+            deadline = self._next()
+
+            if deadline is None:
+                return None
+
+            # Timer thread is shared by all deadlines, so must outlive any one
+            # failing callback.
+            try:
+                deadline.callback()
+
+            except Exception:
+                LOGGER.error("callback failed", exc_info=True)
+
+    def start(self) -> None:
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        with self.condition:
+            self.running = False
+            self.condition.notify()
@@ -2,102 +2,635 @@
 Combines state, network runtime and timer to act as a single Raft server.
 """
 
-from typing import List
+from typing import Dict, List, Optional, Tuple, Union
+import argparse
 import dataclasses
+import logging
 import os
-import random
-import sys
-import threading
+import signal
 import time
 
+import raftconfig
+import raftframe
+import raftlog
+import raftlogging
 import raftmessage
+import raftmetrics
 import raftnode
+import raftprofile
 import raftrole
+import raftrtt
+import raftscheduler
 import raftstate
+import rafttrace
+import rafttransport
 
 
-TIMEOUT = 3
+LOGGER = raftlogging.get_logger("server")
+MESSAGES = logging.getLogger(raftlogging.MESSAGE)
+
+# Most messages handled before responses are flushed.
+BATCH_LIMIT = 1024
+
+# Longest wait for messages queued to be written out on shutdown.
+SHUTDOWN_TIMEOUT = 5.0
+
+# Placed on the incoming queue by the timer, for timeouts to be handled on the
+# respond thread. Frames from the network are never empty, so cannot be mistaken
+# for a timeout.
+TIMEOUT = b""
+
+# Message already decoded, e.g. by a network process, with its trace id.
+Decoded = Tuple[Optional[int], raftmessage.Message]
 
 
 @dataclasses.dataclass
 class RaftServer:
     identifier: int
+    transport: rafttransport.Transport = dataclasses.field(
+        default_factory=rafttransport.TcpTransport
+    )
+    timing: raftconfig.TimingProfile = dataclasses.field(
+        default_factory=raftconfig.load_timing_profile
+    )
+    pre_vote: bool = False
+    members: raftlog.Members = dataclasses.field(
+        default_factory=lambda: dict(raftconfig.ADDRESS_BY_IDENTIFIER)
+    )
+    codecs: Tuple[raftframe.Codec, ...] = (raftframe.Codec.ZLIB,)
+    compression_threshold: Optional[int] = raftframe.COMPRESSION_THRESHOLD
 
     def __post_init__(self) -> None:
         self.state: raftstate.RaftState = raftstate.RaftState(self.identifier)
-        self.node: raftnode.RaftNode = raftnode.RaftNode(self.identifier)
-        self.timer: threading.Timer = threading.Timer(TIMEOUT, self.timeout)
-        self.reset: bool = True
+        self.state.pre_vote = self.pre_vote
+        self.state.config = self.members
+        self.state.initial_config = self.members
+        self.node: raftnode.RaftNode = raftnode.RaftNode(
+            self.identifier,
+            self.transport,
+            self.codecs,
+            self.compression_threshold,
+            self.members,
+        )
+        self.scheduler: raftscheduler.Scheduler = raftscheduler.Scheduler()
+        self.adaptive: raftrtt.AdaptiveTiming = raftrtt.AdaptiveTiming(self.timing)
+        self.deadline: raftscheduler.Deadline = self.scheduler.schedule(
+            self.timeout_duration(), self.timeout
+        )
+
+        self.node.on_connection_change = self.connection_change
+        self.addresses: raftlog.Members = self.state.create_addresses_dict()
+
+        # Time each entry was appended to the leader log, until committed.
+        self.appended: Dict[int, float] = {}
+
+        # Client that appended each entry in the leader log, until committed.
+        self.clients: Dict[int, int] = {}
+
+        # Trace id of messages to send, by object identity, and of entries in
+        # the leader log not yet committed, by index, while tracing.
+        self.tracer: Optional[rafttrace.Tracer] = None
+        self.traces: Dict[int, int] = {}
+        self.entry_traces: Dict[int, int] = {}
+
+        self.profiler: raftprofile.Profiler = raftprofile.Profiler(self.identifier)
+        self.profile_deadline: Optional[raftscheduler.Deadline] = None
+        self.running: bool = True
+
+        # File term, vote and log are persisted to, if any, and what was last
+        # persisted, to skip rewriting the file when unchanged.
+        self.state_path: Optional[str] = None
+        self.persisted: Optional[Tuple[int, Optional[int], int, int]] = None
+        self.metrics: raftmetrics.Registry = raftmetrics.Registry()
+        self.create_metrics()
+
+    def create_metrics(self) -> None:
+        metrics = self.metrics
+        self.handle_seconds: raftmetrics.Histogram = metrics.histogram(
+            "raft_handle_seconds", "Time to handle a message, by message type."
+        )
+        self.decode_seconds: raftmetrics.Histogram = metrics.histogram(
+            "raft_decode_seconds", "Time to decode a message."
+        )
+        self.encode_seconds: raftmetrics.Histogram = metrics.histogram(
+            "raft_encode_seconds", "Time to encode a message."
+        )
+        self.commit_seconds: raftmetrics.Histogram = metrics.histogram(
+            "raft_commit_seconds", "Time from append to commit on the leader."
+        )
+        self.role_changes: raftmetrics.Counter = metrics.counter(
+            "raft_role_changes_total",
+            "Role changes by new role, counting elections started as CANDIDATE.",
+        )
+
+        metrics.gauge(
+            "raft_incoming_queue_depth",
+            "Messages waiting to be handled.",
+            lambda: {(): self.node.incoming.qsize()},
+        )
+        metrics.gauge(
+            "raft_outgoing_queue_depth",
+            "Messages waiting to be sent, by peer.",
+            lambda: {
+                raftmetrics.create_labels(peer=i): outgoing.qsize()
+                for i, outgoing in list(self.node.outgoing.items())
+            },
+        )
+        metrics.gauge(
+            "raft_term", "Current term.", lambda: {(): self.state.current_term}
+        )
+        metrics.gauge(
+            "raft_commit_index",
+            "Index of highest entry committed.",
+            lambda: {(): self.state.commit_index},
+        )
+        metrics.gauge(
+            "raft_log_length", "Entries in the log.", lambda: {(): len(self.state.log)}
+        )
+        metrics.gauge(
+            "raft_peer_state",
+            "Connection state by peer, 1 for the current state.",
+            self.peer_states,
+        )
+        metrics.counter(
+            "raft_peer_connect_attempts_total",
+            "Connection attempts by peer.",
+            lambda: self.peer_counts("attempts"),
+        )
+        metrics.gauge(
+            "raft_peer_connect_failures",
+            "Consecutive failed connection attempts by peer.",
+            lambda: self.peer_counts("failures"),
+        )
+        metrics.counter(
+            "raft_peer_dropped_messages_total",
+            "Messages dropped by peer, while down or on failed writes.",
+            lambda: self.peer_counts("dropped"),
+        )
+        metrics.gauge(
+            "raft_follower_next_index",
+            "Index of next entry to send, by follower.",
+            lambda: self.replication_indexes(False),
+        )
+        metrics.gauge(
+            "raft_follower_match_index",
+            "Index of highest entry known to be replicated, by follower.",
+            lambda: self.replication_indexes(True),
+        )
+        metrics.gauge(
+            "raft_follower_lag_entries",
+            "Entries in the leader log not yet replicated, by follower.",
+            self.replication_lag,
+        )
+
+    def peer_states(self) -> Dict[raftmetrics.Labels, float]:
+        return {
+            raftmetrics.create_labels(peer=i, state=state.value): float(
+                state == current
+            )
+            for i, current in self.node.connection_states().items()
+            for state in raftnode.ConnectionState
+        }
+
+    def peer_counts(self, name: str) -> Dict[raftmetrics.Labels, float]:
+        return {
+            raftmetrics.create_labels(peer=i): counts[name]
+            for i, counts in self.node.connection_metrics().items()
+        }
+
+    def replication_indexes(self, match: bool) -> Dict[raftmetrics.Labels, float]:
+        indexes = self.state.match_index if match else self.state.next_index
+
+        if indexes is None:
+            return {}
+
+        return {
+            raftmetrics.create_labels(peer=i): -1 if index is None else index
+            for i, index in list(indexes.items())
+            if i != self.identifier
+        }
+
+    def replication_lag(self) -> Dict[raftmetrics.Labels, float]:
+        last_index = len(self.state.log) - 1
+
+        return {
+            labels: last_index - index
+            for labels, index in self.replication_indexes(True).items()
+        }
+
+    def observe_commits(self, log_length: int, commit_index: int) -> None:
+        """
+        Time entries appended by the leader since the log had the given length,
+        and observe commit latency of entries committed since the given index.
+        """
+        if self.state.role != raftrole.Role.LEADER:
+            self.appended.clear()
+            self.entry_traces.clear()
+            return None
+
+        now = time.monotonic()
+
+        for index in range(log_length, len(self.state.log)):
+            self.appended[index] = now
+
+        for index in range(commit_index + 1, self.state.commit_index + 1):
+            appended = self.appended.pop(index, None)
+            self.entry_traces.pop(index, None)
+
+            if appended is not None:
+                self.commit_seconds.observe(now - appended)
+
+    def acknowledge_commits(self, commit_index: int) -> List[raftmessage.Message]:
+        """
+        Tell clients of entries they appended committed since the given index.
+        """
+        if self.state.role != raftrole.Role.LEADER:
+            self.clients.clear()
+            return []
+
+        messages: List[raftmessage.Message] = []
+
+        for index in range(commit_index + 1, self.state.commit_index + 1):
+            client = self.clients.pop(index, None)
+
+            if client is not None:
+                item = self.state.log[index].item
+                messages.append(
+                    raftmessage.ClientLogCommit(self.identifier, client, index, item)
+                )
+
+        return messages
+
+    def enable_tracing(self, path: str) -> None:
+        self.tracer = rafttrace.Tracer(self.identifier, path)
+        self.node.tracer = self.tracer
+
+    def handle_command(self, text: str) -> bool:
+        """
+        Commands for the server rather than its state, returning whether the
+        text was one.
+        """
+        match text.split():
+            case ["trace"] if self.tracer is not None:
+                self.tracer.dump()
+
+            case ["profile", "stop"]:
+                self.stop_profile()
+
+            case ["profile", mode, *window] if mode in raftprofile.MODES:
+                self.start_profile(mode, float(window[0]) if window else None)
+
+            case _:
+                return False
+
+        return True
+
+    def command(self, text: str) -> None:
+        """
+        Queue a text command to self, to run on the respond thread, e.g. from a
+        timer or signal handler. Safe to call from signal handlers, as the
+        incoming queue's put is reentrant.
+        """
+        message = raftmessage.Text(self.identifier, self.identifier, text)
+        self.node.incoming.put(raftmessage.encode_message(message))
+
+    def start_profile(self, mode: str, window: Optional[float] = None) -> None:
+        """
+        Profile for a bounded window, stopped by a command so that the cpu
+        profile is stopped on the respond thread it was started from.
+        """
+        window = window or raftprofile.WINDOW
+        path = self.profiler.start(mode)
+        self.profile_deadline = self.scheduler.schedule(
+            window, lambda: self.command("profile stop")
+        )
+
+        raftlogging.log(
+            LOGGER, logging.INFO, "profile start", mode=mode, window=window, path=path
+        )
+
+    def stop_profile(self) -> None:
+        if self.profile_deadline is not None:
+            self.profile_deadline.cancel()
+            self.profile_deadline = None
+
+        path = self.profiler.stop()
+
+        if path is not None:
+            raftlogging.log(LOGGER, logging.INFO, "profile written", path=path)
+
+    def connection_change(
+        self, identifier: int, state: raftnode.ConnectionState
+    ) -> None:
+        self.state.peer_status[identifier] = state.value
 
     def send(self, messages: List[raftmessage.Message]) -> None:
         for message in messages:
-            self.node.send(message.target, raftmessage.encode_message(message))
+            if isinstance(message, raftmessage.AppendEntryRequest):
+                self.adaptive.on_request(message.target, time.monotonic())
 
-    def cycle(self) -> None:
-        timeout = TIMEOUT if self.state.role == raftrole.Role.LEADER else 2 * TIMEOUT
+            trace = self.traces.get(id(message))
 
-        self.timer.cancel()
-        self.timer = threading.Timer(timeout, self.timeout)
-        self.timer.start()
+            # Entries are replicated on the next heartbeat, under the trace of
+            # the first entry carried.
+            if isinstance(message, raftmessage.AppendEntryRequest) and trace is None:
+                if message.entries:
+                    trace = self.entry_traces.get(message.previous_index + 1)
 
-        self.reset = True
+            self.deliver(message, trace)
 
-    def timeout(self) -> None:
-        # Random timeout before starting elections.
-        if self.state.role == raftrole.Role.FOLLOWER:
-            time.sleep(random.random() * TIMEOUT)
+        self.traces.clear()
+
+    def deliver(self, message: raftmessage.Message, trace: Optional[int]) -> None:
+        start = time.monotonic()
+        payload = raftmessage.encode_message(message)
+        encoded = time.monotonic()
+        self.encode_seconds.observe(encoded - start)
+
+        if self.tracer is not None and trace is not None:
+            payload = rafttrace.wrap(trace, payload)
+            self.tracer.record(
+                trace, "encode", start, encoded, type=type(message).__name__
+            )
+
+        self.node.send(message.target, payload)
+
+    def current_timing(self) -> raftconfig.TimingProfile:
+        return self.adaptive.current_profile(self.state.role == raftrole.Role.LEADER)
+
+    def timeout_duration(self) -> float:
+        if self.state.role == raftrole.Role.LEADER:
+            return self.adaptive.next_heartbeat()
+
+        # Randomized election timeout.
+        return self.current_timing().election_timeout()
 
-        # Allow state change only when reset flag is set to True. This will
-        # happen at the end of each cycle unless a leader heartbeat or follower
-        # vote request/response is received.
-        if self.reset:
-            message = raftstate.change_state_on_timeout(self.state)
-            self.node.incoming.put(raftmessage.encode_message(message))
+    def cycle(self) -> None:
+        self.deadline.reset(self.timeout_duration())
+
+    def timeout(self) -> None:
+        """
+        Run on the timer thread, handing the timeout over to the respond
+        thread, which alone touches state.
+        """
+        self.node.incoming.put(TIMEOUT)
 
+    def expire(self) -> List[raftmessage.Message]:
+        # Leader steps down once a majority has been silent for the shortest
+        # time after which followers may elect a new leader.
+        message = raftstate.change_state_on_timeout(
+            self.state, self.current_timing().election_timeout_min
+        )
         self.cycle()
 
-    def color(self) -> str:
-        return raftrole.color(self.state.role)
+        if message is None:
+            return []
 
-    def respond(self) -> None:
-        while True:
-            payload = self.node.receive()
-
-            try:
-                request = raftmessage.decode_message(payload)
-                print(
-                    self.color() + f"\n{request.source} > {request.target} {payload}",
-                    end="",
+        return self.handle((None, message))
+
+    def decode(self, payload: Union[bytes, Decoded]) -> Decoded:
+        """
+        Decode message and its trace id, unless already decoded.
+        """
+        if isinstance(payload, tuple):
+            return payload
+
+        queued = rafttrace.dequeue(payload)
+        trace, payload = rafttrace.unwrap(payload)
+
+        start = time.monotonic()
+        request = raftmessage.decode_message(payload)
+        decoded = time.monotonic()
+        self.decode_seconds.observe(decoded - start)
+
+        if self.tracer is not None and trace is not None:
+            message_type = type(request).__name__
+
+            if queued is not None:
+                self.tracer.record(trace, "incoming", queued, start, type=message_type)
+
+            self.tracer.record(trace, "decode", start, decoded, type=message_type)
+
+        return trace, request
+
+    def handle(self, payload: Union[bytes, Decoded]) -> List[raftmessage.Message]:
+        if payload == TIMEOUT:
+            return self.expire()
+
+        try:
+            trace, request = self.decode(payload)
+            message_type = type(request).__name__
+
+            # Guard on the hot path, so fields are not built unless logged.
+            if MESSAGES.isEnabledFor(logging.DEBUG):
+                raftlogging.log(
+                    MESSAGES,
+                    logging.DEBUG,
+                    "receive",
+                    source=request.source,
+                    target=request.target,
+                    type=message_type,
+                    role=self.state.role,
                 )
 
-                # If receive leader heartbeat or vote request/response, set
-                # reset flag to False to disable follower role change in the
-                # current cycle.
-                if (self.state.role, type(request)) in [
-                    (raftrole.Role.FOLLOWER, raftmessage.AppendEntryRequest),
-                    (raftrole.Role.FOLLOWER, raftmessage.RequestVoteRequest),
-                    (raftrole.Role.CANDIDATE, raftmessage.RequestVoteResponse),
-                ]:
-                    self.reset = False
+            if (self.state.role, type(request)) in raftstate.TIMEOUT_RESETS:
+                self.cycle()
 
-                if not isinstance(request, raftmessage.Text):
-                    print(self.color() + f"\n{request.target} > ", end="")
+            # Measure round-trip times to followers and heartbeat gaps from
+            # the leader.
+            match request:
+                case raftmessage.AppendEntryRequest():
+                    self.adaptive.on_heartbeat(time.monotonic())
 
-                response = self.state.handle_message(request)
-                self.send(response)
+                case raftmessage.AppendEntryResponse():
+                    self.adaptive.on_response(request.source, time.monotonic())
 
-            except Exception as e:
-                print(self.color() + f"Exception: {e}")
+            if isinstance(request, raftmessage.Text) and self.handle_command(
+                request.text
+            ):
+                return []
 
-    def run(self):
+            # Start a trace for each client append.
+            if self.tracer is not None and trace is None:
+                if isinstance(request, raftmessage.ClientLogAppend):
+                    trace = self.tracer.start_trace()
+
+            role = self.state.role
+            log_length = len(self.state.log)
+            commit_index = self.state.commit_index
+
+            started = time.monotonic()
+            response = self.state.handle_message(request)
+            handled = time.monotonic()
+            self.handle_seconds.observe(handled - started, type=message_type)
+
+            if self.tracer is not None and trace is not None:
+                self.tracer.record(trace, "handle", started, handled, type=message_type)
+
+                for message in response:
+                    self.traces[id(message)] = trace
+
+                if self.state.role == raftrole.Role.LEADER:
+                    for index in range(log_length, len(self.state.log)):
+                        self.entry_traces[index] = trace
+
+            if isinstance(request, raftmessage.ClientLogAppend):
+                if request.source != self.identifier:
+                    for index in range(log_length, len(self.state.log)):
+                        self.clients[index] = request.source
+
+            self.observe_commits(log_length, commit_index)
+            response = response + self.acknowledge_commits(commit_index)
+
+            # Start timeout afresh on role change, e.g. for leader to move
+            # from election timeout to heartbeat.
+            if self.state.role != role:
+                self.adaptive.reset()
+                self.cycle()
+                self.role_changes.inc(role=self.state.role.value)
+
+                raftlogging.log(
+                    LOGGER,
+                    logging.INFO,
+                    "role change",
+                    role=self.state.role,
+                    term=self.state.current_term,
+                )
+
+            return response
+
+        except Exception as e:
+            raftlogging.log(
+                LOGGER, logging.WARNING, "message failed", payload=payload, error=e
+            )
+            return []
+
+    def respond(self) -> None:
+        while self.running:
+            messages: List[raftmessage.Message] = []
+
+            # Handle all messages queued, and flush responses once per batch.
+            for payload in self.node.receive_batch(BATCH_LIMIT):
+                messages += self.handle(payload)
+
+            # Votes and acknowledgements only go out once durable.
+            self.persist()
+            self.update_members()
+            self.send(raftmessage.merge_messages(messages))
+
+    def persist(self) -> None:
+        """
+        Save term, vote and log if changed since last saved. A change to the
+        log always changes its length or last term, as entries at the same
+        index and term are the same.
+        """
+        if self.state_path is None:
+            return None
+
+        log = self.state.log
+        persisted = (
+            self.state.current_term,
+            self.state.voted_for,
+            len(log),
+            log[-1].term if log else -1,
+        )
+
+        if persisted == self.persisted:
+            return None
+
+        raftstate.save_state(self.state, self.state_path)
+        self.persisted = persisted
+
+    def update_members(self) -> None:
+        """
+        Connect to members and learners added to the cluster.
+        """
+        addresses = self.state.create_addresses_dict()
+
+        if addresses != self.addresses:
+            self.addresses = addresses
+            self.node.update_members(self.addresses)
+
+    def start(self) -> None:
         self.node.start()
-        self.timer.start()
+        self.scheduler.start()
+
+    def stop(self) -> None:
+        """
+        Stop the respond loop once messages already taken off the queue are
+        handled and responded to, e.g. from a signal handler.
+        """
+        self.running = False
+
+        # Wake respond loop waiting on an empty queue.
+        self.command("")
+
+    def close(self, timeout: float = SHUTDOWN_TIMEOUT) -> bool:
+        """
+        Stop timers so that no further messages are sent, and wait for messages
+        queued to be written out, returning whether all were.
+        """
+        self.scheduler.stop()
+        self.stop_profile()
+        return self.node.stop(timeout)
+
+    def run(self):
+        self.start()
         self.respond()
+        self.close()
 
-        print(self.color() + "end.")
+        raftlogging.shutdown()
         os._exit(0)
 
 
+def create_members(
+    identifier: int, cluster: raftconfig.ClusterConfig, join: bool
+) -> raftlog.Members:
+    """
+    Server joining the cluster listens on its configured address, but starts
+    outside the membership until added.
+    """
+    return {
+        i: address
+        for i, address in cluster.addresses.items()
+        if not (join and i == identifier)
+    }
+
+
+def configure(server: RaftServer, args: argparse.Namespace) -> None:
+    """
+    Apply command line options for tracing, profiling and metrics.
+    """
+    if args.trace is not None:
+        server.enable_tracing(args.trace)
+
+    if args.profile_directory is not None:
+        server.profiler.directory = args.profile_directory
+
+    # Profile all threads by sampling on SIGUSR1, or the respond loop with
+    # cProfile on SIGUSR2. Handlers only queue a command, for the profile to
+    # start on the respond thread.
+    signal.signal(signal.SIGUSR1, lambda *_: server.command("profile sample"))
+    signal.signal(signal.SIGUSR2, lambda *_: server.command("profile cpu"))
+
+    if args.metrics_port is not None:
+        raftmetrics.serve(server.metrics, (args.host, args.metrics_port))
+
+
 if __name__ == "__main__":
-    server = RaftServer(int(sys.argv[1]))
+    args = raftconfig.create_parser("Run a Raft server.").parse_args()
+    cluster = raftconfig.parse_cluster_config(args)
+    raftlogging.configure(args.log_level, args.log_sample, args.log_json)
+    transport_type = rafttransport.TransportType(cluster.transport)
+
+    server = RaftServer(
+        args.identifier,
+        rafttransport.create_transport(transport_type, cluster),
+        cluster.timing,
+        cluster.pre_vote,
+        create_members(args.identifier, cluster, args.join),
+        cluster.codecs,
+        cluster.compression_threshold,
+    )
+    configure(server, args)
     server.run()
@@ -0,0 +1,409 @@
+"""
+Deterministic discrete-event simulation of a cluster of RaftStates, with no
+sockets, threads or wall-clock timers, so that hours of cluster time run in
+seconds and any run can be reproduced exactly from its seed.
+
+- Time is virtual, advanced from one event to the next. Events are kept in a
+  heap ordered by time, with ties broken by the order they were scheduled.
+- Timers follow RaftServer: leaders time out every heartbeat interval, others
+  after a randomized election timeout, reset on role change and on messages in
+  raftstate.TIMEOUT_RESETS. Timing is taken from the profile as configured,
+  with no adaptation to round-trip times.
+- The network delays each message by a latency drawn between a minimum and a
+  maximum, so that messages may arrive out of order, and drops messages at a
+  loss rate, between partitioned servers, and to or from crashed servers.
+- All randomness is drawn from one generator seeded on creation.
+
+Clients append entries to the leader directly, open loop at a fixed rate.
+Commit latency is measured on the leader, from the append to the commit.
+"""
+
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import argparse
+import dataclasses
+import heapq
+import itertools
+import random
+import time
+
+import raftconfig
+import raftlog
+import raftmessage
+import raftmetrics
+import raftrole
+import raftstate
+
+# Identifier clients append entries from.
+CLIENT = 0
+
+
+@dataclasses.dataclass
+class Network:
+    """
+    Latency of messages in seconds, and the fraction of messages lost.
+    """
+
+    latency_min: float = 0.001
+    latency_max: float = 0.005
+    loss: float = 0.0
+
+    def __post_init__(self) -> None:
+        if not 0 <= self.latency_min <= self.latency_max:
+            raise Exception("Latency must be positive with minimum below maximum.")
+
+        if not 0 <= self.loss < 1:
+            raise Exception("Loss must be a fraction below 1.")
+
+
+@dataclasses.dataclass
+class Simulator:
+    size: int = 3
+    seed: int = 0
+    timing: raftconfig.TimingProfile = dataclasses.field(
+        default_factory=raftconfig.load_timing_profile
+    )
+    network: Network = dataclasses.field(default_factory=Network)
+    pre_vote: bool = False
+
+    def __post_init__(self) -> None:
+        self.random: random.Random = random.Random(self.seed)
+        self.now: float = 0.0
+        self.events: List[Tuple[float, int, Callable[[], None]]] = []
+        self.counter: itertools.count = itertools.count()
+
+        self.members: raftlog.Members = {
+            identifier: ("localhost", 7000 + identifier)
+            for identifier in range(1, self.size + 1)
+        }
+        self.states: Dict[int, raftstate.RaftState] = {
+            identifier: self.create_state(identifier) for identifier in self.members
+        }
+
+        # Timer generation of each server, with timeouts of earlier
+        # generations ignored.
+        self.timers: Dict[int, int] = {identifier: 0 for identifier in self.members}
+        self.crashed: Set[int] = set()
+        self.groups: Dict[int, int] = {}
+
+        self.sent: int = 0
+        self.dropped: int = 0
+        self.failures: int = 0
+
+        # Time, server and term of each leader elected.
+        self.elections: List[Tuple[float, int, int]] = []
+
+        # Time each entry was appended to the leader log, by term and index,
+        # until committed.
+        self.appended: Dict[Tuple[int, int], float] = {}
+        self.latencies: List[float] = []
+
+        for identifier in self.members:
+            self.cycle(identifier)
+
+    def create_state(self, identifier: int) -> raftstate.RaftState:
+        state = raftstate.RaftState(identifier)
+        state.pre_vote = self.pre_vote
+        state.config = self.members
+        state.initial_config = self.members
+        state.clock = self.clock
+        return state
+
+    def clock(self) -> float:
+        return self.now
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> None:
+        heapq.heappush(self.events, (self.now + delay, next(self.counter), callback))
+
+    ###   TIMERS
+
+    def timeout_duration(self, identifier: int) -> float:
+        if self.states[identifier].role == raftrole.Role.LEADER:
+            return self.timing.heartbeat_interval
+
+        return self.random.uniform(
+            self.timing.election_timeout_min, self.timing.election_timeout_max
+        )
+
+    def cycle(self, identifier: int) -> None:
+        self.timers[identifier] += 1
+        generation = self.timers[identifier]
+
+        def timeout() -> None:
+            if self.timers[identifier] == generation:
+                self.timeout(identifier)
+
+        self.schedule(self.timeout_duration(identifier), timeout)
+
+    def timeout(self, identifier: int) -> None:
+        message = raftstate.change_state_on_timeout(
+            self.states[identifier], self.timing.election_timeout_min
+        )
+
+        if message is not None:
+            self.handle(message)
+
+        self.cycle(identifier)
+
+    ###   NETWORK
+
+    def reachable(self, source: int, target: int) -> bool:
+        if source in self.crashed or target in self.crashed:
+            return False
+
+        return self.groups.get(source) == self.groups.get(target)
+
+    def send(self, message: raftmessage.Message) -> None:
+        # Messages to self never touch the network.
+        if message.source == message.target:
+            self.handle(message)
+            return None
+
+        self.sent += 1
+
+        if not self.reachable(message.source, message.target):
+            self.dropped += 1
+            return None
+
+        if self.random.random() < self.network.loss:
+            self.dropped += 1
+            return None
+
+        latency = self.random.uniform(
+            self.network.latency_min, self.network.latency_max
+        )
+
+        def deliver() -> None:
+            # Partitions and crashes since sending also drop the message.
+            if self.reachable(message.source, message.target):
+                self.handle(message)
+
+            else:
+                self.dropped += 1
+
+        self.schedule(latency, deliver)
+
+    def partition(self, *groups: List[int]) -> None:
+        """
+        Split servers into groups, unable to reach servers in other groups.
+        Servers in no group form a group of their own.
+        """
+        self.groups = {
+            identifier: number
+            for number, group in enumerate(groups, 1)
+            for identifier in group
+        }
+
+    def heal(self) -> None:
+        self.groups = {}
+
+    def crash(self, identifier: int) -> None:
+        self.crashed.add(identifier)
+        self.timers[identifier] += 1
+
+    def restart(self, identifier: int) -> None:
+        """
+        Restart a crashed server with its persistent state, i.e. current term,
+        vote and log, and all else reset.
+        """
+        previous = self.states[identifier]
+        state = self.create_state(identifier)
+        state.current_term = previous.current_term
+        state.voted_for = previous.voted_for
+        state.log = previous.log
+        state.update_config()
+
+        self.states[identifier] = state
+        self.crashed.discard(identifier)
+        self.cycle(identifier)
+
+    ###   SERVERS
+
+    def handle(self, message: raftmessage.Message) -> None:
+        identifier = message.target
+        state = self.states[identifier]
+
+        if (state.role, type(message)) in raftstate.TIMEOUT_RESETS:
+            self.cycle(identifier)
+
+        role = state.role
+        commit_index = state.commit_index
+        log_length = len(state.log)
+
+        try:
+            responses = state.handle_message(message)
+
+        except Exception:
+            self.failures += 1
+            return None
+
+        if state.role == raftrole.Role.LEADER:
+            for index in range(log_length, len(state.log)):
+                self.appended[(state.log[index].term, index)] = self.now
+
+            for index in range(commit_index + 1, state.commit_index + 1):
+                appended = self.appended.pop((state.log[index].term, index), None)
+
+                if appended is not None:
+                    self.latencies.append(self.now - appended)
+
+        if state.role != role:
+            self.cycle(identifier)
+
+            if state.role == raftrole.Role.LEADER:
+                self.elections.append((self.now, identifier, state.current_term))
+
+        for response in raftmessage.merge_messages(responses):
+            self.send(response)
+
+    def leader(self) -> Optional[int]:
+        """
+        Live leader of the latest term, if any.
+        """
+        leaders = [
+            state
+            for identifier, state in self.states.items()
+            if state.role == raftrole.Role.LEADER and identifier not in self.crashed
+        ]
+
+        if not leaders:
+            return None
+
+        return max(leaders, key=lambda state: state.current_term).identifier
+
+    def append(self, item: bytes) -> bool:
+        """
+        Append an entry on the leader, returning whether there was one.
+        """
+        leader = self.leader()
+
+        if leader is None:
+            return False
+
+        self.handle(raftmessage.ClientLogAppend(CLIENT, leader, item))
+        return True
+
+    def load(self, rate: float, size: int, duration: float) -> None:
+        """
+        Append entries of size bytes at rate per second for duration seconds,
+        whether or not earlier entries have committed.
+        """
+        interval = 1 / rate
+        end = self.now + duration
+        item = bytes(size)
+
+        def write() -> None:
+            self.append(item)
+
+            if self.now + interval < end:
+                self.schedule(interval, write)
+
+        self.schedule(interval, write)
+
+    ###   RUNNING
+
+    def step(self) -> bool:
+        """
+        Run the next event, returning whether there was one.
+        """
+        if not self.events:
+            return False
+
+        self.now, _, callback = heapq.heappop(self.events)
+        callback()
+        return True
+
+    def run(self, duration: float) -> None:
+        end = self.now + duration
+
+        while self.events and self.events[0][0] <= end:
+            self.step()
+
+        self.now = end
+
+    def run_until(self, condition: Callable[[], bool], limit: float) -> Optional[float]:
+        """
+        Run until condition holds, returning the time taken, or None if it
+        does not hold within limit seconds.
+        """
+        start = self.now
+        end = start + limit
+
+        while not condition():
+            if not self.events or self.events[0][0] > end:
+                self.now = end
+                return None
+
+            self.step()
+
+        return self.now - start
+
+    ###   CHECKS
+
+    def check_safety(self) -> None:
+        """
+        At most one leader per term, and committed entries the same on all
+        servers.
+        """
+        terms = [term for _, _, term in self.elections]
+
+        if len(terms) != len(set(terms)):
+            raise Exception(f"More than one leader elected in a term: {terms}.")
+
+        committed = min(state.commit_index for state in self.states.values())
+        logs = [state.log[: committed + 1] for state in self.states.values()]
+
+        if any(log != logs[0] for log in logs):
+            raise Exception("Committed entries differ between servers.")
+
+    def summary(self) -> Dict[str, float]:
+        first_leader = self.elections[0][0] if self.elections else float("nan")
+
+        return {
+            "simulated seconds": self.now,
+            "first leader": first_leader,
+            "elections": len(self.elections),
+            "messages": self.sent,
+            "dropped": self.dropped,
+            "commits": len(self.latencies),
+            "commits/sec": len(self.latencies) / self.now if self.now else 0.0,
+            "p50 commit": raftmetrics.percentile(self.latencies, 0.5),
+            "p99 commit": raftmetrics.percentile(self.latencies, 0.99),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate a Raft cluster.")
+    parser.add_argument("--nodes", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duration", type=float, default=3600.0)
+    parser.add_argument(
+        "--timing",
+        default=raftconfig.TIMING_PROFILE,
+        choices=raftconfig.TIMING_PROFILES,
+    )
+    parser.add_argument("--latency-min", type=float, default=0.001)
+    parser.add_argument("--latency-max", type=float, default=0.005)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--rate", type=float, default=10.0, help="appends per second")
+    parser.add_argument("--size", type=int, default=16, help="bytes per append")
+    parser.add_argument("--pre-vote", action="store_true")
+    args = parser.parse_args()
+
+    simulator = Simulator(
+        args.nodes,
+        args.seed,
+        raftconfig.load_timing_profile(args.timing),
+        Network(args.latency_min, args.latency_max, args.loss),
+        args.pre_vote,
+    )
+    simulator.load(args.rate, args.size, args.duration)
+
+    started = time.perf_counter()
+    simulator.run(args.duration)
+    elapsed = time.perf_counter() - started
+    simulator.check_safety()
+
+    for name, value in simulator.summary().items():
+        print(f"{name:<18} {value:>12.6g}")
+
+    print(f"{'wall seconds':<18} {elapsed:>12.6g}")
@@ -47,6 +47,13 @@ Rules for Servers section in Figure 2 of Raft paper:
 Candidates (§5.2):
 - If election timeout elapses: start new election
 
+Pre-candidates (§9.6 of Raft dissertation):
+- If election timeout elapses: start new pre-vote
+- Grant pre-vote only if candidate's log is at least as up-to-date as
+  receiver's log, and receiver has not heard from a leader within an election
+  timeout
+- If pre-votes received from majority of servers: become candidate
+
 Leaders:
 - Upon election: send initial empty AppendEntries RPCs (heartbeat) to each
   server; repeat during idle periods to prevent election timeouts (§5.2)
@@ -57,16 +64,42 @@ Leaders:
     retry (§5.3)
 - If there exists an N such that N > commitIndex, a majority of matchIndex[i] ≥
   N, and log[N].term == currentTerm: set commitIndex = N (§5.3, §5.4).
+- If a majority of servers have not responded within an election timeout: step
+  down (CheckQuorum, §6.2 of Raft dissertation).
+
+Membership changes (§4.1 of Raft dissertation):
+- Add or remove one server at a time, with each server using the latest
+  membership in its log, committed or not
+- Leader accepts no further change until the latest one is committed, and steps
+  down once a membership that excludes itself is committed
+- Servers outside their own membership do not start elections, and their vote
+  requests are ignored
+- Servers join as learners, which receive entries but do not vote or count
+  towards commits, and are promoted once within a threshold of the leader's log
+
+Leadership transfer (§3.10 of Raft dissertation):
+- Leader stops accepting client requests, brings the transferee's log up to
+  date and sends it TimeoutNow, on which it starts an election immediately
+- Transfer is abandoned if not complete within an election timeout
 """
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple, Type
 import dataclasses
+import logging
+import math
+import os
+import time
 
 import raftconfig
+import rafthelpers
 import raftlog
+import raftlogging
 import raftmessage
 import raftrole
 
 
+LOGGER = raftlogging.get_logger("state")
+
+
 @dataclasses.dataclass
 class RaftState:
     identifier: int
@@ -78,11 +111,28 @@ class RaftState:
         self.next_index: Optional[Dict[int, int]] = None
         self.match_index: Optional[Dict[int, Optional[int]]] = None
         self.commit_index: int = -1
-        self.has_followers: Optional[bool] = None
+        self.last_contact: Optional[Dict[int, float]] = None
         self.voted_for: Optional[int] = None
         self.current_votes: Optional[Dict[int, Optional[int]]] = None
-        self.config: Dict[int, Tuple[str, int]] = raftconfig.ADDRESS_BY_IDENTIFIER
+        self.config: raftlog.Members = raftconfig.ADDRESS_BY_IDENTIFIER
+        self.initial_config: raftlog.Members = raftconfig.ADDRESS_BY_IDENTIFIER
+        self.learners: raftlog.Learners = {}
+        self.promotion_threshold: int = raftconfig.PROMOTION_THRESHOLD
         self.experimental_mode: bool = False
+        self.clock: Callable[[], float] = time.monotonic
+        self.pre_vote: bool = False
+
+        # Set on AppendEntries from current leader, cleared on election timeout.
+        self.leader_active: bool = False
+
+        # Follower leadership is being handed over to, if any, and when the
+        # transfer started.
+        self.transfer_target: Optional[int] = None
+        self.transfer_started: Optional[float] = None
+
+        # Connection state of peers as reported by the network runtime. Purely
+        # informational, not used in any consensus decision.
+        self.peer_status: Dict[int, str] = {}
 
     ###   MULTI-PURPOSE HELPERS
 
@@ -90,16 +140,50 @@ class RaftState:
         return 1 + len(self.config) // 2
 
     def create_followers_list(self) -> List[int]:
-        followers = list(self.config.keys())
-        followers.remove(self.identifier)
+        return [
+            identifier for identifier in self.config if identifier != self.identifier
+        ]
 
-        return followers
+    def create_replication_list(self) -> List[int]:
+        """
+        Followers together with learners, all of which are sent entries.
+        """
+        return self.create_followers_list() + list(self.learners)
+
+    def create_addresses_dict(self) -> raftlog.Members:
+        addresses = dict(self.config)
+
+        for identifier, (host, port, _) in self.learners.items():
+            addresses[identifier] = (host, port)
+
+        return addresses
+
+    def update_config(self) -> None:
+        """
+        Take on latest membership in log, or initial membership if there is
+        none.
+        """
+        index = raftlog.latest_members_index(self.log)
+
+        if index < 0:
+            self.config = self.initial_config
+            self.learners = {}
+            return None
+
+        entry = self.log[index]
+        assert entry.members is not None
+        self.config = entry.members
+        self.learners = entry.learners or {}
 
     def implement_state_change(self, state_change: raftrole.StateChange) -> None:
         if state_change["role_change"] is not None:
             assert state_change["role_change"][0] == self.role
             self.role = state_change["role_change"][1]
 
+            # Any transfer ends with the leader changing role.
+            self.transfer_target = None
+            self.transfer_started = None
+
         self.current_term = state_change["current_term"]
 
         match state_change["next_index"]:
@@ -107,14 +191,18 @@ class RaftState:
                 self.next_index = None
             case raftrole.Operation.INITIALIZE:
                 self.next_index = {
-                    identifier: len(self.log) for identifier in self.config
+                    identifier: len(self.log)
+                    for identifier in self.create_replication_list()
                 }
+                self.next_index[self.identifier] = len(self.log)
 
         match state_change["match_index"]:
             case raftrole.Operation.RESET_TO_NONE:
                 self.match_index = None
             case raftrole.Operation.INITIALIZE:
-                self.match_index = {identifier: None for identifier in self.config}
+                self.match_index = {
+                    identifier: None for identifier in self.create_replication_list()
+                }
                 self.match_index[self.identifier] = len(self.log) - 1
 
         # Exception to RESET_TO_NONE, where reset is to -1. This is to simplify
@@ -128,11 +216,16 @@ class RaftState:
             case raftrole.Operation.INITIALIZE:
                 raise Exception("Invalid initialization operation for commit index.")
 
-        match state_change["has_followers"]:
+        # Count election as contact with all followers, to allow an election
+        # timeout for followers to respond to the new leader.
+        match state_change["last_contact"]:
             case raftrole.Operation.RESET_TO_NONE:
-                self.has_followers = None
+                self.last_contact = None
             case raftrole.Operation.INITIALIZE:
-                self.has_followers = False
+                now = self.clock()
+                self.last_contact = {
+                    identifier: now for identifier in self.create_replication_list()
+                }
 
         match state_change["voted_for"]:
             case raftrole.Operation.RESET_TO_NONE:
@@ -144,13 +237,12 @@ class RaftState:
             case raftrole.Operation.RESET_TO_NONE:
                 self.current_votes = None
             case raftrole.Operation.INITIALIZE:
-                self.current_votes = {identifier: None for identifier in self.config}
-                self.current_votes[self.identifier] = self.identifier
+                self.reset_votes()
 
     ###   CLIENT-RELATED HANDLER
 
     def handle_client_log_append(
-        self, source: int, target: int, item: str
+        self, source: int, target: int, item: bytes
     ) -> List[raftmessage.Message]:
         """
         Client adds a log entry (received by leader).
@@ -158,6 +250,9 @@ class RaftState:
         if self.role != raftrole.Role.LEADER:
             raise Exception("Not able to append entries when not leader.")
 
+        if self.transfer_target is not None:
+            raise Exception("Not able to append entries during leadership transfer.")
+
         self.log.append(raftlog.LogEntry(self.current_term, item))
 
         assert self.next_index is not None and self.match_index is not None
@@ -166,6 +261,142 @@ class RaftState:
 
         return []
 
+    ###   MEMBERSHIP-RELATED HELPERS AND HANDLERS
+
+    def append_members(
+        self, members: raftlog.Members, learners: raftlog.Learners
+    ) -> None:
+        if self.role != raftrole.Role.LEADER:
+            raise Exception("Not able to change membership when not leader.")
+
+        if self.transfer_target is not None:
+            raise Exception("Not able to change membership during leadership transfer.")
+
+        if raftlog.latest_members_index(self.log) > self.commit_index:
+            raise Exception("Not able to change membership with change in progress.")
+
+        if not self.has_commit_in_term():
+            raise Exception("Not able to change membership before commit in term.")
+
+        self.log.append(raftlog.LogEntry(self.current_term, b"", members, learners))
+        self.config = members
+        self.learners = learners
+
+        assert self.next_index is not None and self.match_index is not None
+        assert self.last_contact is not None
+
+        if self.identifier in members:
+            self.next_index[self.identifier] = len(self.log)
+            self.match_index[self.identifier] = len(self.log) - 1
+
+        replication = self.create_replication_list()
+
+        for identifier in list(self.next_index):
+            if identifier not in replication and identifier != self.identifier:
+                del self.next_index[identifier]
+                del self.match_index[identifier]
+                self.last_contact.pop(identifier, None)
+
+        for identifier in replication:
+            if identifier not in self.next_index:
+                # New members usually start with an empty log, so send from the
+                # start rather than backing off one entry at a time.
+                self.next_index[identifier] = 0
+                self.match_index[identifier] = None
+                self.last_contact[identifier] = self.clock()
+
+    def has_commit_in_term(self) -> bool:
+        """
+        Until an entry of its own term commits, a new leader may not know of a
+        change committed by its predecessor.
+        """
+        return (
+            self.commit_index >= 0
+            and self.log[self.commit_index].term == self.current_term
+        )
+
+    def is_ready_for_promotion(self, learner: int) -> bool:
+        """
+        Learner is marked for promotion, within threshold of the leader's log
+        and no other change is in progress.
+        """
+        if self.role != raftrole.Role.LEADER or learner not in self.learners:
+            return False
+
+        assert self.match_index is not None
+        match_index = self.match_index[learner]
+
+        return (
+            self.learners[learner][2]
+            and match_index is not None
+            and match_index >= len(self.log) - 1 - self.promotion_threshold
+            and raftlog.latest_members_index(self.log) <= self.commit_index
+            and self.has_commit_in_term()
+            and self.transfer_target is None
+        )
+
+    def promote_learner(self, learner: int) -> None:
+        host, port, _ = self.learners[learner]
+
+        members = dict(self.config)
+        members[learner] = (host, port)
+        learners = {
+            identifier: address
+            for identifier, address in self.learners.items()
+            if identifier != learner
+        }
+        self.append_members(members, learners)
+
+    def handle_add_member(
+        self,
+        source: int,
+        target: int,
+        member: int,
+        host: str,
+        port: int,
+        replica: bool = False,
+    ) -> List[raftmessage.Message]:
+        """
+        Client adds a server to the cluster as learner, to be promoted once
+        caught up unless a read replica (received by leader).
+        """
+        if member in self.config or member in self.learners:
+            raise Exception(f"Not able to add existing member {member}.")
+
+        learners = dict(self.learners)
+        learners[member] = (host, port, not replica)
+        self.append_members(self.config, learners)
+
+        return self.handle_leader_heartbeat()
+
+    def handle_remove_member(
+        self, source: int, target: int, member: int
+    ) -> List[raftmessage.Message]:
+        """
+        Client removes a server from the cluster (received by leader).
+        """
+        if member in self.learners:
+            learners = {
+                identifier: address
+                for identifier, address in self.learners.items()
+                if identifier != member
+            }
+            self.append_members(self.config, learners)
+
+            return self.handle_leader_heartbeat()
+
+        if member not in self.config or len(self.config) == 1:
+            raise Exception(f"Not able to remove member {member}.")
+
+        members = {
+            identifier: address
+            for identifier, address in self.config.items()
+            if identifier != member
+        }
+        self.append_members(members, self.learners)
+
+        return self.handle_leader_heartbeat()
+
     ###   LEADER-RELATED HELPERS AND HANDLERS
 
     def create_append_entries_arguments(
@@ -195,20 +426,25 @@ class RaftState:
         return len(
             [
                 identifier
-                for identifier in self.match_index.values()
-                if identifier is None
+                for identifier in self.config
+                if self.match_index.get(identifier) is None
             ]
         )
 
     def get_index_metrics(self) -> Tuple[int, int]:
+        # Only members of the latest membership count towards the commit index.
         assert self.match_index is not None
+        match_index_values = [self.match_index.get(i) for i in self.config]
         non_null_match_index_values = sorted(
-            [value for value in self.match_index.values() if value is not None]
+            [value for value in match_index_values if value is not None]
         )
         non_null_match_index_count = len(non_null_match_index_values)
 
-        # Get median value with index corrected for null values
-        median_match_index = self.count_majority() - 1 - self.count_null_match_index()
+        # Highest index held by a majority, at the position in the ascending
+        # list with a majority at or above it, null values counted as lowest.
+        median_match_index = (
+            len(self.config) - self.count_majority() - self.count_null_match_index()
+        )
 
         if 0 <= median_match_index < len(non_null_match_index_values):
             potential_commit_index = non_null_match_index_values[median_match_index]
@@ -218,10 +454,40 @@ class RaftState:
 
         return non_null_match_index_count, potential_commit_index
 
-    def update_indexes(self, target: int, entries_length: int) -> None:
+    def has_quorum(self, election_timeout: float) -> bool:
+        """
+        Whether a majority, counting self, has been in contact within the
+        election timeout. Always true once no longer leader, with nothing to
+        step down from.
+        """
+        if self.role != raftrole.Role.LEADER or self.last_contact is None:
+            return True
+
+        now = self.clock()
+
+        # Followers never heard from count as out of contact.
+        in_contact = [
+            identifier
+            for identifier in self.create_followers_list()
+            if now - self.last_contact.get(identifier, -math.inf) < election_timeout
+        ]
+        in_contact_self = 1 if self.identifier in self.config else 0
+
+        return in_contact_self + len(in_contact) >= self.count_majority()
+
+    def update_indexes(self, target: int, match_index: int) -> None:
+        """
+        Set from the index acknowledged rather than advanced by a count, so
+        that duplicate and reordered responses, e.g. with heartbeats sent more
+        often than the round trip, leave indexes unchanged.
+        """
         assert self.next_index is not None and self.match_index is not None
-        self.next_index[target] += entries_length
-        self.match_index[target] = self.next_index[target] - 1
+        known = self.match_index.get(target)
+
+        if known is None or match_index > known:
+            self.match_index[target] = match_index
+
+        self.next_index[target] = max(self.next_index[target], match_index + 1)
 
         # Change to leader's commit_index is only relevant after a successful
         # append entry response from follower.
@@ -240,6 +506,13 @@ class RaftState:
         if update_commit_index or self.experimental_mode:
             self.commit_index = potential_commit_index
 
+        # Step down once removal of self from cluster is committed.
+        if (
+            self.identifier not in self.config
+            and raftlog.latest_members_index(self.log) <= self.commit_index
+        ):
+            self.change_role(raftrole.Role.LEADER, raftrole.Role.FOLLOWER)
+
     def handle_leader_heartbeat(
         self,
         source: Optional[int] = None,
@@ -254,7 +527,7 @@ class RaftState:
 
         source = source or self.identifier
         target = target or self.identifier
-        followers = followers or self.create_followers_list()
+        followers = followers or self.create_replication_list()
 
         messages: List[raftmessage.Message] = []
 
@@ -294,22 +567,39 @@ class RaftState:
                     source,
                     self.current_term,
                     False,
-                    len(entries),
+                    previous_index - 1,
                 )
             ]
 
+        if current_term == self.current_term:
+            self.leader_active = True
+
         success = raftlog.append_entries(
             self.log, previous_index, previous_term, entries
         )
 
+        # Membership may change with entries appended or deleted.
+        if len(entries) > 0:
+            self.update_config()
+
+        # Respond with the last index known to match the leader, or on failure
+        # the last that may, bounded by the end of own log so a lagging
+        # follower is not backed off one entry at a time. Either way, the
+        # leader can act on duplicate and reordered responses alike.
+        if success:
+            match_index = previous_index + len(entries)
+
+        else:
+            match_index = min(previous_index, len(self.log)) - 1
+
         # Movement of commit_index by follower is based on commit_index on
-        # leader and length of own log.
-        if commit_index > self.commit_index:
-            self.commit_index = min(commit_index, len(self.log) - 1)
+        # leader, up to the entries known to match the leader's log.
+        if success and commit_index > self.commit_index:
+            self.commit_index = min(commit_index, match_index)
 
         return [
             raftmessage.AppendEntryResponse(
-                target, source, self.current_term, success, len(entries)
+                target, source, self.current_term, success, match_index
             )
         ]
 
@@ -319,7 +609,7 @@ class RaftState:
         target: int,
         current_term: int,
         success: bool,
-        entries_length: int,
+        match_index: int,
     ) -> List[raftmessage.Message]:
         """
         Follower response (received by leader).
@@ -331,22 +621,35 @@ class RaftState:
         )
         self.implement_state_change(state_change)
 
-        # If not leader, then early return with no log changes.
-        if self.role != raftrole.Role.LEADER:
+        # If not leader, or response to a request from an earlier term, then
+        # early return with no log changes.
+        if self.role != raftrole.Role.LEADER or current_term < self.current_term:
             return []
 
+        # Any response in the current term shows the follower is reachable.
+        assert self.last_contact is not None
+        self.last_contact[source] = self.clock()
+
         # If successful, update indexes.
         if success:
-            self.update_indexes(source, entries_length)
+            self.update_indexes(source, match_index)
+
+            if self.is_ready_for_promotion(source):
+                self.promote_learner(source)
 
-            assert self.has_followers is not None
-            self.has_followers = True
+            if source == self.transfer_target and self.is_up_to_date(source):
+                return [raftmessage.TimeoutNow(target, source, self.current_term)]
 
             return []
 
-        # If not successful, retry with earlier entries.
-        assert self.next_index is not None and self.next_index[source] is not None
-        self.next_index[source] = self.next_index[source] - 1
+        # If not successful, retry with earlier entries, though never before
+        # entries known to match.
+        assert self.next_index is not None and self.match_index is not None
+        known = self.match_index.get(source)
+        self.next_index[source] = max(
+            min(self.next_index[source], match_index + 1),
+            0 if known is None else known + 1,
+        )
 
         return [
             raftmessage.AppendEntryRequest(
@@ -356,8 +659,71 @@ class RaftState:
             )
         ]
 
+    ###   LEADERSHIP TRANSFER-RELATED HELPERS AND HANDLERS
+
+    def is_up_to_date(self, follower: int) -> bool:
+        assert self.match_index is not None
+        return self.match_index[follower] == len(self.log) - 1
+
+    def handle_transfer_leadership(
+        self, source: int, target: int, transferee: int
+    ) -> List[raftmessage.Message]:
+        """
+        Hand over leadership to transferee (received by leader).
+        """
+        if self.role != raftrole.Role.LEADER:
+            raise Exception("Not able to transfer leadership when not leader.")
+
+        if transferee not in self.create_followers_list():
+            raise Exception(f"Not able to transfer leadership to {transferee}.")
+
+        self.transfer_target = transferee
+        self.transfer_started = self.clock()
+
+        if self.is_up_to_date(transferee):
+            return [
+                raftmessage.TimeoutNow(self.identifier, transferee, self.current_term)
+            ]
+
+        return [
+            raftmessage.AppendEntryRequest(
+                self.identifier,
+                transferee,
+                *self.create_append_entries_arguments(transferee),
+            )
+        ]
+
+    def handle_timeout_now(
+        self, source: int, target: int, current_term: int
+    ) -> List[raftmessage.Message]:
+        """
+        Start election immediately, skipping pre-vote (received by transferee).
+        """
+        if current_term < self.current_term:
+            return []
+
+        match self.role:
+            case raftrole.Role.FOLLOWER:
+                self.change_role(raftrole.Role.FOLLOWER, raftrole.Role.CANDIDATE)
+
+            case raftrole.Role.PRE_CANDIDATE:
+                self.change_role(raftrole.Role.PRE_CANDIDATE, raftrole.Role.CANDIDATE)
+
+            case _:
+                return []
+
+        return [
+            raftmessage.RunElection(
+                self.identifier, self.identifier, self.create_followers_list()
+            )
+        ]
+
     ###   CANDIDATE-RELATED HELPERS AND HANDLERS
 
+    def reset_votes(self) -> None:
+        self.current_votes = {identifier: None for identifier in self.config}
+        self.current_votes[self.identifier] = self.identifier
+
     def count_self_votes(self) -> int:
         assert self.current_votes is not None
         return len(
@@ -411,6 +777,15 @@ class RaftState:
         last_log_index: int,
         last_log_term: int,
     ) -> List[raftmessage.Message]:
+        # Ignore candidates outside membership, e.g. removed servers not aware
+        # of their removal, so they cannot disrupt the cluster with new terms.
+        if source not in self.config:
+            return [
+                raftmessage.RequestVoteResponse(
+                    target, source, False, self.current_term
+                )
+            ]
+
         state_change = raftrole.enumerate_state_change(
             raftrole.Role.CANDIDATE, current_term, self.role, self.current_term
         )
@@ -487,6 +862,112 @@ class RaftState:
 
                 return [
                     raftmessage.UpdateFollowers(
+                        self.identifier,
+                        self.identifier,
+                        self.create_replication_list(),
+                    )
+                ]
+
+        return []
+
+    ###   PRE-CANDIDATE-RELATED HELPERS AND HANDLERS
+
+    def handle_pre_vote_solicitation(
+        self,
+        source: Optional[int] = None,
+        target: Optional[int] = None,
+        followers: Optional[List[int]] = None,
+    ) -> List[raftmessage.Message]:
+        """
+        Pre-candidate soliciting pre-votes. Send PreVoteRequest to all followers,
+        for the term the pre-candidate would stand in.
+        """
+        if self.role != raftrole.Role.PRE_CANDIDATE:
+            raise Exception("Not able to solicit pre-votes when not pre-candidate.")
+
+        # Each round starts afresh, so pre-votes granted in an earlier round
+        # while a leader may since have been heard from are not counted.
+        self.reset_votes()
+        followers = followers or self.create_followers_list()
+
+        messages: List[raftmessage.Message] = []
+
+        previous_term = self.log[-1].term if len(self.log) > 0 else -1
+
+        for follower in followers:
+            message = raftmessage.PreVoteRequest(
+                self.identifier,
+                follower,
+                self.current_term + 1,
+                len(self.log) - 1,
+                previous_term,
+            )
+            messages.append(message)
+
+        return messages
+
+    def handle_pre_vote_request(
+        self,
+        source: int,
+        target: int,
+        current_term: int,
+        last_log_index: int,
+        last_log_term: int,
+    ) -> List[raftmessage.Message]:
+        """
+        No change to term or vote of receiver, only whether vote would be
+        granted.
+        """
+        # Require no leader in contact, including self.
+        if self.role == raftrole.Role.LEADER or self.leader_active:
+            success = False
+
+        # Require candidate be a member.
+        elif source not in self.config:
+            success = False
+
+        # Require candidate have higher term.
+        elif current_term <= self.current_term:
+            success = False
+
+        # Require candidate have at least same log length.
+        elif last_log_index < len(self.log) - 1:
+            success = False
+
+        # Require candidate have last entry having at least the same term.
+        elif len(self.log) > 0 and last_log_term < self.log[-1].term:
+            success = False
+
+        else:
+            success = True
+
+        return [raftmessage.PreVoteResponse(target, source, success, self.current_term)]
+
+    def handle_pre_vote_response(
+        self,
+        source: int,
+        target: int,
+        success: bool,
+        current_term: int,
+    ) -> List[raftmessage.Message]:
+        state_change = raftrole.enumerate_state_change(
+            raftrole.Role.FOLLOWER, current_term, self.role, self.current_term
+        )
+        self.implement_state_change(state_change)
+
+        # If not pre-candidate, then early return with no changes.
+        if self.role != raftrole.Role.PRE_CANDIDATE:
+            return []
+
+        if success:
+            assert self.current_votes is not None
+            self.current_votes[source] = target
+
+            if self.has_won_election():
+                self.change_role(raftrole.Role.PRE_CANDIDATE, raftrole.Role.CANDIDATE)
+
+                return [
+                    raftmessage.RunElection(
                         self.identifier, self.identifier, self.create_followers_list()
                     )
                 ]
@@ -501,14 +982,20 @@ class RaftState:
         to_role: raftrole.Role,
         current_term: Optional[int] = None,
     ) -> Tuple[raftrole.Role, raftrole.Role]:
-        match from_role:
-            case raftrole.Role.FOLLOWER:
+        match (from_role, to_role):
+            case (raftrole.Role.FOLLOWER, raftrole.Role.PRE_CANDIDATE):
+                source_role = raftrole.Role.STRAW_POLL
+
+            case (raftrole.Role.FOLLOWER, _):
                 source_role = raftrole.Role.TIMER
 
-            case raftrole.Role.CANDIDATE:
+            case (raftrole.Role.PRE_CANDIDATE, _):
+                source_role = raftrole.Role.ELECTION_COMMISSION
+
+            case (raftrole.Role.CANDIDATE, _):
                 source_role = raftrole.Role.ELECTION_COMMISSION
 
-            case raftrole.Role.LEADER:
+            case (raftrole.Role.LEADER, _):
                 source_role = raftrole.Role.CONSTITUTION
 
         state_change = raftrole.enumerate_state_change(
@@ -541,6 +1028,13 @@ class RaftState:
                         self.identifier, self.identifier, self.create_followers_list()
                     )
                 ]
+            case (raftrole.Role.FOLLOWER, raftrole.Role.PRE_CANDIDATE):
+                self.change_role(from_role, to_role)
+                return [
+                    raftmessage.RunPreVote(
+                        self.identifier, self.identifier, self.create_followers_list()
+                    )
+                ]
             case (raftrole.Role.LEADER, raftrole.Role.FOLLOWER):
                 self.change_role(from_role, to_role)
                 return []
@@ -556,65 +1050,93 @@ class RaftState:
         self, source: int, target: int, text: str
     ) -> List[raftmessage.Message]:
         """
-        Simplify testing by enabling state to be exposed.
+        Simplify testing by enabling state to be exposed, and toggle logging at
+        runtime.
         """
         if text.startswith("self"):
-            text = "\n".join(
-                [f"{item[0]}: {str(item[1])}" for item in sorted(vars(self).items())]
+            raftlogging.log(
+                LOGGER, logging.INFO, "state", **dict(sorted(vars(self).items()))
             )
-            print("\n\n" + "\033[37m" + text)
+
+        else:
+            raftlogging.handle_command(text)
 
         return []
 
     ###   PUBLIC INTERFACE
 
     def handle_message(self, message: raftmessage.Message) -> List[raftmessage.Message]:
-        match message:
-            case raftmessage.ClientLogAppend():
-                return self.handle_client_log_append(**vars(message))
-
-            case raftmessage.UpdateFollowers():
-                return self.handle_leader_heartbeat(**vars(message))
-
-            case raftmessage.AppendEntryRequest():
-                return self.handle_append_entries_request(**vars(message))
-
-            case raftmessage.AppendEntryResponse():
-                return self.handle_append_entries_response(**vars(message))
-
-            case raftmessage.RunElection():
-                return self.handle_candidate_solicitation(**vars(message))
-
-            case raftmessage.RequestVoteRequest():
-                return self.handle_request_vote_request(**vars(message))
-
-            case raftmessage.RequestVoteResponse():
-                return self.handle_request_vote_response(**vars(message))
-
-            case raftmessage.RoleChange():
-                return self.handle_role_change(**vars(message))
-
-            case raftmessage.Text():
-                return self.handle_text(**vars(message))
-
-            case _:
-                raise Exception(
-                    "Exhaustive switch error on message type with message {message}."
-                )
+        message_class = type(message)
+        handler = HANDLERS.get(message_class)
 
+        if handler is None:
+            raise Exception(
+                f"Exhaustive switch error on message type with message {message}."
+            )
 
-def change_state_on_timeout(state: RaftState) -> raftmessage.Message:
+        # Handler parameters follow message fields in order.
+        return handler(self, *raftmessage.FIELD_VALUES[message_class](message))
+
+
+# Handler of each message type, looked up by class rather than matched in turn.
+HANDLERS: Dict[Type[raftmessage.Message], Callable[..., List[raftmessage.Message]]] = {
+    raftmessage.ClientLogAppend: RaftState.handle_client_log_append,
+    raftmessage.UpdateFollowers: RaftState.handle_leader_heartbeat,
+    raftmessage.AppendEntryRequest: RaftState.handle_append_entries_request,
+    raftmessage.AppendEntryResponse: RaftState.handle_append_entries_response,
+    raftmessage.RunElection: RaftState.handle_candidate_solicitation,
+    raftmessage.RequestVoteRequest: RaftState.handle_request_vote_request,
+    raftmessage.RequestVoteResponse: RaftState.handle_request_vote_response,
+    raftmessage.RunPreVote: RaftState.handle_pre_vote_solicitation,
+    raftmessage.PreVoteRequest: RaftState.handle_pre_vote_request,
+    raftmessage.PreVoteResponse: RaftState.handle_pre_vote_response,
+    raftmessage.TransferLeadership: RaftState.handle_transfer_leadership,
+    raftmessage.TimeoutNow: RaftState.handle_timeout_now,
+    raftmessage.AddMember: RaftState.handle_add_member,
+    raftmessage.RemoveMember: RaftState.handle_remove_member,
+    raftmessage.RoleChange: RaftState.handle_role_change,
+    raftmessage.Text: RaftState.handle_text,
+}
+
+# If receive leader heartbeat or vote request/response, push back the election
+# timeout to disable follower role change.
+TIMEOUT_RESETS = [
+    (raftrole.Role.FOLLOWER, raftmessage.AppendEntryRequest),
+    (raftrole.Role.FOLLOWER, raftmessage.RequestVoteRequest),
+    (raftrole.Role.CANDIDATE, raftmessage.RequestVoteResponse),
+    (raftrole.Role.PRE_CANDIDATE, raftmessage.PreVoteResponse),
+]
+
+
+def change_state_on_timeout(
+    state: RaftState, election_timeout: Optional[float] = None
+) -> Optional[raftmessage.Message]:
     """
     Carved out from class as state change on timeout is called from RaftServer
-    rather than RaftState.
+    rather than RaftState. For leaders, election_timeout is the time without
+    contact after which followers are considered lost, with no check when not
+    given.
     """
     match state.role:
         case raftrole.Role.FOLLOWER:
+            state.leader_active = False
+
+            # Servers outside membership wait to be added rather than campaign.
+            if state.identifier not in state.config:
+                return None
+
             return raftmessage.RoleChange(
                 state.identifier,
                 state.identifier,
                 raftrole.Role.FOLLOWER,
-                raftrole.Role.CANDIDATE,
+                raftrole.Role.PRE_CANDIDATE
+                if state.pre_vote
+                else raftrole.Role.CANDIDATE,
+            )
+
+        case raftrole.Role.PRE_CANDIDATE:
+            return raftmessage.RunPreVote(
+                state.identifier, state.identifier, state.create_followers_list()
             )
 
         case raftrole.Role.CANDIDATE:
@@ -624,25 +1146,73 @@ def change_state_on_timeout(state: RaftState) -> raftmessage.Message:
             )
 
         case raftrole.Role.LEADER:
-            # Check that as leader, has_followers has been initialized.
-            assert state.has_followers is not None
-
-            # If no response received from previous heartbeat, step down as
-            # leader.
-            if not state.has_followers:
-                return raftmessage.RoleChange(
-                    state.identifier,
-                    state.identifier,
-                    raftrole.Role.LEADER,
-                    raftrole.Role.FOLLOWER,
-                )
+            if election_timeout is not None:
+                # If majority not in contact within election timeout, step down
+                # as leader.
+                if not state.has_quorum(election_timeout):
+                    return raftmessage.RoleChange(
+                        state.identifier,
+                        state.identifier,
+                        raftrole.Role.LEADER,
+                        raftrole.Role.FOLLOWER,
+                    )
 
-            # Otherwise send out another heartbeat.
-            state.has_followers = False
+                # Abandon leadership transfer not complete within an election
+                # timeout, resuming client requests.
+                if (
+                    state.transfer_started is not None
+                    and state.clock() - state.transfer_started >= election_timeout
+                ):
+                    state.transfer_target = None
+                    state.transfer_started = None
 
+            # Otherwise send out another heartbeat.
             return raftmessage.UpdateFollowers(
-                state.identifier, state.identifier, state.create_followers_list()
+                state.identifier, state.identifier, state.create_replication_list()
             )
 
         case _:
             raise Exception("Exhaustive switch error on state change on timeout.")
+
+
+def save_state(state: RaftState, path: str) -> None:
+    """
+    Persist current term, vote and log, the state Raft requires to survive a
+    restart. Written to a temporary file and renamed into place, so that a
+    failed write leaves the previous state intact.
+    """
+    attributes: Dict[str, object] = {
+        "current_term": state.current_term,
+        "log": [raftmessage.encode_entry(entry) for entry in state.log],
+    }
+
+    if state.voted_for is not None:
+        attributes["voted_for"] = state.voted_for
+
+    temporary = f"{path}.tmp"
+
+    with open(temporary, "wb") as file:
+        file.write(rafthelpers.encode_item(attributes))
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temporary, path)
+
+
+def load_state(state: RaftState, path: str) -> bool:
+    """
+    Restore state persisted by a previous run, returning whether there was any.
+    Membership is taken from the restored log.
+    """
+    if not os.path.exists(path):
+        return False
+
+    with open(path, "rb") as file:
+        attributes = rafthelpers.decode_item(file.read())
+
+    state.current_term = attributes["current_term"]
+    state.voted_for = attributes.get("voted_for")
+    state.log = [raftmessage.decode_entry(entry) for entry in attributes["log"]]
+    state.update_config()
+
+    return True
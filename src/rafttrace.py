@@ -0,0 +1,147 @@
+"""
+Per-message trace spans, to find where time goes between a client append and
+its commit: queueing, decoding, handling, encoding or sending.
+
+Tracing is optional and off by default. A server with tracing on starts a trace
+for each client append, and messages sent while handling a traced message carry
+its trace id, so that the trace follows an entry from the leader to followers
+and back.
+
+- Trace ids travel in a wrapper around the encoded message, a marker byte and
+  an 8-byte id, so that nodes can tell traced messages apart without decoding
+  them. Encoded messages are bencoded dictionaries, which never start with the
+  marker.
+- Spans are timed with the monotonic clock, shared by all processes on a host.
+  Messages waiting on a queue are timed from the time they were queued, kept by
+  object identity until taken off the queue.
+- Spans are kept in memory, and dumped as Chrome trace events, viewable in
+  chrome://tracing or Perfetto. Dumps from several servers can be merged into
+  one file, with a process per server.
+"""
+
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import argparse
+import collections
+import dataclasses
+import json
+import random
+import threading
+import time
+
+MARKER = b"t"
+HEADER_LENGTH = 9
+
+# Most spans kept by each tracer, with the oldest dropped first.
+CAPACITY = 100000
+
+# Time each traced payload was queued, by object identity. Ids are unique among
+# live objects, and payloads stay alive while queued.
+QUEUED: Dict[int, float] = {}
+
+
+def wrap(trace: int, payload: bytes) -> bytes:
+    return MARKER + trace.to_bytes(8, byteorder="big") + payload
+
+
+def unwrap(payload: bytes) -> Tuple[Optional[int], bytes]:
+    if not payload.startswith(MARKER):
+        return None, payload
+
+    trace = int.from_bytes(payload[1:HEADER_LENGTH], byteorder="big")
+    return trace, payload[HEADER_LENGTH:]
+
+
+def enqueue(payload: bytes) -> None:
+    if payload.startswith(MARKER):
+        # Payloads discarded while queued are never taken off, so bound the
+        # times kept.
+        if len(QUEUED) >= CAPACITY:
+            QUEUED.clear()
+
+        QUEUED[id(payload)] = time.monotonic()
+
+
+def dequeue(payload: bytes) -> Optional[float]:
+    if not payload.startswith(MARKER):
+        return None
+
+    return QUEUED.pop(id(payload), None)
+
+
+@dataclasses.dataclass
+class Tracer:
+    identifier: int
+    path: str
+    capacity: int = CAPACITY
+
+    def __post_init__(self) -> None:
+        self.events: Deque[Dict[str, Any]] = collections.deque(maxlen=self.capacity)
+
+    def start_trace(self) -> int:
+        return random.getrandbits(63)
+
+    def record(
+        self, trace: int, stage: str, start: float, end: float, **fields: Any
+    ) -> None:
+        self.events.append(
+            {
+                "name": stage,
+                "cat": "raft",
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": self.identifier,
+                "tid": threading.get_native_id(),
+                "args": {"trace": f"{trace:016x}", **fields},
+            }
+        )
+
+    def delivered(self, messages: List[bytes], start: float, end: float) -> None:
+        """
+        Messages written to a peer together, from start to end.
+        """
+        for message in messages:
+            queued = dequeue(message)
+            trace, _ = unwrap(message)
+
+            if trace is None:
+                continue
+
+            if queued is not None:
+                self.record(trace, "outgoing", queued, start)
+
+            self.record(trace, "send", start, end, size=len(message))
+
+    def dump(self) -> None:
+        events = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": self.identifier,
+                "args": {"name": f"server {self.identifier}"},
+            }
+        ]
+        events += list(self.events)
+
+        with open(self.path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+def merge_traces(paths: List[str]) -> Dict[str, Any]:
+    events = []
+
+    for path in paths:
+        with open(path) as file:
+            events += json.load(file)["traceEvents"]
+
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge trace dumps of servers.")
+    parser.add_argument("output")
+    parser.add_argument("traces", nargs="+")
+    args = parser.parse_args()
+
+    with open(args.output, "w") as file:
+        json.dump(merge_traces(args.traces), file)
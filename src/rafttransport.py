@@ -0,0 +1,172 @@
+"""
+Transports that carry raw messages between nodes. RaftNode is agnostic to how
+bytes get from one node to another, and delegates to one of the following.
+
+- TCP sockets, for nodes on different hosts.
+- Unix domain sockets, for nodes sharing a host, avoiding the TCP stack.
+- In-process queues, for several nodes embedded in a single process, avoiding
+  sockets altogether.
+"""
+
+from typing import Dict, Optional, Tuple, Union
+import abc
+import dataclasses
+import enum
+import os
+import queue
+import socket
+import tempfile
+
+import raftconfig
+
+Address = Union[Tuple[str, int], str]
+
+
+class TransportType(enum.Enum):
+    TCP = "tcp"
+    UNIX = "unix"
+    IN_PROCESS = "inprocess"
+
+
+@dataclasses.dataclass
+class StreamTransport(abc.ABC):
+    """
+    Base for transports backed by stream sockets. Subclasses specify the socket
+    family and how an identifier maps to an address.
+    """
+
+    def __post_init__(self) -> None:
+        self.family: socket.AddressFamily = socket.AF_INET
+
+    @abc.abstractmethod
+    def address(self, identifier: int) -> Address:
+        pass
+
+    def listen(self, identifier: int) -> socket.socket:
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, True)
+
+        sock.bind(self.address(identifier))
+        sock.listen()
+
+        return sock
+
+    def connect(self, address: Address, timeout: float) -> socket.socket:
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+
+        try:
+            sock.connect(address)
+
+        except OSError:
+            sock.close()
+            raise
+
+        return sock
+
+
+@dataclasses.dataclass
+class TcpTransport(StreamTransport):
+    """
+    Addresses start from the static configuration, and are extended as members
+    join the cluster.
+    """
+
+    addresses: Dict[int, Tuple[str, int]] = dataclasses.field(
+        default_factory=lambda: dict(raftconfig.ADDRESS_BY_IDENTIFIER)
+    )
+    client_address: Tuple[str, int] = raftconfig.CLIENT_ADDRESS
+
+    def __post_init__(self) -> None:
+        self.family = socket.AF_INET
+
+    def address(self, identifier: int) -> Address:
+        return self.addresses.get(identifier, self.client_address)
+
+    def connect(self, address: Address, timeout: float) -> socket.socket:
+        sock = super().connect(address, timeout)
+
+        # Messages are small and latency sensitive.
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, True)
+
+        return sock
+
+
+@dataclasses.dataclass
+class UnixTransport(StreamTransport):
+    """
+    Socket files are named after the node identifier within a shared
+    directory, so any node in the cluster can be reached without configuring
+    addresses.
+    """
+
+    directory: str = dataclasses.field(default_factory=tempfile.gettempdir)
+
+    def __post_init__(self) -> None:
+        self.family = socket.AF_UNIX
+
+    def address(self, identifier: int) -> Address:
+        return os.path.join(self.directory, f"raft-{identifier}.sock")
+
+    def listen(self, identifier: int) -> socket.socket:
+        path = self.address(identifier)
+        assert isinstance(path, str)
+
+        # Remove socket file left behind by a previous run.
+        if os.path.exists(path):
+            os.unlink(path)
+
+        return super().listen(identifier)
+
+
+@dataclasses.dataclass
+class InProcessTransport:
+    """
+    Shared between nodes in the same process. Delivery puts the message
+    directly on the incoming queue of the target node; messages to nodes not
+    attached are discarded, as with a remote server that is not operational.
+    """
+
+    def __post_init__(self) -> None:
+        self.queues: Dict[int, queue.SimpleQueue] = {}
+
+    def attach(self, identifier: int, incoming: queue.SimpleQueue) -> None:
+        self.queues[identifier] = incoming
+
+    def detach(self, identifier: int) -> None:
+        self.queues.pop(identifier, None)
+
+    def deliver(self, identifier: int, message: bytes) -> bool:
+        incoming = self.queues.get(identifier)
+
+        if incoming is None:
+            return False
+
+        incoming.put(message)
+        return True
+
+
+Transport = Union[StreamTransport, InProcessTransport]
+
+
+def create_transport(
+    transport_type: TransportType, cluster: Optional[raftconfig.ClusterConfig] = None
+) -> Transport:
+    cluster = cluster or raftconfig.ClusterConfig()
+
+    match transport_type:
+        case TransportType.TCP:
+            return TcpTransport(dict(cluster.addresses), cluster.client_address)
+
+        case TransportType.UNIX:
+            if cluster.directory is None:
+                return UnixTransport()
+
+            os.makedirs(cluster.directory, exist_ok=True)
+            return UnixTransport(cluster.directory)
+
+        case TransportType.IN_PROCESS:
+            return InProcessTransport()
+
+        case _:
+            raise Exception(f"Exhaustive switch error on transport {transport_type}.")
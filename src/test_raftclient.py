@@ -0,0 +1,25 @@
+import threading
+import time
+
+import raftclient
+import raftmessage
+import rafttransport
+
+
+def test_client_receive(capsys) -> None:
+    client = raftclient.RaftClient(100, rafttransport.InProcessTransport(), {})
+    threading.Thread(target=client.receive, daemon=True).start()
+
+    message = raftmessage.ClientLogCommit(1, 100, 0, b"a")
+    client.node.send(100, raftmessage.encode_message(message))
+
+    # Acknowledgements are taken off the incoming queue and printed.
+    deadline = time.monotonic() + 2
+    output = ""
+
+    while repr(message) not in output:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+        output += capsys.readouterr().out
+
+    assert client.node.incoming.empty()
@@ -0,0 +1,102 @@
+import raftconfig
+import raftframe
+import raftserver
+import rafttransport
+
+import pytest
+
+
+def test_timing_profiles():
+    for profile in raftconfig.TIMING_PROFILES.values():
+        timeout = profile.election_timeout()
+        assert profile.election_timeout_min <= timeout <= profile.election_timeout_max
+
+    low_latency = raftconfig.load_timing_profile("low-latency")
+    assert low_latency.heartbeat_interval < 0.1
+
+
+def test_invalid_timing_profiles():
+    with pytest.raises(Exception):
+        raftconfig.TimingProfile(0, 1, 2)
+
+    with pytest.raises(Exception):
+        raftconfig.TimingProfile(1, 1.5, 2)
+
+    with pytest.raises(Exception):
+        raftconfig.TimingProfile(1, 3, 2)
+
+    with pytest.raises(Exception):
+        raftconfig.load_timing_profile("unknown")
+
+
+def test_cluster_config(tmp_path):
+    cluster = raftconfig.create_cluster_config(9, port=17000)
+    assert sorted(cluster.addresses) == list(range(1, 10))
+    assert cluster.addresses[9] == ("localhost", 17008)
+
+    path = tmp_path / "cluster.json"
+    path.write_text(
+        '{"nodes": {"1": ["localhost", 7000], "12": ["localhost", 7011]}, '
+        + '"transport": "unix", "timing": {"heartbeat_interval": 0.1, '
+        + '"election_timeout_min": 0.3, "election_timeout_max": 0.6}}'
+    )
+
+    parser = raftconfig.create_parser("test")
+    args = parser.parse_args(["12", "--config", str(path), "--pre-vote"])
+    cluster = raftconfig.parse_cluster_config(args)
+    assert cluster.addresses == {1: ("localhost", 7000), 12: ("localhost", 7011)}
+    assert cluster.transport == "unix"
+    assert cluster.timing.heartbeat_interval == 0.1
+    assert cluster.pre_vote
+
+    # Positional arguments take precedence over config file.
+    args = parser.parse_args(["1", "tcp", "low-latency", "--config", str(path)])
+    cluster = raftconfig.parse_cluster_config(args)
+    assert cluster.transport == "tcp"
+    assert cluster.timing == raftconfig.load_timing_profile("low-latency")
+
+    with pytest.raises(Exception):
+        raftconfig.create_cluster_config(3, port=65534)
+
+
+def test_compression_config(tmp_path):
+    cluster = raftconfig.ClusterConfig()
+    assert cluster.codecs == (raftframe.Codec.ZLIB,)
+    assert cluster.compression_threshold == raftframe.COMPRESSION_THRESHOLD
+
+    path = tmp_path / "cluster.json"
+    path.write_text(
+        '{"nodes": {"1": ["localhost", 7000]}, "codecs": ["lzma", "zlib"], '
+        + '"compression_threshold": null}'
+    )
+
+    parser = raftconfig.create_parser("test")
+    args = parser.parse_args(["1", "--config", str(path)])
+    cluster = raftconfig.parse_cluster_config(args)
+    assert cluster.codecs == (raftframe.Codec.LZMA, raftframe.Codec.ZLIB)
+    assert cluster.compression_threshold is None
+
+    # Arguments take precedence over config file.
+    args = parser.parse_args(
+        ["1", "--config", str(path), "--codecs", "zlib", "--compression-threshold", "0"]
+    )
+    cluster = raftconfig.parse_cluster_config(args)
+    assert cluster.codecs == (raftframe.Codec.ZLIB,)
+    assert cluster.compression_threshold == 0
+
+    args = parser.parse_args(["1", "--compression-threshold", "-1"])
+    assert raftconfig.parse_cluster_config(args).compression_threshold is None
+
+    with pytest.raises(Exception):
+        raftconfig.load_codecs(["brotli"])
+
+
+def test_server_compression_config():
+    server = raftserver.RaftServer(
+        1,
+        rafttransport.InProcessTransport(),
+        codecs=(raftframe.Codec.LZMA,),
+        compression_threshold=None,
+    )
+    assert server.node.codecs == (raftframe.Codec.LZMA,)
+    assert server.node.compression_threshold is None
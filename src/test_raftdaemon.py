@@ -0,0 +1,58 @@
+import os
+import queue
+import threading
+
+import raftdaemon
+import raftmessage
+import raftserver
+import raftstate
+import rafttransport
+
+
+def test_graceful_shutdown(tmp_path) -> None:
+    server = raftserver.RaftServer(1, rafttransport.InProcessTransport())
+    server.state.current_term = 3
+    state_path = raftdaemon.create_state_path(str(tmp_path), 1)
+    ready_file = str(tmp_path / "ready")
+
+    thread = threading.Thread(
+        target=raftdaemon.run, args=(server, state_path, ready_file)
+    )
+    thread.start()
+    server.stop()
+    thread.join(5)
+
+    # Ready file removed and state persisted once stopped.
+    assert not thread.is_alive()
+    assert not os.path.exists(ready_file)
+
+    restored = raftstate.RaftState(1)
+    assert raftstate.load_state(restored, state_path)
+    assert restored.current_term == 3
+
+
+def test_state_persisted_before_response(tmp_path) -> None:
+    transport = rafttransport.InProcessTransport()
+    server = raftserver.RaftServer(1, transport)
+    candidate: queue.SimpleQueue = queue.SimpleQueue()
+    transport.attach(2, candidate)
+    state_path = raftdaemon.create_state_path(str(tmp_path), 1)
+
+    thread = threading.Thread(target=raftdaemon.run, args=(server, state_path))
+    thread.start()
+
+    try:
+        request = raftmessage.RequestVoteRequest(2, 1, 5, -1, -1)
+        server.node.incoming.put(raftmessage.encode_message(request))
+        response = raftmessage.decode_message(candidate.get(timeout=2))
+        assert isinstance(response, raftmessage.RequestVoteResponse)
+        assert response.success
+
+        # Vote on disk by the time it is granted, without a clean shutdown.
+        restored = raftstate.RaftState(1)
+        assert raftstate.load_state(restored, state_path)
+        assert (restored.current_term, restored.voted_for) == (5, 2)
+
+    finally:
+        server.stop()
+        thread.join(5)
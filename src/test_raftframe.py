@@ -0,0 +1,35 @@
+import raftframe
+
+
+def test_negotiate_codec():
+    mask = raftframe.encode_codecs([raftframe.Codec.ZLIB, raftframe.Codec.LZMA])
+    assert mask == 3
+
+    assert (
+        raftframe.negotiate_codec([raftframe.Codec.LZMA, raftframe.Codec.ZLIB], mask)
+        == raftframe.Codec.LZMA
+    )
+    assert raftframe.negotiate_codec([raftframe.Codec.LZMA], 1) == raftframe.Codec.NONE
+    assert raftframe.negotiate_codec([], mask) == raftframe.Codec.NONE
+
+
+def test_frame_translation():
+    heartbeat = b"d6:sourcei1e6:targeti2ee"
+    frame = raftframe.encode_frame(heartbeat, raftframe.Codec.ZLIB)
+
+    # Small payloads skip compression.
+    assert frame[4] == raftframe.Codec.NONE.value
+    assert raftframe.decode_frame(frame) == heartbeat
+
+    for codec in [raftframe.Codec.ZLIB, raftframe.Codec.LZMA]:
+        entries = b"d4:item1:a4:termi5ee" * 1000
+        frame = raftframe.encode_frame(entries, codec)
+
+        assert frame[4] == codec.value
+        assert len(frame) < len(entries)
+        assert raftframe.decode_frame(frame) == entries
+
+    # Compression disabled when no threshold is set.
+    frame = raftframe.encode_frame(entries, raftframe.Codec.ZLIB, None)
+    assert frame[4] == raftframe.Codec.NONE.value
+    assert raftframe.decode_frame(frame) == entries
@@ -2,41 +2,56 @@ import rafthelpers
 
 
 def test_encode_items():
-    assert rafthelpers.encode_item(None) == ""
-    assert rafthelpers.encode_item("") == "0:"
-    assert rafthelpers.encode_item([]) == "le"
-    assert rafthelpers.encode_item({}) == "de"
+    assert rafthelpers.encode_item(None) == b""
+    assert rafthelpers.encode_item("") == b"0:"
+    assert rafthelpers.encode_item([]) == b"le"
+    assert rafthelpers.encode_item({}) == b"de"
 
-    assert rafthelpers.encode_item(1) == "i1e"
-    assert rafthelpers.encode_item(-1) == "i-1e"
-    assert rafthelpers.encode_item(0) == "i0e"
-    assert rafthelpers.encode_item("foo") == "3:foo"
+    assert rafthelpers.encode_item(1) == b"i1e"
+    assert rafthelpers.encode_item(-1) == b"i-1e"
+    assert rafthelpers.encode_item(0) == b"i0e"
+    assert rafthelpers.encode_item("foo") == b"3:foo"
 
-    assert rafthelpers.encode_item([1]) == "li1ee"
-    assert rafthelpers.encode_item(["foo"]) == "l3:fooe"
-    assert rafthelpers.encode_item([1, "foo"]) == "li1e3:fooe"
-    assert rafthelpers.encode_item({"foo": 1}) == "d3:fooi1ee"
+    assert rafthelpers.encode_item([1]) == b"li1ee"
+    assert rafthelpers.encode_item(["foo"]) == b"l3:fooe"
+    assert rafthelpers.encode_item([1, "foo"]) == b"li1e3:fooe"
+    assert rafthelpers.encode_item({"foo": 1}) == b"d3:fooi1ee"
 
-    assert rafthelpers.encode_item([1, ["foo"]]) == "li1el3:fooee"
-    assert rafthelpers.encode_item({"foo": [1]}) == "d3:fooli1eee"
-    assert rafthelpers.encode_item([{"foo": 1}]) == "ld3:fooi1eee"
-    assert rafthelpers.encode_item({"foo": {"bar": "baz"}}) == "d3:food3:bar3:bazee"
+    assert rafthelpers.encode_item([1, ["foo"]]) == b"li1el3:fooee"
+    assert rafthelpers.encode_item({"foo": [1]}) == b"d3:fooli1eee"
+    assert rafthelpers.encode_item([{"foo": 1}]) == b"ld3:fooi1eee"
+    assert rafthelpers.encode_item({"foo": {"bar": "baz"}}) == b"d3:food3:bar3:bazee"
 
 
 def test_decode_items():
-    assert rafthelpers.decode_item("") == None
-    assert rafthelpers.decode_item("0:") == ""
-    assert rafthelpers.decode_item("le") == []
-    assert rafthelpers.decode_item("de") == {}
-    assert rafthelpers.decode_item("i1e") == 1
-    assert rafthelpers.decode_item("i-1e") == -1
-    assert rafthelpers.decode_item("i0e") == 0
-    assert rafthelpers.decode_item("3:foo") == "foo"
-    assert rafthelpers.decode_item("li1ee") == [1]
-    assert rafthelpers.decode_item("l3:fooe") == ["foo"]
-    assert rafthelpers.decode_item("li1e3:fooe") == [1, "foo"]
-    assert rafthelpers.decode_item("d3:fooi1ee") == {"foo": 1}
-    assert rafthelpers.decode_item("li1el3:fooee") == [1, ["foo"]]
-    assert rafthelpers.decode_item("d3:fooli1eee") == {"foo": [1]}
-    assert rafthelpers.decode_item("ld3:fooi1eee") == [{"foo": 1}]
-    assert rafthelpers.decode_item("d3:food3:bar3:bazee") == {"foo": {"bar": "baz"}}
+    assert rafthelpers.decode_item(b"") == None
+    assert rafthelpers.decode_item(b"0:") == b""
+    assert rafthelpers.decode_item(b"le") == []
+    assert rafthelpers.decode_item(b"de") == {}
+    assert rafthelpers.decode_item(b"i1e") == 1
+    assert rafthelpers.decode_item(b"i-1e") == -1
+    assert rafthelpers.decode_item(b"i0e") == 0
+    assert rafthelpers.decode_item(b"3:foo") == b"foo"
+    assert rafthelpers.decode_item(b"li1ee") == [1]
+    assert rafthelpers.decode_item(b"l3:fooe") == [b"foo"]
+    assert rafthelpers.decode_item(b"li1e3:fooe") == [1, b"foo"]
+    assert rafthelpers.decode_item(b"d3:fooi1ee") == {"foo": 1}
+    assert rafthelpers.decode_item(b"li1el3:fooee") == [1, [b"foo"]]
+    assert rafthelpers.decode_item(b"d3:fooli1eee") == {"foo": [1]}
+    assert rafthelpers.decode_item(b"ld3:fooi1eee") == [{"foo": 1}]
+    assert rafthelpers.decode_item(b"d3:food3:bar3:bazee") == {"foo": {"bar": b"baz"}}
+
+
+def test_binary_items():
+    assert rafthelpers.encode_item(b"\x00\xff") == b"2:\x00\xff"
+    assert rafthelpers.encode_item("\u00e9") == b"2:\xc3\xa9"
+    assert rafthelpers.decode_item(b"2:\x00\xff") == b"\x00\xff"
+    assert rafthelpers.decode_item(b"l2:e:e") == [b"e:"]
+
+
+def test_dict_encoder():
+    encode = rafthelpers.dict_encoder(("foo", "bar"))
+
+    # Same as encoding the dictionary, with keys in sorted order.
+    assert encode((1, "baz")) == rafthelpers.encode_item({"foo": 1, "bar": "baz"})
+    assert encode([[1], {"a": 2}]) == b"d3:bard1:ai2ee3:fooli1eee"
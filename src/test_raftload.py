@@ -0,0 +1,28 @@
+import os
+
+import raftload
+
+
+def test_read_usage():
+    usage = raftload.read_usage(os.getpid())
+
+    assert usage["cpu_seconds"] > 0
+    assert 0 < usage["rss_bytes"] <= usage["peak_rss_bytes"]
+
+
+def test_load_results():
+    before = {1: {"cpu_seconds": 1.0, "rss_bytes": 10, "peak_rss_bytes": 20}}
+    after = {1: {"cpu_seconds": 2.0, "rss_bytes": 10, "peak_rss_bytes": 30}}
+    latencies = [0.001 * i for i in range(1, 1001)]
+
+    results = raftload.summarize(latencies, 1, 2.0, before, after)
+
+    assert results["commits_per_second"] == 500
+    assert results["latency_seconds"]["p999"] == latencies[998]
+    assert results["nodes"]["1"]["cpu_percent"] == 50
+
+    baseline = raftload.summarize(latencies[:500], 0, 2.0, before, after)
+    ratios = raftload.compare(results, baseline)
+
+    assert ratios["commits_per_second"] == 2
+    assert ratios["p50 latency"] == 2
@@ -0,0 +1,33 @@
+import io
+import json
+import logging
+
+import raftlogging
+import raftrole
+
+
+def test_structured_logging() -> None:
+    stream = io.StringIO()
+    raftlogging.configure("info", 2, True, stream)
+
+    logger = raftlogging.get_logger("server")
+    messages = logging.getLogger(raftlogging.MESSAGE)
+
+    raftlogging.log(logger, logging.INFO, "role change", role=raftrole.Role.LEADER)
+
+    # Message events disabled at info level, and sampled once enabled.
+    raftlogging.log(messages, logging.DEBUG, "receive", source=1)
+    assert raftlogging.handle_command("log debug")
+
+    for source in range(4):
+        raftlogging.log(messages, logging.DEBUG, "receive", source=source)
+
+    assert not raftlogging.handle_command("self")
+    raftlogging.handle_command("log info")
+    raftlogging.shutdown()
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    events = [(record["event"], record.get("source")) for record in records]
+
+    assert records[0]["role"] == "LEADER"
+    assert events[2:4] == [("receive", 1), ("receive", 3)]
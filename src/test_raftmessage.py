@@ -1,18 +1,105 @@
+import rafthelpers
 import raftlog
 import raftmessage
+import raftrole
+import raftstate
 
 
 def test_message_translation():
     message = raftmessage.AppendEntryRequest(
-        1, 2, 3, 4, 5, [raftlog.LogEntry(5, "a"), raftlog.LogEntry(6, "b")], -1
+        1, 2, 3, 4, 5, [raftlog.LogEntry(5, b"a"), raftlog.LogEntry(6, b"b")], -1
     )
 
     string = (
-        "d12:commit_indexi-1e12:current_termi3e"
-        + "7:entriesld4:item1:a4:termi5eed4:item1:b4:termi6eee"
-        + "12:message_type14:APPEND_REQUEST14:previous_indexi4e13:previous_termi5e"
-        + "6:sourcei1e6:targeti2ee"
+        b"d12:commit_indexi-1e12:current_termi3e"
+        + b"7:entriesld4:item1:a4:termi5eed4:item1:b4:termi6eee"
+        + b"12:message_type14:APPEND_REQUEST14:previous_indexi4e13:previous_termi5e"
+        + b"6:sourcei1e6:targeti2ee"
     )
 
     assert raftmessage.encode_message(message) == string
     assert raftmessage.decode_message(string) == message
+
+
+def test_message_encoders():
+    messages = [
+        raftmessage.AppendEntryResponse(1, 2, 3, True, 4),
+        raftmessage.AddMember(0, 1, 4, "localhost", 7003, True),
+        raftmessage.RoleChange(1, 1, raftrole.Role.LEADER, raftrole.Role.FOLLOWER),
+        raftmessage.UpdateFollowers(1, 1, [2, 3]),
+    ]
+
+    # Same bytes as encoding a dict of the converted attributes.
+    attributes = [
+        {"current_term": 3, "match_index": 4, "success": 1},
+        {"member": 4, "host": "localhost", "port": 7003, "replica": 1},
+        {"from_role": "LEADER", "to_role": "FOLLOWER"},
+        {"followers": [2, 3]},
+    ]
+
+    for message, fields in zip(messages, attributes):
+        fields["source"], fields["target"] = message.source, message.target
+        fields["message_type"] = raftmessage.MESSAGE_TYPES[type(message)].value
+
+        assert raftmessage.encode_message(message) == rafthelpers.encode_item(fields)
+        assert (
+            raftmessage.decode_message(raftmessage.encode_message(message)) == message
+        )
+
+
+def test_binary_message_translation():
+    message = raftmessage.ClientLogAppend(0, 1, b"\x00\xff\n")
+
+    assert raftmessage.decode_message(raftmessage.encode_message(message)) == message
+
+    message = raftmessage.ClientLogCommit(1, 0, 3, b"\x00\xff\n")
+
+    assert raftmessage.decode_message(raftmessage.encode_message(message)) == message
+
+
+def test_membership_message_translation():
+    members = {1: ("localhost", 7000), 4: ("localhost", 7003)}
+    learners = {5: ("localhost", 7004, True)}
+    message = raftmessage.AppendEntryRequest(
+        1,
+        2,
+        3,
+        4,
+        5,
+        [raftlog.LogEntry(5, b""), raftlog.LogEntry(6, b"", members, learners)],
+        -1,
+    )
+
+    assert raftmessage.decode_message(raftmessage.encode_message(message)) == message
+
+    message = raftmessage.AddMember(0, 1, 4, "localhost", 7003, True)
+
+    assert raftmessage.decode_message(raftmessage.encode_message(message)) == message
+
+
+def test_message_tables():
+    assert set(raftmessage.MESSAGE_CLASSES) == set(raftmessage.MessageType)
+
+    # Commits are acknowledged to clients, and never handled by servers.
+    assert set(raftstate.HANDLERS) == set(raftmessage.MESSAGE_TYPES) - {
+        raftmessage.ClientLogCommit
+    }
+
+    message = raftmessage.AppendEntryResponse(1, 2, 3, True, 4)
+
+    assert not hasattr(message, "__dict__")
+    assert raftmessage.FIELD_VALUES[type(message)](message) == (1, 2, 3, True, 4)
+
+
+def test_merge_messages() -> None:
+    entry = raftlog.LogEntry(1, b"a")
+    messages = [
+        raftmessage.AppendEntryRequest(1, 2, 1, 0, 1, [], 0),
+        raftmessage.AppendEntryRequest(1, 3, 1, 0, 1, [], 0),
+        raftmessage.AppendEntryResponse(1, 0, 1, True, 1),
+        raftmessage.AppendEntryResponse(1, 0, 1, True, 1),
+        raftmessage.AppendEntryRequest(1, 2, 1, 0, 1, [entry], 0),
+    ]
+
+    # Only latest request to each target kept, and all responses.
+    assert raftmessage.merge_messages(messages) == messages[1:]
@@ -0,0 +1,49 @@
+import urllib.request
+
+import raftmetrics
+
+
+def test_metrics_rendering() -> None:
+    registry = raftmetrics.Registry()
+    counter = registry.counter("raft_elections_total", "Elections started.")
+    histogram = registry.histogram("raft_handle_seconds", "Handle time.", (0.1, 1.0))
+    registry.gauge("raft_queue_depth", "Queue depth.", lambda: {(): 3})
+
+    counter.inc()
+    counter.inc(role="LEADER")
+    histogram.observe(0.05, type="Text")
+    histogram.observe(0.5, type="Text")
+    histogram.observe(5.0, type="Text")
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE raft_elections_total counter" in lines
+    assert 'raft_elections_total{role="LEADER"} 1.0' in lines
+    assert "raft_queue_depth 3" in lines
+
+    # Buckets are cumulative, with observations above the largest bound only
+    # counted in the +Inf bucket.
+    assert lines[-8:-3] == [
+        'raft_handle_seconds_bucket{type="Text",le="0.1"} 1',
+        'raft_handle_seconds_bucket{type="Text",le="1.0"} 2',
+        'raft_handle_seconds_bucket{type="Text",le="+Inf"} 3',
+        'raft_handle_seconds_sum{type="Text"} 5.55',
+        'raft_handle_seconds_count{type="Text"} 3',
+    ]
+
+    server = raftmetrics.serve(registry, ("localhost", 0))
+    url = f"http://localhost:{server.server_address[1]}/metrics"
+
+    with urllib.request.urlopen(url) as response:
+        assert response.read().decode("utf-8") == registry.render()
+
+    server.shutdown()
+
+
+def test_percentile() -> None:
+    values = [float(value) for value in range(1, 101)]
+
+    assert raftmetrics.percentile(values, 0.5) == 50.0
+    assert raftmetrics.percentile(values, 0.99) == 99.0
+    assert raftmetrics.percentile(values, 1.0) == 100.0
+    assert raftmetrics.percentile([], 0.5) == 0.0
@@ -0,0 +1,91 @@
+from typing import Dict, List
+
+import raftconfig
+import raftmessage
+import raftmulti
+import raftrole
+import raftscheduler
+import rafttransport
+
+
+def init_hosts(groups: int, now: List[float]) -> Dict[int, raftmulti.MultiRaftHost]:
+    scheduler = raftscheduler.Scheduler(lambda: now[0])
+    transport = rafttransport.InProcessTransport()
+    timing = raftconfig.load_timing_profile("default")
+
+    hosts = {
+        i: raftmulti.MultiRaftHost(i, transport, timing, scheduler=scheduler)
+        for i in (1, 2, 3)
+    }
+
+    for host in hosts.values():
+        for group in range(groups):
+            host.add_group(group)
+
+    return hosts
+
+
+def pump(
+    hosts: Dict[int, raftmulti.MultiRaftHost],
+    source: int,
+    messages: raftmulti.Envelope,
+) -> List[int]:
+    """
+    Deliver messages between hosts until none are left, returning the number of
+    messages in each envelope sent.
+    """
+    pending = [(source, messages)]
+    sizes: List[int] = []
+
+    while pending:
+        identifier, messages = pending.pop()
+        outgoing = hosts[identifier].handle(messages)
+
+        for target, envelope in outgoing.items():
+            sizes.append(len(envelope))
+            payload = raftmulti.encode_envelope(envelope)
+            pending.append((target, raftmulti.decode_envelope(payload)))
+
+    return sizes
+
+
+def test_envelope_translation() -> None:
+    envelope = [
+        (1, raftmessage.ClientLogAppend(0, 1, b"\x00")),
+        (7, raftmessage.RequestVoteResponse(2, 1, True, 3)),
+    ]
+
+    payload = raftmulti.encode_envelope(envelope)
+    assert raftmulti.decode_envelope(payload) == envelope
+
+
+def test_coalesced_heartbeats() -> None:
+    now = [0.0]
+    hosts = init_hosts(20, now)
+
+    # Host 1 times out first in all groups, and wins every election.
+    now[0] = 10.0
+
+    for host in hosts.values():
+        for entry in host.groups.values():
+            entry.election_at = 20.0 if host.identifier != 1 else 0.0
+
+    pump(hosts, 1, hosts[1].expire())
+    assert len(hosts[1].leaders()) == 20
+
+    # Heartbeats for all groups share one envelope per peer.
+    sizes = pump(hosts, 1, hosts[1].expire())
+    assert sizes[:2] == [20, 20]
+
+    # Followers in contact with leader do not time out.
+    assert hosts[2].expire() == []
+
+    envelope: raftmulti.Envelope = [
+        (group, raftmessage.ClientLogAppend(0, 1, b"a")) for group in range(20)
+    ]
+    pump(hosts, 1, envelope)
+    pump(hosts, 1, hosts[1].expire())
+
+    for group in range(20):
+        assert hosts[1].groups[group].state.commit_index == 0
+        assert hosts[2].groups[group].state.role == raftrole.Role.FOLLOWER
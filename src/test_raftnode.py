@@ -0,0 +1,259 @@
+from typing import Callable, Dict
+import threading
+import time
+
+import pytest
+
+import raftframe
+import raftnode
+import rafttransport
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def init_nodes(port: int) -> Dict[int, raftnode.RaftNode]:
+    members = {1: ("localhost", port), 2: ("localhost", port + 1)}
+    nodes = {
+        i: raftnode.RaftNode(
+            i, rafttransport.TcpTransport(dict(members)), members=members
+        )
+        for i in members
+    }
+
+    for node in nodes.values():
+        node.start()
+
+    return nodes
+
+
+def stop_nodes(nodes: Dict[int, raftnode.RaftNode]) -> None:
+    for node in nodes.values():
+        node.stop(0)
+
+        for connection in node.connections.values():
+            if connection.sock is not None:
+                connection.detach(connection.sock)
+
+
+def test_backoff_with_jitter(monkeypatch: pytest.MonkeyPatch) -> None:
+    connection = raftnode.PeerConnection(
+        2, ("localhost", 1), 1, rafttransport.TcpTransport()
+    )
+    delays = []
+
+    def uniform(low: float, high: float) -> float:
+        delays.append((low, high))
+        return high
+
+    monkeypatch.setattr(raftnode.random, "uniform", uniform)
+
+    for _ in range(8):
+        connection.fail(None)
+
+    # Full jitter over a window doubling up to the maximum.
+    assert delays == [
+        (0, min(raftnode.BACKOFF_MAXIMUM, raftnode.BACKOFF_INITIAL * 2**i))
+        for i in range(8)
+    ]
+    assert connection.state == raftnode.ConnectionState.BACKING_OFF
+    assert not connection.is_available()
+
+    connection.retry_at = time.monotonic()
+    assert connection.is_available()
+
+
+def test_tcp_exchange() -> None:
+    nodes = init_nodes(7601)
+
+    try:
+        nodes[1].send(2, b"ping")
+        assert nodes[2].incoming.get(timeout=2) == b"ping"
+
+        # Reply goes back over the connection node 1 dialed.
+        nodes[2].send(1, b"pong")
+        assert nodes[1].incoming.get(timeout=2) == b"pong"
+
+        assert nodes[1].connections[2].dialer == 1
+        assert nodes[2].connections[1].dialer == 1
+        assert nodes[1].connections[2].attempts == 1
+        assert nodes[2].connections[1].attempts == 0
+
+    finally:
+        stop_nodes(nodes)
+
+
+def test_simultaneous_dial() -> None:
+    nodes = init_nodes(7611)
+    barrier = threading.Barrier(2)
+
+    def dial(source: int, target: int) -> None:
+        barrier.wait()
+        nodes[source].connections[target].connect()
+
+    try:
+        threads = [
+            threading.Thread(target=dial, args=args) for args in ((1, 2), (2, 1))
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        # Both ends settle on the connection dialed by the lower identifier.
+        wait_for(lambda: nodes[1].connections[2].dialer == 1)
+        wait_for(lambda: nodes[2].connections[1].dialer == 1)
+
+        nodes[1].send(2, b"1")
+        nodes[2].send(1, b"2")
+        assert nodes[2].incoming.get(timeout=2) == b"1"
+        assert nodes[1].incoming.get(timeout=2) == b"2"
+
+    finally:
+        stop_nodes(nodes)
+
+
+def test_dropped_while_down() -> None:
+    members = {1: ("localhost", 7621), 2: ("localhost", 7622)}
+    node = raftnode.RaftNode(
+        1, rafttransport.TcpTransport(dict(members)), members=members
+    )
+    node.start()
+    connection = node.connections[2]
+
+    try:
+        # Peer not listening, so the connect fails and the peer backs off.
+        node.send(2, b"a")
+        wait_for(lambda: connection.state == raftnode.ConnectionState.BACKING_OFF)
+
+        connection.retry_at = time.monotonic() + 60
+        attempts = connection.attempts
+
+        # Messages are dropped on send, without queueing or dialing.
+        for _ in range(3):
+            node.send(2, b"b")
+
+        assert node.outgoing[2].empty()
+        assert connection.attempts == attempts
+        assert connection.dropped == 4
+
+    finally:
+        node.stop(0)
+
+
+def test_peer_restart() -> None:
+    nodes = init_nodes(7631)
+
+    try:
+        nodes[1].send(2, b"a")
+        assert nodes[2].incoming.get(timeout=2) == b"a"
+
+        # Peer goes away, and node 1 notices the connection closing.
+        stop_nodes({2: nodes[2]})
+        connection = nodes[1].connections[2]
+        wait_for(lambda: connection.state == raftnode.ConnectionState.DOWN)
+
+        # Peer comes back on the same address, and is dialed again.
+        members = {1: ("localhost", 7631), 2: ("localhost", 7632)}
+        nodes[2] = raftnode.RaftNode(
+            2, rafttransport.TcpTransport(dict(members)), members=members
+        )
+        nodes[2].start()
+
+        nodes[1].send(2, b"b")
+        assert nodes[2].incoming.get(timeout=2) == b"b"
+        assert connection.state == raftnode.ConnectionState.UP
+        assert connection.attempts == 2
+
+    finally:
+        stop_nodes(nodes)
+
+
+def test_stop_flushes_outgoing() -> None:
+    nodes = init_nodes(7641)
+
+    try:
+        for i in range(100):
+            nodes[1].send(2, b"%d" % i)
+
+        assert nodes[1].stop(2)
+        assert all(
+            not outgoing.unfinished_tasks for outgoing in nodes[1].outgoing.values()
+        )
+        assert [nodes[2].incoming.get(timeout=2) for _ in range(100)] == [
+            b"%d" % i for i in range(100)
+        ]
+
+    finally:
+        stop_nodes(nodes)
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        # Unknown codec.
+        (4).to_bytes(4, byteorder="big") + b"\xff",
+        # Payload that fails to decompress.
+        (4).to_bytes(4, byteorder="big")
+        + raftframe.Codec.ZLIB.value.to_bytes(1, byteorder="big"),
+        (4).to_bytes(4, byteorder="big")
+        + raftframe.Codec.LZMA.value.to_bytes(1, byteorder="big"),
+    ],
+)
+def test_corrupt_frame(header: bytes) -> None:
+    nodes = init_nodes(7651)
+    transport = rafttransport.TcpTransport()
+
+    try:
+        # Dial as node 2, and send a corrupt frame after a valid one.
+        sock = transport.connect(("localhost", 7651), 2)
+        sock.sendall((2).to_bytes(4, byteorder="big") + b"\x01")
+        raftnode.receive_exactly(sock, 1)
+        sock.sendall(raftframe.encode_frame(b"a") + header + b"junk")
+
+        assert nodes[1].incoming.get(timeout=2) == b"a"
+        assert sock.recv(1) == b""
+        wait_for(lambda: nodes[1].connections[2].sock is None)
+        sock.close()
+
+        # Node still accepts connections after dropping the corrupt one.
+        nodes[2].send(1, b"b")
+        assert nodes[1].incoming.get(timeout=2) == b"b"
+
+    finally:
+        stop_nodes(nodes)
+
+
+def test_receive_batch() -> None:
+    node = raftnode.RaftNode(1, rafttransport.InProcessTransport())
+
+    for i in range(5):
+        node.send(1, b"%d" % i)
+
+    # Up to the limit, without waiting for more once the queue is empty.
+    assert node.receive_batch(4) == [b"0", b"1", b"2", b"3"]
+    assert node.receive_batch(4) == [b"4"]
+
+
+def test_slow_handshake() -> None:
+    nodes = init_nodes(7661)
+    transport = rafttransport.TcpTransport()
+
+    try:
+        # Connection that never sends its handshake.
+        sock = transport.connect(("localhost", 7661), raftnode.CONNECT_TIMEOUT)
+
+        # Other peers are accepted without waiting for it to time out.
+        nodes[2].send(1, b"a")
+        assert nodes[1].incoming.get(timeout=raftnode.CONNECT_TIMEOUT / 2) == b"a"
+        sock.close()
+
+    finally:
+        stop_nodes(nodes)
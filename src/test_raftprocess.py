@@ -0,0 +1,35 @@
+import multiprocessing
+import threading
+
+import raftmessage
+import raftprocess
+import raftrole
+import rafttransport
+
+
+def test_process_server_pipe() -> None:
+    connection, remote = multiprocessing.Pipe()
+    server = raftprocess.ProcessRaftServer(1, rafttransport.InProcessTransport())
+    server.connection = connection
+
+    # Messages to other servers go through the pipe unencoded, in one batch.
+    server.timeout()
+
+    # Role change, then election, are sent to self without leaving process.
+    for _ in range(2):
+        server.send(server.handle(server.node.receive()))
+
+    assert remote.poll(1)
+    kind, outgoing = remote.recv()
+    assert kind == "send"
+    assert [(target, type(message)) for target, _, message in outgoing] == [
+        (2, raftmessage.RequestVoteRequest),
+        (3, raftmessage.RequestVoteRequest),
+    ]
+    assert not remote.poll()
+
+    # Decoded messages from the network process are handled as they are.
+    remote.send(("receive", [(None, raftmessage.RequestVoteResponse(2, 1, True, 0))]))
+    threading.Thread(target=server.forward, daemon=True).start()
+    server.handle(server.node.receive())
+    assert server.state.role == raftrole.Role.LEADER
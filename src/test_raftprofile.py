@@ -0,0 +1,82 @@
+import argparse
+import pstats
+import signal
+import threading
+import time
+
+import raftmessage
+import raftprofile
+import raftserver
+import rafttransport
+
+
+def test_sampling_profiler(tmp_path) -> None:
+    profiler = raftprofile.Profiler(1, str(tmp_path))
+    stopped = threading.Event()
+
+    def spin() -> None:
+        while not stopped.is_set():
+            sum(range(100))
+
+    thread = threading.Thread(target=spin, name="spin")
+    thread.start()
+
+    path = profiler.start("sample")
+    time.sleep(0.05)
+    assert profiler.stop() == path
+
+    stopped.set()
+    thread.join()
+
+    with open(path) as file:
+        stacks = [line.rsplit(" ", 1) for line in file]
+
+    # Stacks of other threads are sampled, rooted at the thread name.
+    assert any(stack.startswith("spin;") and "spin (" in stack for stack, _ in stacks)
+    assert profiler.stop() is None
+
+
+def test_server_profile_command(tmp_path) -> None:
+    server = raftserver.RaftServer(1, rafttransport.InProcessTransport())
+    server.profiler.directory = str(tmp_path)
+
+    def command(text: str) -> None:
+        server.handle(raftmessage.encode_message(raftmessage.Text(0, 1, text)))
+
+    command("profile cpu 60")
+    assert server.profiler.running()
+
+    # Only one profile at a time.
+    command("profile sample")
+    assert server.profiler.sampler is None
+
+    command("self")
+    command("profile stop")
+
+    (path,) = tmp_path.glob("raft-1-*.prof")
+    profile = pstats.Stats(str(path)).get_stats_profile()
+    assert "handle_message" in profile.func_profiles
+
+
+def test_server_profile_signal(tmp_path) -> None:
+    server = raftserver.RaftServer(1, rafttransport.InProcessTransport())
+    args = argparse.Namespace(
+        trace=None, profile_directory=str(tmp_path), metrics_port=None
+    )
+    handlers = [signal.getsignal(signal.SIGUSR1), signal.getsignal(signal.SIGUSR2)]
+    raftserver.configure(server, args)
+
+    try:
+        # Handler queues a command rather than starting the profile itself.
+        signal.raise_signal(signal.SIGUSR1)
+        assert not server.profiler.running()
+
+        server.handle(server.node.incoming.get_nowait())
+        assert server.profiler.sampler is not None
+
+    finally:
+        server.stop_profile()
+        signal.signal(signal.SIGUSR1, handlers[0])
+        signal.signal(signal.SIGUSR2, handlers[1])
+
+    assert list(tmp_path.glob("raft-1-*.folded"))
@@ -0,0 +1,32 @@
+import raftrole
+
+
+def test_pre_vote_role_changes() -> None:
+    state_change = raftrole.enumerate_state_change(
+        raftrole.Role.STRAW_POLL, 3, raftrole.Role.FOLLOWER, 3
+    )
+    assert state_change["role_change"] == (
+        raftrole.Role.FOLLOWER,
+        raftrole.Role.PRE_CANDIDATE,
+    )
+    assert state_change["current_term"] == 3
+    assert state_change["voted_for"] == raftrole.Operation.PASS
+
+    state_change = raftrole.enumerate_state_change(
+        raftrole.Role.ELECTION_COMMISSION, 3, raftrole.Role.PRE_CANDIDATE, 3
+    )
+    assert state_change["role_change"] == (
+        raftrole.Role.PRE_CANDIDATE,
+        raftrole.Role.CANDIDATE,
+    )
+    assert state_change["current_term"] == 4
+    assert state_change["voted_for"] == raftrole.Operation.INITIALIZE
+
+    state_change = raftrole.enumerate_state_change(
+        raftrole.Role.LEADER, 3, raftrole.Role.PRE_CANDIDATE, 3
+    )
+    assert state_change["role_change"] == (
+        raftrole.Role.PRE_CANDIDATE,
+        raftrole.Role.FOLLOWER,
+    )
+    assert state_change["current_votes"] == raftrole.Operation.RESET_TO_NONE
@@ -0,0 +1,112 @@
+from typing import Optional
+
+import raftconfig
+import raftrtt
+
+import pytest
+
+
+def test_rtt_estimator() -> None:
+    estimator = raftrtt.RttEstimator()
+    assert estimator.timeout() is None
+
+    estimator.update(0.1)
+    assert estimator.srtt == 0.1
+    assert estimator.timeout() == 0.1 + 4 * 0.05
+
+    for _ in range(100):
+        estimator.update(0.01)
+
+    assert estimator.srtt is not None and abs(estimator.srtt - 0.01) < 1e-3
+    assert estimator.rttvar < 1e-3
+
+
+def test_adaptive_timing_leader() -> None:
+    profile = raftconfig.TimingProfile(1, 3, 6, minimum_heartbeat_interval=0.05)
+    timing = raftrtt.AdaptiveTiming(profile)
+
+    # No measurements yet, fall back to configured profile.
+    assert timing.current_profile(True) == raftconfig.TimingProfile(1, 3, 6)
+
+    # Fast network tightens timing down to the minimum.
+    for i in range(20):
+        timing.on_request(2, i)
+        timing.on_request(2, i + 0.0005)
+        timing.on_response(2, i + 0.001)
+
+    current = timing.current_profile(True)
+    assert current.heartbeat_interval == 0.05
+    assert current.election_timeout_min == pytest.approx(0.15)
+    assert current.election_timeout_max == pytest.approx(0.3)
+
+    # Slow peer loosens timing, but only up to the configured profile.
+    for i in range(20):
+        timing.on_request(3, i)
+        timing.on_response(3, i + 0.2)
+
+    assert 0.05 < timing.current_profile(True).heartbeat_interval < 1
+
+    for i in range(20):
+        timing.on_request(3, i)
+        timing.on_response(3, i + 2)
+
+    assert timing.current_profile(True).heartbeat_interval == 1
+
+
+def test_adaptive_timing_follower() -> None:
+    profile = raftconfig.TimingProfile(1, 3, 6, minimum_heartbeat_interval=0.05)
+    timing = raftrtt.AdaptiveTiming(profile)
+
+    for i in range(20):
+        timing.on_heartbeat(i * 0.1)
+
+        # Retry of a rejected request is not taken as a heartbeat.
+        timing.on_heartbeat(i * 0.1 + 0.001)
+
+    current = timing.current_profile(False)
+    assert 0.1 <= current.heartbeat_interval < 0.12
+    assert current.election_timeout_min == pytest.approx(3 * current.heartbeat_interval)
+
+    # Static profiles are left as is.
+    static = raftrtt.AdaptiveTiming(raftconfig.TimingProfile(1, 3, 6))
+    static.on_heartbeat(0)
+    static.on_heartbeat(0.1)
+    assert static.current_profile(False) == raftconfig.TimingProfile(1, 3, 6)
+
+
+def test_adaptive_timing_rtt_step() -> None:
+    profile = raftconfig.TimingProfile(1, 3, 6, minimum_heartbeat_interval=0.05)
+    leader = raftrtt.AdaptiveTiming(profile)
+    follower = raftrtt.AdaptiveTiming(profile)
+    now = last = 0.0
+    rtt = 0.001
+    response: Optional[float] = None
+    armed: Optional[float] = None
+
+    for i in range(100):
+        # Round-trip time jumps well past the heartbeat interval.
+        if i == 20:
+            rtt = 0.4
+
+        if response is not None and response <= now:
+            leader.on_response(2, response)
+            response = None
+
+        if response is None:
+            leader.on_request(2, now)
+            response = now + rtt
+
+        # Each heartbeat arrives before the election timeout the follower
+        # armed on the one before.
+        if armed is not None:
+            assert now - last < armed
+
+        armed = follower.current_profile(False).election_timeout_min
+        last = now
+        follower.on_heartbeat(now)
+        now += leader.next_heartbeat()
+
+        if i == 19:
+            assert leader.interval == 0.05
+
+    assert leader.interval == pytest.approx(0.8, rel=0.05)
@@ -0,0 +1,61 @@
+from typing import List
+import threading
+
+import raftscheduler
+
+
+def test_scheduler_order() -> None:
+    scheduler = raftscheduler.Scheduler()
+    fired: List[str] = []
+    done = threading.Event()
+
+    def last() -> None:
+        fired.append("c")
+        done.set()
+
+    scheduler.schedule(0.03, last)
+    scheduler.schedule(0.01, lambda: fired.append("a"))
+    scheduler.schedule(0.02, lambda: fired.append("b"))
+    scheduler.start()
+
+    assert done.wait(1)
+    scheduler.stop()
+
+    assert fired == ["a", "b", "c"]
+
+
+def test_scheduler_reset_and_cancel() -> None:
+    scheduler = raftscheduler.Scheduler()
+    fired: List[str] = []
+    done = threading.Event()
+
+    later = scheduler.schedule(0.01, lambda: fired.append("later"))
+    earlier = scheduler.schedule(0.2, lambda: fired.append("earlier"))
+    cancelled = scheduler.schedule(0.01, lambda: fired.append("cancelled"))
+    scheduler.schedule(0.1, lambda: done.set())
+
+    # Push one deadline back, bring another forward and cancel a third.
+    later.reset(0.05)
+    earlier.reset(0.02)
+    cancelled.cancel()
+    scheduler.start()
+
+    assert done.wait(1)
+    scheduler.stop()
+
+    assert fired == ["earlier", "later"]
+
+
+def test_scheduler_survives_failing_callback() -> None:
+    scheduler = raftscheduler.Scheduler()
+    done = threading.Event()
+
+    def fail() -> None:
+        raise Exception("Callback failed.")
+
+    scheduler.schedule(0.01, fail)
+    scheduler.schedule(0.02, done.set)
+    scheduler.start()
+
+    assert done.wait(1)
+    scheduler.stop()
@@ -0,0 +1,214 @@
+from typing import Dict, List
+import logging
+import queue
+import threading
+import time
+
+import raftmessage
+import raftrole
+import raftserver
+import rafttransport
+
+
+def pump(servers: Dict[int, raftserver.RaftServer]) -> None:
+    """
+    Handle messages on all servers until none are left.
+    """
+    while any(not server.node.incoming.empty() for server in servers.values()):
+        for server in servers.values():
+            messages = []
+
+            while not server.node.incoming.empty():
+                messages += server.handle(server.node.incoming.get())
+
+            server.send(messages)
+
+
+def test_server_batched_respond(monkeypatch) -> None:
+    monkeypatch.setattr(raftserver, "BATCH_LIMIT", 4)
+    transport = rafttransport.InProcessTransport()
+    servers = {i: raftserver.RaftServer(i, transport) for i in (1, 2, 3)}
+    servers[1].timeout()
+    pump(servers)
+
+    leader = servers[1]
+    sent: List[raftmessage.Message] = []
+    monkeypatch.setattr(leader, "deliver", lambda message, trace: sent.append(message))
+
+    # Batches drained up to the limit, the first with two entries appended and
+    # two heartbeats, the second with one of each.
+    for item in (b"a", b"b", b"c"):
+        message = raftmessage.ClientLogAppend(0, 1, item)
+        leader.node.incoming.put(raftmessage.encode_message(message))
+        leader.node.incoming.put(raftserver.TIMEOUT)
+
+    thread = threading.Thread(target=leader.respond)
+    thread.start()
+
+    deadline = time.monotonic() + 2
+
+    while len(sent) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    leader.stop()
+    thread.join()
+
+    # Heartbeats of each batch merged into one request per follower, carrying
+    # all entries not yet acknowledged.
+    assert [message.target for message in sent] == [2, 3, 2, 3]
+    assert [
+        len(message.entries)
+        for message in sent
+        if isinstance(message, raftmessage.AppendEntryRequest)
+    ] == [2, 2, 3, 3]
+
+
+def test_server_metrics() -> None:
+    transport = rafttransport.InProcessTransport()
+    servers = {i: raftserver.RaftServer(i, transport) for i in (1, 2, 3)}
+    leader = servers[1]
+
+    leader.timeout()
+    pump(servers)
+    assert leader.state.role == raftrole.Role.LEADER
+
+    leader.node.incoming.put(
+        raftmessage.encode_message(raftmessage.ClientLogAppend(0, 1, b"a"))
+    )
+    pump(servers)
+    leader.timeout()
+    pump(servers)
+
+    assert leader.role_changes.value(role="CANDIDATE") == 1
+    assert leader.handle_seconds.count(type="AppendEntryResponse") == 4
+    assert leader.commit_seconds.count() == 1
+
+    lines = leader.metrics.render().splitlines()
+    assert 'raft_follower_lag_entries{peer="2"} 0' in lines
+
+
+def test_server_tracing(tmp_path) -> None:
+    transport = rafttransport.InProcessTransport()
+    servers = {i: raftserver.RaftServer(i, transport) for i in (1, 2, 3)}
+
+    for i, server in servers.items():
+        server.enable_tracing(str(tmp_path / f"{i}.json"))
+
+    servers[1].timeout()
+    pump(servers)
+
+    tracers = [server.tracer for server in servers.values()]
+    assert tracers[0] is not None and tracers[1] is not None
+
+    # Only client appends start traces.
+    assert not tracers[0].events
+
+    servers[1].node.incoming.put(
+        raftmessage.encode_message(raftmessage.ClientLogAppend(0, 1, b"a"))
+    )
+    pump(servers)
+    servers[1].timeout()
+    pump(servers)
+
+    spans = list(tracers[0].events) + list(tracers[1].events)
+    traces = {span["args"]["trace"] for span in spans}
+    stages = [(span["pid"], span["name"], span["args"]["type"]) for span in spans]
+
+    # Trace follows the entry to followers and back.
+    assert len(traces) == 1
+    assert (1, "handle", "ClientLogAppend") in stages
+    assert (1, "encode", "AppendEntryRequest") in stages
+    assert (2, "incoming", "AppendEntryRequest") in stages
+    assert (2, "encode", "AppendEntryResponse") in stages
+    assert (1, "handle", "AppendEntryResponse") in stages
+
+    servers[1].handle(raftmessage.encode_message(raftmessage.Text(0, 1, "trace")))
+    assert (tmp_path / "1.json").exists()
+
+
+def test_server_commit_acknowledged() -> None:
+    transport = rafttransport.InProcessTransport()
+    servers = {i: raftserver.RaftServer(i, transport) for i in (1, 2, 3)}
+    client: queue.SimpleQueue = queue.SimpleQueue()
+    transport.attach(0, client)
+
+    servers[1].timeout()
+    pump(servers)
+
+    servers[1].node.incoming.put(
+        raftmessage.encode_message(raftmessage.ClientLogAppend(0, 1, b"a"))
+    )
+    pump(servers)
+    assert client.empty()
+
+    # Acknowledged once replicated on the next heartbeat and committed.
+    servers[1].timeout()
+    pump(servers)
+
+    message = raftmessage.decode_message(client.get_nowait())
+    assert message == raftmessage.ClientLogCommit(1, 0, 0, b"a")
+    assert client.empty()
+
+
+def test_server_debug_logging(monkeypatch) -> None:
+    server = raftserver.RaftServer(1, rafttransport.InProcessTransport())
+    payload = raftmessage.encode_message(
+        raftmessage.AppendEntryResponse(2, 1, 0, True, 0)
+    )
+    events: List[str] = []
+    level = raftserver.MESSAGES.level
+
+    def log(logger: logging.Logger, level: int, event: str, **fields) -> None:
+        events.append(event)
+
+    monkeypatch.setattr(raftserver.raftlogging, "log", log)
+
+    try:
+        # Nothing built for message logs unless enabled.
+        raftserver.MESSAGES.setLevel(logging.INFO)
+        server.handle(payload)
+        assert events == []
+
+        raftserver.MESSAGES.setLevel(logging.DEBUG)
+        server.handle(payload)
+        assert events == ["receive"]
+
+    finally:
+        raftserver.MESSAGES.setLevel(level)
+
+
+def test_server_timeout_on_respond_thread() -> None:
+    transport = rafttransport.InProcessTransport()
+    servers = {i: raftserver.RaftServer(i, transport) for i in (1, 2, 3)}
+
+    # Timer only queues the timeout, leaving state to the respond thread.
+    servers[1].timeout()
+    assert servers[1].state.role == raftrole.Role.FOLLOWER
+    assert servers[1].node.incoming.get_nowait() == raftserver.TIMEOUT
+
+    servers[1].send(servers[1].handle(raftserver.TIMEOUT))
+    pump(servers)
+    assert servers[1].state.role == raftrole.Role.LEADER
+
+
+def test_server_peer_metrics() -> None:
+    members = {1: ("localhost", 7501), 2: ("localhost", 7502)}
+    transport = rafttransport.TcpTransport(dict(members))
+    server = raftserver.RaftServer(1, transport, members=members)
+    server.node.start()
+
+    # Peer 2 is not listening, so connecting fails and the peer backs off.
+    server.node.send(2, b"a")
+    deadline = time.monotonic() + 2
+
+    while server.node.connection_metrics()[2]["failures"] == 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    lines = server.metrics.render().splitlines()
+    server.close(0)
+
+    assert 'raft_peer_state{peer="2",state="BACKING_OFF"} 1.0' in lines
+    assert 'raft_peer_state{peer="2",state="UP"} 0.0' in lines
+    assert 'raft_peer_connect_attempts_total{peer="2"} 1' in lines
+    assert "# TYPE raft_peer_connect_attempts_total counter" in lines
@@ -0,0 +1,86 @@
+import raftconfig
+import raftrole
+import raftsim
+
+
+def create_simulator(seed: int) -> raftsim.Simulator:
+    return raftsim.Simulator(
+        5,
+        seed,
+        raftconfig.load_timing_profile("low-latency"),
+        raftsim.Network(0.001, 0.01, 0.05),
+    )
+
+
+def test_simulation_reproducible():
+    summaries = []
+
+    for _ in range(2):
+        simulator = create_simulator(1)
+        simulator.load(50, 8, 10)
+        simulator.run(10)
+        simulator.check_safety()
+        summaries.append((simulator.elections, simulator.latencies))
+
+    assert summaries[0] == summaries[1]
+    assert summaries[0][0] and summaries[0][1]
+
+
+def test_simulation_partition():
+    simulator = create_simulator(2)
+
+    assert simulator.run_until(lambda: simulator.leader() is not None, 5) is not None
+    leader = simulator.leader()
+    assert leader is not None
+
+    # Leader cut off from the majority steps down, and the majority elects a
+    # leader which keeps committing entries.
+    others = [identifier for identifier in simulator.states if identifier != leader]
+    simulator.partition([leader, others[0]], others[1:])
+    simulator.load(50, 8, 5)
+    simulator.run(5)
+
+    assert simulator.states[leader].role != raftrole.Role.LEADER
+    assert simulator.leader() in others[1:]
+    assert simulator.latencies
+
+    # Once healed, all servers catch up with the committed entries.
+    simulator.heal()
+    simulator.run(2)
+    simulator.check_safety()
+
+    commit_indexes = {state.commit_index for state in simulator.states.values()}
+    assert len(commit_indexes) == 1
+
+
+def test_simulation_restart():
+    simulator = create_simulator(3)
+    simulator.run(2)
+    leader = simulator.leader()
+    assert leader is not None
+
+    simulator.crash(leader)
+    simulator.run(2)
+    assert simulator.leader() not in (None, leader)
+
+    simulator.restart(leader)
+    simulator.load(50, 8, 2)
+    simulator.run(3)
+    simulator.check_safety()
+    assert simulator.states[leader].role == raftrole.Role.FOLLOWER
+
+
+def test_simulation_slow_network():
+    # Round trip above the heartbeat interval, so heartbeats carrying the same
+    # entries overlap and responses are duplicated.
+    simulator = raftsim.Simulator(
+        3, 0, raftconfig.load_timing_profile("low-latency"), raftsim.Network(0.03, 0.04)
+    )
+    simulator.load(50, 8, 5)
+    simulator.run(5)
+    simulator.check_safety()
+
+    assert simulator.failures == 0
+    assert len(simulator.elections) == 1
+    assert simulator.leader() is not None
+    assert len(simulator.latencies) > 200
@@ -6,6 +6,8 @@ import raftstate
 import raftrole
 from test_raftlog import paper_log, logs_by_identifier
 
+import pytest
+
 
 def init_raft_state(
     identifier: int,
@@ -67,7 +69,6 @@ def init_commit_states(
     raftstate.RaftState,
     raftstate.RaftState,
 ]:
-
     state_1, _ = init_raft_state(1, logs[0], raftrole.Role.FOLLOWER, 2)
     state_2, _ = init_raft_state(2, logs[1], raftrole.Role.FOLLOWER, 2)
     state_3, _ = init_raft_state(3, logs[2], raftrole.Role.FOLLOWER, 2)
@@ -95,7 +96,7 @@ def test_update_indexes(paper_log: List[raftlog.LogEntry]) -> None:
     assert leader_state.match_index == {1: 9, 2: None, 3: None}
     assert leader_state.commit_index == -1
 
-    leader_state.update_indexes(2, 0)
+    leader_state.update_indexes(2, 9)
     assert leader_state.next_index == {1: 10, 2: 10, 3: 10}
     assert leader_state.match_index == {1: 9, 2: 9, 3: None}
     assert leader_state.commit_index == -1
@@ -107,12 +108,12 @@ def test_update_indexes(paper_log: List[raftlog.LogEntry]) -> None:
     assert non_null_match_index_count == 2
     assert potential_commit_index == 9
 
-    leader_state.handle_client_log_append(0, 1, "7")
+    leader_state.handle_client_log_append(0, 1, b"7")
     assert leader_state.next_index == {1: 11, 2: 10, 3: 10}
     assert leader_state.match_index == {1: 10, 2: 9, 3: None}
     assert leader_state.commit_index == -1
 
-    leader_state.update_indexes(2, 1)
+    leader_state.update_indexes(2, 10)
     assert leader_state.next_index == {1: 11, 2: 11, 3: 10}
     assert leader_state.match_index == {1: 10, 2: 10, 3: None}
     assert leader_state.commit_index == 10
@@ -125,6 +126,30 @@ def test_update_indexes(paper_log: List[raftlog.LogEntry]) -> None:
     assert potential_commit_index == 10
 
 
+def test_commit_even_config(paper_log: List[raftlog.LogEntry]) -> None:
+    leader_state, _ = init_raft_state(1, paper_log, raftrole.Role.LEADER, 7)
+    leader_state.config = {i: ("localhost", 7000 + i) for i in range(1, 5)}
+    leader_state.handle_client_log_append(0, 1, b"7")
+    assert leader_state.match_index is not None
+    assert leader_state.next_index is not None
+    leader_state.match_index[3] = 3
+    leader_state.match_index[4] = 3
+
+    # Entry held by two of four servers is not committed.
+    leader_state.update_indexes(2, 10)
+    assert leader_state.get_index_metrics() == (4, 3)
+    assert leader_state.commit_index == -1
+
+    # Nor with the others not heard from.
+    leader_state.match_index[3] = None
+    leader_state.match_index[4] = None
+    assert leader_state.get_index_metrics() == (2, -1)
+
+    leader_state.update_indexes(3, 10)
+    assert leader_state.get_index_metrics() == (3, 10)
+    assert leader_state.commit_index == 10
+
+
 def test_create_append_entries_arguments(paper_log: List[raftlog.LogEntry]) -> None:
     leader_state, _ = init_raft_state(1, paper_log, raftrole.Role.LEADER, 6)
 
@@ -152,33 +177,43 @@ def test_handle_append_entries_request(
     )
 
     response = follower_state.handle_append_entries_request(
-        1, 2, 6, 8, 6, [raftlog.LogEntry(6, "6")], -1
+        1, 2, 6, 8, 6, [raftlog.LogEntry(6, b"6")], -1
     )
     assert isinstance(response[0], raftmessage.AppendEntryResponse)
     assert response[0].success
-    assert response[0].entries_length == 1
+    assert response[0].match_index == 9
 
     response = follower_state.handle_append_entries_request(
-        1, 2, 6, 10, 6, [raftlog.LogEntry(6, "6")], -1
+        1, 2, 6, 10, 6, [raftlog.LogEntry(6, b"6")], -1
     )
     assert isinstance(response[0], raftmessage.AppendEntryResponse)
     assert not response[0].success
-    assert response[0].entries_length == 1
+    assert response[0].match_index == 9
 
 
 def test_handle_append_entries_response(paper_log: List[raftlog.LogEntry]) -> None:
     # Figure 7
     leader_state, _ = init_raft_state(1, paper_log, raftrole.Role.LEADER, 6)
 
-    response = leader_state.handle_append_entries_response(2, 1, 6, False, 0)
+    response = leader_state.handle_append_entries_response(2, 1, 6, False, 8)
     assert isinstance(response[0], raftmessage.AppendEntryRequest)
     assert response[0].previous_index == 8
     assert response[0].previous_term == 6
-    assert response[0].entries == [raftlog.LogEntry(6, "6")]
+    assert response[0].entries == [raftlog.LogEntry(6, b"6")]
 
-    response = leader_state.handle_append_entries_response(2, 1, 6, True, 1)
+    response = leader_state.handle_append_entries_response(2, 1, 6, True, 9)
     assert len(response) == 0
 
+    # Duplicate responses leave indexes unchanged.
+    response = leader_state.handle_append_entries_response(2, 1, 6, True, 9)
+    assert leader_state.next_index is not None
+    assert leader_state.match_index is not None
+    assert leader_state.next_index[2] == 10
+    assert leader_state.match_index[2] == 9
+
+    response = leader_state.handle_append_entries_response(2, 1, 6, False, 8)
+    assert leader_state.next_index[2] == 10
+
 
 def test_handle_leader_heartbeat(paper_log: List[raftlog.LogEntry]) -> None:
     # Figure 7
@@ -201,13 +236,13 @@ def test_handle_message_a(
 
     response = follower_state.handle_message(request[0])
     assert not response[0].success
-    assert response[0].entries_length == 0
+    assert response[0].match_index == 8
     assert leader_state.next_index[2] == 10
 
     request = leader_state.handle_message(response[0])
     response = follower_state.handle_message(request[0])
     assert response[0].success
-    assert response[0].entries_length == 1
+    assert response[0].match_index == 9
     assert leader_state.next_index[2] == 9
 
     assert len(leader_state.handle_message(response[0])) == 0
@@ -223,18 +258,16 @@ def test_handle_message_b(
         paper_log, logs_by_identifier["b"], None
     )
 
-    for i in range(6):
-        response = follower_state.handle_message(request[0])
-
-        assert not response[0].success
-        assert response[0].entries_length == i
-        assert leader_state.next_index[2] == 10 - i
-
-        request = leader_state.handle_message(response[0])
+    # Shorter follower log skips straight to its end.
+    response = follower_state.handle_message(request[0])
+    assert not response[0].success
+    assert response[0].match_index == 3
+    assert leader_state.next_index[2] == 10
 
+    request = leader_state.handle_message(response[0])
     response = follower_state.handle_message(request[0])
     assert response[0].success
-    assert response[0].entries_length == 6
+    assert response[0].match_index == 9
     assert leader_state.next_index[2] == 4
 
     assert len(leader_state.handle_message(response[0])) == 0
@@ -252,7 +285,7 @@ def test_handle_message_c(
 
     response = follower_state.handle_message(request[0])
     assert response[0].success
-    assert response[0].entries_length == 0
+    assert response[0].match_index == 9
     assert leader_state.next_index[2] == 10
 
     assert len(leader_state.handle_message(response[0])) == 0
@@ -270,7 +303,7 @@ def test_handle_message_d(
 
     response = follower_state.handle_message(request[0])
     assert response[0].success
-    assert response[0].entries_length == 0
+    assert response[0].match_index == 9
     assert leader_state.next_index[2] == 10
 
     assert len(leader_state.handle_message(response[0])) == 0
@@ -288,18 +321,20 @@ def test_handle_message_e(
 
     request = leader_state.handle_message(raftmessage.UpdateFollowers(1, 1, [2]))
 
-    for i in range(5):
+    # Shorter follower log skips to its end, then back one entry at a time
+    # past the conflicting entries.
+    for i, next_index in enumerate([10, 7, 6]):
         response = follower_state.handle_message(request[0])
 
         assert not response[0].success
-        assert response[0].entries_length == i
-        assert leader_state.next_index[2] == 10 - i
+        assert response[0].match_index == 6 - i
+        assert leader_state.next_index[2] == next_index
 
         request = leader_state.handle_message(response[0])
 
     response = follower_state.handle_message(request[0])
     assert response[0].success
-    assert response[0].entries_length == 5
+    assert response[0].match_index == 9
     assert leader_state.next_index[2] == 5
 
     assert len(leader_state.handle_message(response[0])) == 0
@@ -319,14 +354,14 @@ def test_handle_message_f(
         response = follower_state.handle_message(request[0])
 
         assert not response[0].success
-        assert response[0].entries_length == i
+        assert response[0].match_index == 8 - i
         assert leader_state.next_index[2] is 10 - i
 
         request = leader_state.handle_message(response[0])
 
     response = follower_state.handle_message(request[0])
     assert response[0].success
-    assert response[0].entries_length == 7
+    assert response[0].match_index == 9
     assert leader_state.next_index[2] == 3
 
     assert len(leader_state.handle_message(response[0])) == 0
@@ -359,14 +394,12 @@ def test_consensus(
 
     response_b = follower_b_state.handle_message(request[1])
 
-    for i in range(6):
-        request_b = leader_state.handle_message(response_b[0])
-
-        assert leader_state.next_index == {1: 10, 2: 10, 3: 9 - i}
-        assert leader_state.match_index == {1: 9, 2: 9, 3: None}
-        assert leader_state.commit_index == 9
+    request_b = leader_state.handle_message(response_b[0])
+    assert leader_state.next_index == {1: 10, 2: 10, 3: 4}
+    assert leader_state.match_index == {1: 9, 2: 9, 3: None}
+    assert leader_state.commit_index == 9
 
-        response_b = follower_b_state.handle_message(request_b[0])
+    response_b = follower_b_state.handle_message(request_b[0])
 
     leader_state.handle_message(response_b[0])
     assert leader_state.next_index == {1: 10, 2: 10, 3: 10}
@@ -503,11 +536,11 @@ def test_handle_vote_response(
 
 def test_commit_with_requirement() -> None:
     logs: List[List[raftlog.LogEntry]] = [
-        [raftlog.LogEntry(1, "1"), raftlog.LogEntry(2, "2")],
-        [raftlog.LogEntry(1, "1"), raftlog.LogEntry(2, "2")],
-        [raftlog.LogEntry(1, "1")],
-        [raftlog.LogEntry(1, "1")],
-        [raftlog.LogEntry(1, "1")],
+        [raftlog.LogEntry(1, b"1"), raftlog.LogEntry(2, b"2")],
+        [raftlog.LogEntry(1, b"1"), raftlog.LogEntry(2, b"2")],
+        [raftlog.LogEntry(1, b"1")],
+        [raftlog.LogEntry(1, b"1")],
+        [raftlog.LogEntry(1, b"1")],
     ]
     config: Dict[int, Tuple[str, int]] = {(i + 1): ("", i) for i in range(5)}
     experimental_mode: bool = False
@@ -520,9 +553,9 @@ def test_commit_with_requirement() -> None:
     # (b) elect 5 as leader and append entry
     state_5.change_role(raftrole.Role.FOLLOWER, raftrole.Role.CANDIDATE)
     state_5.change_role(raftrole.Role.CANDIDATE, raftrole.Role.LEADER)
-    state_5.handle_client_log_append(0, 5, "3")
-    state_5.handle_client_log_append(0, 5, "3")
-    state_5.handle_client_log_append(0, 5, "3")
+    state_5.handle_client_log_append(0, 5, b"3")
+    state_5.handle_client_log_append(0, 5, b"3")
+    state_5.handle_client_log_append(0, 5, b"3")
 
     # (c) election with candidate 1 with no winner in a split network, then
     # elect 1 as leader and append entry
@@ -544,7 +577,7 @@ def test_commit_with_requirement() -> None:
                 request = state_1.handle_message(response[0])
 
     assert len(state_2.log) == 2
-    assert state_2.log[1] == raftlog.LogEntry(2, "2")
+    assert state_2.log[1] == raftlog.LogEntry(2, b"2")
     assert state_2.commit_index == 0
 
     prior_log = state_2.log.copy()
@@ -568,7 +601,7 @@ def test_commit_with_requirement() -> None:
                 request = state_5.handle_message(response[0])
 
     assert len(state_2.log) == 4
-    assert state_2.log[1] == raftlog.LogEntry(3, "3")
+    assert state_2.log[1] == raftlog.LogEntry(3, b"3")
     assert state_2.commit_index == 0
 
     assert prior_log[prior_commit_index] == state_2.log[prior_commit_index]
@@ -576,11 +609,11 @@ def test_commit_with_requirement() -> None:
 
 def test_commit_without_requirement() -> None:
     logs: List[List[raftlog.LogEntry]] = [
-        [raftlog.LogEntry(1, "1"), raftlog.LogEntry(2, "2")],
-        [raftlog.LogEntry(1, "1"), raftlog.LogEntry(2, "2")],
-        [raftlog.LogEntry(1, "1")],
-        [raftlog.LogEntry(1, "1")],
-        [raftlog.LogEntry(1, "1")],
+        [raftlog.LogEntry(1, b"1"), raftlog.LogEntry(2, b"2")],
+        [raftlog.LogEntry(1, b"1"), raftlog.LogEntry(2, b"2")],
+        [raftlog.LogEntry(1, b"1")],
+        [raftlog.LogEntry(1, b"1")],
+        [raftlog.LogEntry(1, b"1")],
     ]
     config: Dict[int, Tuple[str, int]] = {(i + 1): ("", i) for i in range(5)}
     experimental_mode: bool = True
@@ -593,9 +626,9 @@ def test_commit_without_requirement() -> None:
     # (b) elect 5 as leader and append entry
     state_5.change_role(raftrole.Role.FOLLOWER, raftrole.Role.CANDIDATE)
     state_5.change_role(raftrole.Role.CANDIDATE, raftrole.Role.LEADER)
-    state_5.handle_client_log_append(0, 5, "3")
-    state_5.handle_client_log_append(0, 5, "3")
-    state_5.handle_client_log_append(0, 5, "3")
+    state_5.handle_client_log_append(0, 5, b"3")
+    state_5.handle_client_log_append(0, 5, b"3")
+    state_5.handle_client_log_append(0, 5, b"3")
 
     # (c) election with candidate 1 with no winner in a split network, then
     # elect 1 as leader and append entry
@@ -617,7 +650,7 @@ def test_commit_without_requirement() -> None:
                 request = state_1.handle_message(response[0])
 
     assert len(state_2.log) == 2
-    assert state_2.log[1] == raftlog.LogEntry(2, "2")
+    assert state_2.log[1] == raftlog.LogEntry(2, b"2")
     assert state_2.commit_index == 1
 
     prior_log = state_2.log.copy()
@@ -641,7 +674,400 @@ def test_commit_without_requirement() -> None:
                 request = state_5.handle_message(response[0])
 
     assert len(state_2.log) == 4
-    assert state_2.log[1] == raftlog.LogEntry(3, "3")
+    assert state_2.log[1] == raftlog.LogEntry(3, b"3")
     assert state_2.commit_index == 3
 
     assert prior_log[prior_commit_index] != state_2.log[prior_commit_index]
+
+
+def init_clock(state: raftstate.RaftState) -> List[float]:
+    """
+    Replace the state clock with one advanced by the test, starting from the
+    election.
+    """
+    now = [0.0]
+    state.clock = lambda: now[0]
+    state.last_contact = {
+        identifier: 0.0 for identifier in state.create_followers_list()
+    }
+
+    return now
+
+
+def test_change_state_on_timeout_leader(paper_log: List[raftlog.LogEntry]) -> None:
+    leader_state, _ = init_raft_state(1, paper_log, raftrole.Role.LEADER, 6)
+    now = init_clock(leader_state)
+
+    # Election counts as contact with all followers.
+    now[0] = 2.0
+    message = raftstate.change_state_on_timeout(leader_state, 3.0)
+    assert isinstance(message, raftmessage.UpdateFollowers)
+
+    # One follower in contact together with self is a majority of three.
+    leader_state.handle_append_entries_response(2, 1, 6, True, 9)
+    now[0] = 4.0
+    message = raftstate.change_state_on_timeout(leader_state, 3.0)
+    assert isinstance(message, raftmessage.UpdateFollowers)
+
+    # Failed responses still count as contact.
+    leader_state.handle_append_entries_response(3, 1, 6, False, 0)
+    now[0] = 5.5
+    message = raftstate.change_state_on_timeout(leader_state, 3.0)
+    assert isinstance(message, raftmessage.UpdateFollowers)
+
+    # No check when election timeout not given.
+    now[0] = 10.0
+    message = raftstate.change_state_on_timeout(leader_state)
+    assert isinstance(message, raftmessage.UpdateFollowers)
+
+    # No responses within an election timeout.
+    message = raftstate.change_state_on_timeout(leader_state, 3.0)
+    assert isinstance(message, raftmessage.RoleChange)
+    assert message.to_role == raftrole.Role.FOLLOWER
+
+
+def test_check_quorum(paper_log: List[raftlog.LogEntry]) -> None:
+    leader_state, _ = init_raft_state(1, paper_log, raftrole.Role.LEADER, 6)
+    leader_state.config = {i: ("localhost", 7000 + i) for i in range(1, 6)}
+    now = init_clock(leader_state)
+
+    # One follower in contact together with self is a minority of five.
+    now[0] = 4.0
+    assert leader_state.last_contact is not None
+    leader_state.last_contact[2] = 4.0
+    assert not leader_state.has_quorum(3.0)
+
+    leader_state.last_contact[4] = 4.0
+    assert leader_state.has_quorum(3.0)
+
+    now[0] = 7.0
+    assert not leader_state.has_quorum(3.0)
+
+    # Members added since last contact was initialized count as out of contact.
+    now[0] = 4.0
+    leader_state.config = {i: ("localhost", 7000 + i) for i in range(1, 8)}
+    assert not leader_state.has_quorum(3.0)
+
+    # Nothing to check once no longer leader.
+    leader_state.role = raftrole.Role.FOLLOWER
+    leader_state.last_contact = None
+    assert leader_state.has_quorum(3.0)
+
+
+def test_pre_vote(
+    paper_log: List[raftlog.LogEntry],
+    logs_by_identifier: Dict[str, List[raftlog.LogEntry]],
+) -> None:
+    leader_state, follower_a_state, follower_c_state, request = init_raft_states(
+        paper_log, logs_by_identifier["a"], logs_by_identifier["c"]
+    )
+    follower_a_state.handle_message(request[0])
+    assert follower_a_state.leader_active
+
+    # Follower c partitioned from leader times out and becomes pre-candidate
+    # without incrementing term.
+    follower_c_state.pre_vote = True
+    message = raftstate.change_state_on_timeout(follower_c_state)
+    assert isinstance(message, raftmessage.RoleChange)
+    assert message.to_role == raftrole.Role.PRE_CANDIDATE
+
+    messages = follower_c_state.handle_message(message)
+    assert isinstance(messages[0], raftmessage.RunPreVote)
+    assert follower_c_state.role == raftrole.Role.PRE_CANDIDATE
+    assert follower_c_state.current_term == 6
+    assert follower_c_state.voted_for is None
+
+    requests = follower_c_state.handle_message(messages[0])
+    assert isinstance(requests[0], raftmessage.PreVoteRequest)
+    assert requests[0].current_term == 7
+
+    # Leader and follower in contact with leader reject, with no change to
+    # term or vote.
+    for state, request_c in [
+        (leader_state, requests[1]),
+        (follower_a_state, requests[0]),
+    ]:
+        response = state.handle_message(request_c)
+        assert isinstance(response[0], raftmessage.PreVoteResponse)
+        assert not response[0].success
+        assert state.current_term == 6
+
+        assert len(follower_c_state.handle_message(response[0])) == 0
+        assert follower_c_state.role == raftrole.Role.PRE_CANDIDATE
+
+    # On rejoin, leader heartbeat reverts pre-candidate to follower in the same
+    # term, leaving leader undisturbed.
+    follower_c_state.handle_message(leader_state.handle_leader_heartbeat()[1])
+    assert follower_c_state.role == raftrole.Role.FOLLOWER
+    assert follower_c_state.current_term == 6
+    assert leader_state.role == raftrole.Role.LEADER
+
+    # Once follower a times out on the leader, pre-vote succeeds and the
+    # pre-candidate stands for election in the next term.
+    raftstate.change_state_on_timeout(follower_a_state)
+    message = raftstate.change_state_on_timeout(follower_c_state)
+    messages = follower_c_state.handle_message(message)
+    requests = follower_c_state.handle_message(messages[0])
+
+    response = follower_a_state.handle_message(requests[0])
+    assert response[0].success
+    assert follower_a_state.voted_for is None
+
+    messages = follower_c_state.handle_message(response[0])
+    assert isinstance(messages[0], raftmessage.RunElection)
+    assert follower_c_state.role == raftrole.Role.CANDIDATE
+    assert follower_c_state.current_term == 7
+    assert follower_c_state.voted_for == 3
+
+
+def test_pre_vote_rounds() -> None:
+    state, _ = init_raft_state(1, [], raftrole.Role.FOLLOWER, 6)
+    state.config = {i: ("localhost", 7000 + i) for i in range(1, 6)}
+    state.pre_vote = True
+
+    message = raftstate.change_state_on_timeout(state)
+    assert message is not None
+    state.handle_message(state.handle_message(message)[0])
+    assert len(state.handle_message(raftmessage.PreVoteResponse(2, 1, True, 6))) == 0
+
+    # Pre-votes from an earlier round are not carried over.
+    message = raftstate.change_state_on_timeout(state)
+    assert isinstance(message, raftmessage.RunPreVote)
+    state.handle_message(message)
+    assert len(state.handle_message(raftmessage.PreVoteResponse(3, 1, True, 6))) == 0
+    assert state.role == raftrole.Role.PRE_CANDIDATE
+
+    messages = state.handle_message(raftmessage.PreVoteResponse(4, 1, True, 6))
+    assert isinstance(messages[0], raftmessage.RunElection)
+    assert state.role == raftrole.Role.CANDIDATE
+
+
+def test_leadership_transfer(
+    paper_log: List[raftlog.LogEntry],
+    logs_by_identifier: Dict[str, List[raftlog.LogEntry]],
+) -> None:
+    # Figure 7a, with follower missing last entry.
+    leader_state, follower_state, _, _ = init_raft_states(
+        paper_log, logs_by_identifier["a"], None
+    )
+    leader_state.next_index[2] = 9
+
+    request = leader_state.handle_message(raftmessage.TransferLeadership(0, 1, 2))
+    assert isinstance(request[0], raftmessage.AppendEntryRequest)
+    assert leader_state.transfer_target == 2
+
+    # No client requests accepted during transfer.
+    with pytest.raises(Exception):
+        leader_state.handle_client_log_append(0, 1, b"7")
+
+    # Once follower up to date, leader tells it to time out.
+    response = follower_state.handle_message(request[0])
+    messages = leader_state.handle_message(response[0])
+    assert isinstance(messages[0], raftmessage.TimeoutNow)
+    assert messages[0].target == 2
+
+    messages = follower_state.handle_message(messages[0])
+    assert isinstance(messages[0], raftmessage.RunElection)
+    assert follower_state.role == raftrole.Role.CANDIDATE
+    assert follower_state.current_term == 7
+
+    requests = follower_state.handle_message(messages[0])
+    response = leader_state.handle_message(requests[0])
+    assert response[0].success
+    assert leader_state.role == raftrole.Role.FOLLOWER
+    assert leader_state.transfer_target is None
+
+    follower_state.handle_message(response[0])
+    assert follower_state.role == raftrole.Role.LEADER
+
+
+def test_leadership_transfer_timeout(paper_log: List[raftlog.LogEntry]) -> None:
+    leader_state, _ = init_raft_state(1, paper_log, raftrole.Role.LEADER, 6)
+    leader_state.handle_message(raftmessage.TransferLeadership(0, 1, 2))
+
+    now = init_clock(leader_state)
+    leader_state.handle_message(raftmessage.TransferLeadership(0, 1, 2))
+
+    leader_state.handle_append_entries_response(2, 1, 6, False, 0)
+    now[0] = 2.0
+    raftstate.change_state_on_timeout(leader_state, 3.0)
+    assert leader_state.transfer_target == 2
+
+    # Transfer abandoned after an election timeout.
+    leader_state.handle_append_entries_response(2, 1, 6, False, 0)
+    now[0] = 3.0
+    raftstate.change_state_on_timeout(leader_state, 3.0)
+
+    assert leader_state.transfer_target is None
+    assert len(leader_state.handle_client_log_append(0, 1, b"7")) == 0
+
+
+def test_membership_change(paper_log: List[raftlog.LogEntry]) -> None:
+    leader_state, follower_state, _, _ = init_raft_states(
+        list(paper_log), list(paper_log), None
+    )
+    new_state, _ = init_raft_state(4, [], raftrole.Role.FOLLOWER, 6)
+
+    # New server waits to be added rather than campaign.
+    assert raftstate.change_state_on_timeout(new_state) is None
+
+    # Changes wait for an entry of the leader's own term to commit.
+    with pytest.raises(Exception):
+        leader_state.handle_message(raftmessage.AddMember(0, 1, 4, "localhost", 7003))
+
+    requests = leader_state.handle_leader_heartbeat()
+    leader_state.handle_message(follower_state.handle_message(requests[0])[0])
+    assert leader_state.commit_index == 9
+
+    # Server joins as learner, not counting towards commits.
+    requests = leader_state.handle_message(
+        raftmessage.AddMember(0, 1, 4, "localhost", 7003)
+    )
+    assert sorted(leader_state.config) == [1, 2, 3]
+    assert sorted(leader_state.learners) == [4]
+    assert [request.target for request in requests] == [2, 3, 4]
+
+    # No further change until latest is committed.
+    with pytest.raises(Exception):
+        leader_state.handle_message(raftmessage.RemoveMember(0, 1, 3))
+
+    response = follower_state.handle_message(requests[0])
+    leader_state.handle_message(response[0])
+    assert leader_state.commit_index == 10
+
+    # Learner promoted once caught up.
+    response = new_state.handle_message(requests[2])
+    assert sorted(new_state.learners) == [4]
+    leader_state.handle_message(response[0])
+    assert sorted(leader_state.config) == [1, 2, 3, 4]
+    assert leader_state.learners == {}
+
+    requests = leader_state.handle_leader_heartbeat()
+
+    for state, request in [(follower_state, requests[0]), (new_state, requests[2])]:
+        response = state.handle_message(request)
+        assert sorted(state.config) == [1, 2, 3, 4]
+        leader_state.handle_message(response[0])
+
+    assert leader_state.commit_index == 11
+    assert new_state.log == leader_state.log
+
+    # Leader steps down once its removal is committed.
+    requests = leader_state.handle_message(raftmessage.RemoveMember(0, 1, 1))
+    assert [request.target for request in requests] == [2, 3, 4]
+
+    for state, request in [(follower_state, requests[0]), (new_state, requests[2])]:
+        response = state.handle_message(request)
+        assert sorted(state.config) == [2, 3, 4]
+        leader_state.handle_message(response[0])
+
+    assert leader_state.role == raftrole.Role.FOLLOWER
+    assert raftstate.change_state_on_timeout(leader_state) is None
+
+    # Vote requests from removed server are ignored.
+    response = follower_state.handle_message(
+        raftmessage.RequestVoteRequest(1, 2, 8, 12, 6)
+    )
+    assert not response[0].success
+    assert follower_state.current_term == 6
+
+
+def test_membership_change_new_leader(paper_log: List[raftlog.LogEntry]) -> None:
+    leader_state, follower_state, _, _ = init_raft_states(
+        list(paper_log), list(paper_log), None
+    )
+    leader_state.current_term = 7
+    follower_state.current_term = 7
+
+    # Commit carried over from the previous term is not enough.
+    leader_state.commit_index = 9
+
+    with pytest.raises(Exception):
+        leader_state.handle_message(raftmessage.AddMember(0, 1, 4, "localhost", 7003))
+
+    leader_state.handle_client_log_append(0, 1, b"7")
+    requests = leader_state.handle_leader_heartbeat()
+    leader_state.handle_message(follower_state.handle_message(requests[0])[0])
+    assert leader_state.commit_index == 10
+
+    leader_state.handle_message(raftmessage.AddMember(0, 1, 4, "localhost", 7003))
+    assert sorted(leader_state.learners) == [4]
+
+
+def test_promotion_new_leader(paper_log: List[raftlog.LogEntry]) -> None:
+    leader_state, follower_state, _, _ = init_raft_states(
+        list(paper_log), list(paper_log), None
+    )
+    leader_state.current_term = 7
+    follower_state.current_term = 7
+    leader_state.learners = {4: ("localhost", 7003, True)}
+    assert leader_state.next_index is not None
+    assert leader_state.match_index is not None
+    leader_state.next_index[4] = 0
+    leader_state.match_index[4] = None
+
+    # Caught up learner waits for an entry of the leader's term to commit,
+    # with the response otherwise handled as usual.
+    response = raftmessage.AppendEntryResponse(4, 1, 7, True, 9)
+    assert leader_state.handle_message(response) == []
+    assert leader_state.match_index[4] == 9
+    assert sorted(leader_state.learners) == [4]
+
+    leader_state.handle_client_log_append(0, 1, b"7")
+    requests = leader_state.handle_leader_heartbeat()
+    leader_state.handle_message(follower_state.handle_message(requests[0])[0])
+    assert leader_state.commit_index == 10
+
+    leader_state.handle_message(raftmessage.AppendEntryResponse(4, 1, 7, True, 10))
+    assert sorted(leader_state.config) == [1, 2, 3, 4]
+    assert leader_state.learners == {}
+
+
+def test_read_replica(paper_log: List[raftlog.LogEntry]) -> None:
+    leader_state, follower_state, _, _ = init_raft_states(
+        list(paper_log), list(paper_log), None
+    )
+    replica_state, _ = init_raft_state(4, [], raftrole.Role.FOLLOWER, 6)
+
+    requests = leader_state.handle_leader_heartbeat()
+    leader_state.handle_message(follower_state.handle_message(requests[0])[0])
+
+    requests = leader_state.handle_message(
+        raftmessage.AddMember(0, 1, 4, "localhost", 7003, True)
+    )
+    response = replica_state.handle_message(requests[2])
+    leader_state.handle_message(response[0])
+
+    # Replica kept as learner, and alone not enough to commit.
+    assert sorted(leader_state.config) == [1, 2, 3]
+    assert sorted(leader_state.learners) == [4]
+    assert leader_state.commit_index == 9
+
+    response = follower_state.handle_message(requests[0])
+    leader_state.handle_message(response[0])
+    assert leader_state.commit_index == 10
+
+    # Replica neither campaigns nor is asked for votes.
+    assert raftstate.change_state_on_timeout(replica_state) is None
+    assert 4 not in leader_state.create_followers_list()
+
+    leader_state.handle_message(raftmessage.RemoveMember(0, 1, 4))
+    assert leader_state.learners == {}
+
+
+def test_persistent_state(paper_log: List[raftlog.LogEntry], tmp_path) -> None:
+    path = str(tmp_path / "raft-1.state")
+    state = raftstate.RaftState(1)
+    assert not raftstate.load_state(state, path)
+
+    members = {1: ("localhost", 7000), 2: ("localhost", 7001)}
+    state.log = paper_log + [raftlog.LogEntry(6, b"", members, {})]
+    state.current_term = 6
+    state.voted_for = 2
+    raftstate.save_state(state, path)
+
+    restored = raftstate.RaftState(1)
+    assert raftstate.load_state(restored, path)
+    assert restored.log == state.log
+    assert (restored.current_term, restored.voted_for) == (6, 2)
+    assert restored.config == members
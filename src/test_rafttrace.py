@@ -0,0 +1,34 @@
+import json
+
+import raftmessage
+import rafttrace
+
+
+def test_trace_wrapping(tmp_path) -> None:
+    payload = raftmessage.encode_message(raftmessage.ClientLogAppend(0, 1, b"a"))
+    traced = rafttrace.wrap(7, payload)
+
+    assert rafttrace.unwrap(payload) == (None, payload)
+    assert rafttrace.unwrap(traced) == (7, payload)
+
+    # Only traced payloads are timed while queued.
+    rafttrace.enqueue(payload)
+    rafttrace.enqueue(traced)
+    assert rafttrace.dequeue(payload) is None
+    assert rafttrace.dequeue(traced) is not None
+
+    paths = []
+
+    for identifier in (1, 2):
+        tracer = rafttrace.Tracer(identifier, str(tmp_path / f"{identifier}.json"))
+        tracer.record(7, "handle", 1.0, 1.5, type="ClientLogAppend")
+        tracer.dump()
+        paths.append(tracer.path)
+
+    events = rafttrace.merge_traces(paths)["traceEvents"]
+    spans = [event for event in events if event["ph"] == "X"]
+
+    assert [span["pid"] for span in spans] == [1, 2]
+    assert spans[0]["args"] == {"trace": "0000000000000007", "type": "ClientLogAppend"}
+    assert spans[0]["dur"] == 500000.0
+    json.dumps(events)
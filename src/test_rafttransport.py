@@ -0,0 +1,83 @@
+import os
+import queue
+
+import pytest
+
+import raftnode
+import rafttransport
+
+
+def test_tcp_addresses() -> None:
+    transport = rafttransport.TcpTransport(
+        {1: ("localhost", 7701)}, ("localhost", 7700)
+    )
+
+    # Identifiers outside the configuration are clients.
+    assert transport.address(1) == ("localhost", 7701)
+    assert transport.address(100) == ("localhost", 7700)
+
+
+def test_unix_addresses(tmp_path) -> None:
+    transport = rafttransport.UnixTransport(str(tmp_path))
+    path = str(tmp_path / "raft-1.sock")
+    assert transport.address(1) == path
+
+    # Socket file left behind by a previous run is replaced.
+    open(path, "w").close()
+    sock = transport.listen(1)
+
+    try:
+        assert sock.getsockname() == path
+
+    finally:
+        sock.close()
+
+
+def test_unix_exchange(tmp_path) -> None:
+    members = {1: ("localhost", 0), 2: ("localhost", 0)}
+    nodes = {
+        i: raftnode.RaftNode(
+            i, rafttransport.UnixTransport(str(tmp_path)), members=members
+        )
+        for i in members
+    }
+
+    for node in nodes.values():
+        node.start()
+
+    try:
+        assert os.path.exists(tmp_path / "raft-2.sock")
+
+        nodes[1].send(2, b"ping")
+        assert nodes[2].incoming.get(timeout=2) == b"ping"
+
+        nodes[2].send(1, b"pong")
+        assert nodes[1].incoming.get(timeout=2) == b"pong"
+        assert nodes[2].connections[1].dialer == 1
+
+    finally:
+        for node in nodes.values():
+            node.stop(0)
+
+            for connection in node.connections.values():
+                if connection.sock is not None:
+                    connection.detach(connection.sock)
+
+
+def test_in_process_deliver() -> None:
+    transport = rafttransport.InProcessTransport()
+    incoming: queue.SimpleQueue = queue.SimpleQueue()
+    transport.attach(1, incoming)
+
+    assert transport.deliver(1, b"a")
+    assert incoming.get_nowait() == b"a"
+
+    # Messages to nodes not attached are discarded.
+    transport.detach(1)
+    assert not transport.deliver(1, b"b")
+    assert incoming.empty()
+
+
+def test_stream_transport_abstract() -> None:
+    with pytest.raises(TypeError):
+        rafttransport.StreamTransport()  # type: ignore[abstract]